@@ -0,0 +1,229 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from arrow_cache import CACHED_TABLES, get_frame, load_arrow_table
+from data_version import current_data_version
+from db_config import DB_PATH
+from db_schema import apply_compact_dtypes, arrow_types_mapper
+from snapshots import SNAPSHOT_DIR, SnapshotError, copy_database
+
+# ==================== 分析快照配置 ====================
+# 数据可视化、预测分析等页面需要整表扫描与聚合。开启分析快照后，这些页面改为读取定期刷新的数据库副本：
+#   - 副本通过在线备份接口生成，每次刷新写入新文件，管理页面的写入不会与分析扫描争用锁
+#   - 副本以 immutable=1 只读打开：SQLite不加锁、不检查文件是否变化，并用较大的mmap直接映射文件
+#   - 副本超过刷新间隔且原库有新写入时在后台线程刷新，刷新期间继续读取旧副本
+# 分析页面看到的数据最多滞后一个刷新间隔；未开启时与其他页面一样读取Arrow缓存。
+
+ANALYTICS_DIR = os.path.join(SNAPSHOT_DIR, "analytics")
+
+# 环境变量：设为1时默认开启分析快照
+ANALYTICS_SNAPSHOT_ENV = "STAR_ANALYTICS_SNAPSHOT"
+
+# 刷新间隔（秒）
+REFRESH_SECONDS = 300
+
+# 只读连接的mmap大小与页缓存大小
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+
+_lock = threading.Lock()
+_refresh_lock = threading.RLock()
+_load_locks = {name: threading.Lock() for name in CACHED_TABLES}
+_entries = {}
+_state = {
+    'enabled': os.environ.get(ANALYTICS_SNAPSHOT_ENV, '').lower() in ('1', 'true', 'yes', 'on'),
+    'path': None,
+    'generation': 0,
+    'refreshed_at': None,
+    'source_version': None,
+    'refreshing': False,
+    'refreshes': 0,
+    'refresh_seconds': None,
+    'last_error': None
+}
+
+
+# ==================== 开关 ====================
+def analytics_enabled():
+    """分析页面是否读取分析快照"""
+    with _lock:
+        return _state['enabled']
+
+
+def set_analytics_enabled(enabled):
+    """开启或关闭分析快照（进程内所有会话生效）"""
+    with _lock:
+        _state['enabled'] = bool(enabled)
+
+
+# ==================== 刷新 ====================
+def _remove_old_files(keep):
+    """删除当前副本以外的旧副本（仍被打开而无法删除的留到下次）"""
+    for name in os.listdir(ANALYTICS_DIR):
+        path = os.path.join(ANALYTICS_DIR, name)
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def refresh_analytics_snapshot(db_path=DB_PATH):
+    """立即生成新的分析快照并切换到新副本，返回刷新报告"""
+    with _refresh_lock:
+        start = time.perf_counter()
+        # 在复制前读取数据版本：复制期间有新写入时，下次检查仍会刷新
+        source_version = current_data_version()
+        os.makedirs(ANALYTICS_DIR, exist_ok=True)
+        path = os.path.join(ANALYTICS_DIR, f"analytics-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db")
+        partial_path = path + ".partial"
+        try:
+            pages = copy_database(db_path, partial_path)
+            os.replace(partial_path, path)
+        except (SnapshotError, sqlite3.Error, OSError) as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            with _lock:
+                _state['last_error'] = str(e)
+            raise
+
+        seconds = time.perf_counter() - start
+        with _lock:
+            _state.update({
+                'path': path,
+                'generation': _state['generation'] + 1,
+                'refreshed_at': time.time(),
+                'source_version': source_version,
+                'refreshes': _state['refreshes'] + 1,
+                'refresh_seconds': seconds,
+                'last_error': None
+            })
+        _remove_old_files(keep=path)
+        print(f"分析快照已刷新: {path}（{pages} 页，{seconds:.3f} 秒）")
+        return {'path': path, 'pages': pages, 'seconds': round(seconds, 4)}
+
+
+def _refresh_in_background(db_path):
+    """在后台线程刷新分析快照"""
+    def run():
+        try:
+            refresh_analytics_snapshot(db_path)
+        except Exception as e:
+            print(f"刷新分析快照失败: {str(e)}")
+        finally:
+            with _lock:
+                _state['refreshing'] = False
+
+    threading.Thread(target=run, name="analytics-refresh", daemon=True).start()
+
+
+def _ensure_snapshot(db_path=DB_PATH):
+    """没有副本时同步生成；副本过期且原库有新写入时在后台刷新"""
+    with _lock:
+        path = _state['path']
+        expired = path is not None and not _state['refreshing'] and \
+            time.time() - _state['refreshed_at'] >= REFRESH_SECONDS
+        source_version = _state['source_version']
+    if path is None:
+        # 多个读取同时发现没有副本时只生成一次
+        with _refresh_lock:
+            if _state['path'] is None:
+                refresh_analytics_snapshot(db_path)
+        return
+    if not expired or current_data_version() == source_version:
+        return
+
+    with _lock:
+        if _state['refreshing']:
+            return
+        _state['refreshing'] = True
+    _refresh_in_background(db_path)
+
+
+# ==================== 读取 ====================
+def _open_snapshot(path):
+    """以immutable方式只读打开副本"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    return conn
+
+
+def _open_current():
+    """打开当前副本，返回 (快照代数, 连接)；副本恰好被刷新替换、旧文件已删除时重新读取一次"""
+    for attempt in range(2):
+        with _lock:
+            generation, path = _state['generation'], _state['path']
+        try:
+            return generation, _open_snapshot(path)
+        except sqlite3.OperationalError:
+            if attempt:
+                raise
+
+
+@contextmanager
+def analytics_connection(db_path=DB_PATH):
+    """打开当前分析快照的只读连接"""
+    _ensure_snapshot(db_path)
+    _, conn = _open_current()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_analytics_frame(table_name, db_path=DB_PATH):
+    """返回分析页面使用的业务表：开启分析快照时读取快照（按快照代数缓存），否则读取Arrow缓存"""
+    if not analytics_enabled():
+        return get_frame(table_name, db_path)
+    if table_name not in CACHED_TABLES:
+        raise KeyError(f"表 {table_name} 不在分析快照范围内")
+
+    _ensure_snapshot(db_path)
+    with _load_locks[table_name]:
+        with _lock:
+            generation = _state['generation']
+        entry = _entries.get(table_name)
+        if entry is None or entry['generation'] != generation:
+            generation, conn = _open_current()
+            try:
+                entry = {'generation': generation, 'table': load_arrow_table(conn, table_name)}
+            finally:
+                conn.close()
+            _entries[table_name] = entry
+    return entry['table'].to_pandas(types_mapper=arrow_types_mapper)
+
+
+def analytics_read_sql(sql, params=None, db_path=DB_PATH):
+    """在分析快照上执行只读聚合查询"""
+    with analytics_connection(db_path) as conn:
+        cursor = conn.execute(sql, params or ())
+        columns = [col[0].lower() for col in cursor.description]
+        df = pd.DataFrame(cursor.fetchall(), columns=columns)
+    return apply_compact_dtypes(df) if not df.empty else df
+
+
+def analytics_source():
+    """分析页面当前的数据来源：未开启时为 'live'，开启时为 'snapshot:<快照代数>'（用于图表缓存键）"""
+    with _lock:
+        return f"snapshot:{_state['generation']}" if _state['enabled'] else 'live'
+
+
+# ==================== 状态 ====================
+def analytics_status():
+    """返回开关状态、当前副本、刷新次数与距上次刷新的时间"""
+    with _lock:
+        status = dict(_state)
+    path = status['path']
+    status['bytes'] = os.path.getsize(path) if path and os.path.exists(path) else 0
+    status['age_seconds'] = time.time() - status['refreshed_at'] if status['refreshed_at'] else None
+    status['refresh_interval'] = REFRESH_SECONDS
+    status['cached_tables'] = sorted(_entries)
+    return status
@@ -0,0 +1,271 @@
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from data_export import export_query, table_schema
+from data_version import bump_data_version
+from db_config import ARCHIVE_DB_PATH, DB_PATH, connect, database_exists, database_size, is_memory
+from db_schema import apply_compact_dtypes
+
+# ==================== 历史归档配置 ====================
+# 早于归档期限的热度记录移到单独的SQLite数据库（以ATTACH方式挂载），
+# 热表及其索引只保留近期数据；需要长历史时联合查询热表与归档表。
+# 归档库的位置随业务库确定（见 db_config.archive_path_for）。
+ARCHIVE_SCHEMA = "archive"
+
+# 默认保留最近一年的数据在热表中
+DEFAULT_HORIZON_DAYS = 365
+
+POPULARITY_COLUMNS = [
+    'popularity_id', 'singer_id', 'record_date', 'fan_count', 'topic_score',
+    'popularity_score', 'social_media_mentions', 'created_at'
+]
+
+ARCHIVE_TABLE_SQL = f'''
+    CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.popularity (
+        popularity_id INTEGER PRIMARY KEY,
+        singer_id INTEGER,
+        record_date DATE,
+        fan_count INTEGER,
+        topic_score REAL,
+        popularity_score REAL,
+        social_media_mentions INTEGER,
+        created_at TIMESTAMP,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+ARCHIVE_INDEX_SQL = (f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_popularity_singer_date "
+                     f"ON popularity (singer_id, record_date)")
+
+LIVE_INDEX_SQL = ("CREATE INDEX IF NOT EXISTS idx_popularity_singer_date "
+                  "ON popularity (singer_id, record_date)")
+
+# 归档表中仍留在热表里的记录（归档在两步之间中断时）只按热表计算一次；popularity_id 为自增主键，不会复用
+NOT_IN_LIVE_SQL = ("NOT EXISTS (SELECT 1 FROM main.popularity live "
+                   f"WHERE live.popularity_id = {ARCHIVE_SCHEMA}.popularity.popularity_id)")
+
+
+# ==================== 挂载 ====================
+def is_attached(conn, schema=ARCHIVE_SCHEMA):
+    """判断连接上是否已挂载归档库"""
+    return any(row[1] == schema for row in conn.execute("PRAGMA database_list"))
+
+
+def attach_archive(conn, archive_path=ARCHIVE_DB_PATH, create=False):
+    """在连接上挂载归档库；归档库不存在且create为False时不挂载，返回是否已挂载"""
+    if is_attached(conn):
+        return True
+    if not create and not database_exists(archive_path):
+        return False
+    if is_memory(archive_path):
+        # 通过db_config打开一次，使内存归档库在挂载它的连接关闭后仍然存在
+        connect(archive_path).close()
+
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+    if create:
+        conn.execute(ARCHIVE_TABLE_SQL)
+        conn.execute(ARCHIVE_INDEX_SQL)
+        return True
+
+    # 只读挂载：归档表还不存在时视为没有归档数据
+    exists = conn.execute(
+        f"SELECT 1 FROM {ARCHIVE_SCHEMA}.sqlite_master WHERE type = 'table' AND name = 'popularity'"
+    ).fetchone()
+    if not exists:
+        conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+        return False
+    return True
+
+
+def popularity_source(conn):
+    """返回热度数据的来源SQL：挂载了归档库时为热表与归档表的联合"""
+    if not is_attached(conn):
+        return "popularity"
+    columns = ', '.join(POPULARITY_COLUMNS)
+    return (f"(SELECT {columns} FROM main.popularity "
+            f"UNION ALL SELECT {columns} FROM {ARCHIVE_SCHEMA}.popularity WHERE {NOT_IN_LIVE_SQL})")
+
+
+def archive_cutoff(horizon_days=DEFAULT_HORIZON_DAYS, today=None):
+    """归档分界日期：早于该日期的记录会被归档"""
+    return ((today or date.today()) - timedelta(days=horizon_days)).isoformat()
+
+
+# ==================== 归档 ====================
+def archive_popularity(horizon_days=DEFAULT_HORIZON_DAYS, db_path=DB_PATH, archive_path=ARCHIVE_DB_PATH,
+                       parquet_dir=None):
+    """将早于期限的热度记录移入归档库，可同时导出一份Parquet文件，返回归档报告
+
+    WAL模式下跨ATTACH库的事务在两个文件之间不是原子的，因此分两步提交：
+    先复制到归档库并提交，再从热表删除已在归档库中的记录。中途失败最多留下两边都有的记录
+    （读取时按热表去重），不会丢数据；下次归档的第二步会把这些记录从热表删除。
+    """
+    cutoff = archive_cutoff(horizon_days)
+    columns = ', '.join(POPULARITY_COLUMNS)
+    start = time.perf_counter()
+    parquet_file = None
+
+    conn = connect(db_path, check_same_thread=False, isolation_level=None)
+    try:
+        conn.execute(LIVE_INDEX_SQL)
+        attach_archive(conn, archive_path, create=True)
+
+        # 第一步：复制到归档库（同时导出Parquet）
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.execute(
+                f"INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.popularity ({columns}) "
+                f"SELECT {columns} FROM main.popularity WHERE record_date < ?",
+                (cutoff,)
+            )
+            archived = cursor.rowcount
+
+            if archived and parquet_dir:
+                os.makedirs(parquet_dir, exist_ok=True)
+                parquet_file = os.path.join(parquet_dir, f"popularity_before_{cutoff}_{int(time.time())}.parquet")
+                export_query(f"SELECT {columns} FROM main.popularity WHERE record_date < ?", parquet_file,
+                             'parquet', params=(cutoff,), schema=table_schema(conn, 'popularity'), conn=conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            if parquet_file and os.path.exists(parquet_file):
+                os.remove(parquet_file)
+            raise
+
+        # 第二步：从热表删除已在归档库中的记录（包括上次中断时留下的），可重复执行
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = conn.execute(
+                f"DELETE FROM main.popularity WHERE EXISTS (SELECT 1 FROM {ARCHIVE_SCHEMA}.popularity archived "
+                "WHERE archived.popularity_id = main.popularity.popularity_id)"
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        live_rows = conn.execute("SELECT COUNT(*) FROM main.popularity").fetchone()[0]
+        archive_rows = conn.execute(f"SELECT COUNT(*) FROM {ARCHIVE_SCHEMA}.popularity").fetchone()[0]
+    finally:
+        conn.close()
+
+    if archived or removed:
+        bump_data_version()
+
+    return {
+        'cutoff': cutoff,
+        'archived': archived,
+        'live_rows': live_rows,
+        'archive_rows': archive_rows,
+        'parquet_file': parquet_file,
+        'elapsed': time.perf_counter() - start
+    }
+
+
+# ==================== 联合读取 ====================
+def read_popularity(singer_id=None, start=None, end=None, db_path=DB_PATH, archive_path=ARCHIVE_DB_PATH):
+    """读取热度记录；查询范围早于热表最早日期时自动联合归档库"""
+    conditions = []
+    params = []
+    if singer_id is not None:
+        conditions.append("singer_id = ?")
+        params.append(int(singer_id))
+    if start is not None:
+        conditions.append("record_date >= ?")
+        params.append(str(start))
+    if end is not None:
+        conditions.append("record_date <= ?")
+        params.append(str(end))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    columns = ', '.join(POPULARITY_COLUMNS)
+
+    conn = connect(db_path, read_only=True, check_same_thread=False)
+    try:
+        sql = f"SELECT {columns} FROM main.popularity {where}"
+        query_params = list(params)
+
+        # 热表已覆盖请求的起始日期时不必读取归档库
+        oldest_live = conn.execute("SELECT MIN(record_date) FROM main.popularity").fetchone()[0]
+        needs_archive = start is None or oldest_live is None or str(start) < oldest_live
+        if needs_archive and attach_archive(conn, archive_path):
+            archive_where = f"{where} AND {NOT_IN_LIVE_SQL}" if where else f"WHERE {NOT_IN_LIVE_SQL}"
+            sql += f" UNION ALL SELECT {columns} FROM {ARCHIVE_SCHEMA}.popularity {archive_where}"
+            query_params += params
+
+        df = pd.read_sql_query(f"{sql} ORDER BY record_date", conn, params=query_params)
+    finally:
+        conn.close()
+
+    return apply_compact_dtypes(df)
+
+
+def popularity_date_range(singer_id, db_path=DB_PATH, archive_path=ARCHIVE_DB_PATH):
+    """返回歌手热度记录（热表与归档库）的最早与最晚日期，没有记录时为 (None, None)"""
+    conn = connect(db_path, read_only=True, check_same_thread=False)
+    try:
+        schemas = ['main', ARCHIVE_SCHEMA] if attach_archive(conn, archive_path) else ['main']
+        ranges = [
+            conn.execute(f"SELECT MIN(record_date), MAX(record_date) FROM {schema}.popularity WHERE singer_id = ?",
+                         (int(singer_id),)).fetchone()
+            for schema in schemas
+        ]
+    finally:
+        conn.close()
+
+    ranges = [row for row in ranges if row[0] is not None]
+    if not ranges:
+        return None, None
+    return min(row[0] for row in ranges), max(row[1] for row in ranges)
+
+
+def archive_stats(db_path=DB_PATH, archive_path=ARCHIVE_DB_PATH):
+    """返回热表与归档库的行数、日期范围与文件大小"""
+    stats = []
+    conn = connect(db_path, read_only=True, check_same_thread=False)
+    try:
+        sources = [('热表', 'main', db_path)]
+        if attach_archive(conn, archive_path):
+            sources.append(('归档库', ARCHIVE_SCHEMA, archive_path))
+        for label, schema, path in sources:
+            rows, first, last = conn.execute(
+                f"SELECT COUNT(*), MIN(record_date), MAX(record_date) FROM {schema}.popularity"
+            ).fetchone()
+            stats.append({
+                'source': label,
+                'rows': rows,
+                'first_date': first,
+                'last_date': last,
+                'file_bytes': database_size(path)
+            })
+    finally:
+        conn.close()
+    return stats
+
+
+# ==================== 命令行入口 ====================
+def main(argv=None):
+    """命令行归档：python archive.py --days 365 --parquet-dir archive_parquet"""
+    parser = argparse.ArgumentParser(description="将早于期限的热度记录移入归档库")
+    parser.add_argument("--days", type=int, default=DEFAULT_HORIZON_DAYS, help="热表保留的天数")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--archive", default=ARCHIVE_DB_PATH, help="归档库文件路径")
+    parser.add_argument("--parquet-dir", help="同时导出Parquet文件的目录")
+    args = parser.parse_args(argv)
+
+    if not database_exists(args.db):
+        parser.error(f"数据库文件不存在: {args.db}")
+
+    report = archive_popularity(args.days, args.db, args.archive, args.parquet_dir)
+    print(f"归档分界日期 {report['cutoff']}：归档 {report['archived']} 行，"
+          f"热表剩余 {report['live_rows']} 行，归档库共 {report['archive_rows']} 行")
+    if report['parquet_file']:
+        print(f"Parquet文件: {os.path.abspath(report['parquet_file'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pyarrow as pa
+
+from data_export import iter_record_batches, table_schema, unify_batches
+from data_version import current_data_version
+from db_config import DB_PATH, connect
+from db_schema import arrow_types_mapper, compact_arrow_table, memory_report
+
+# ==================== 进程级Arrow缓存 ====================
+# 四张业务表以只读的 pyarrow.Table 形式在进程内共享，所有会话读取同一份数据。
+# 写入后数据版本变化，下一次读取时重新加载并整体替换，读者拿到的旧表不受影响。
+
+CACHED_TABLES = {
+    'singers': "SELECT * FROM singers ORDER BY singer_id",
+    'concerts': "SELECT * FROM concerts ORDER BY concert_date DESC",
+    'popularity': "SELECT * FROM popularity ORDER BY record_date DESC",
+    'cities': "SELECT * FROM cities ORDER BY city_id"
+}
+
+DATE_COLUMNS = ('birth_date', 'concert_date', 'record_date', 'created_at')
+
+_entries_lock = threading.Lock()
+_load_locks = {name: threading.Lock() for name in CACHED_TABLES}
+_entries = {}
+
+
+def _cast_date_columns(table):
+    """将日期列由字符串转换为时间戳，无法解析时保留原字符串"""
+    for name in DATE_COLUMNS:
+        index = table.schema.get_field_index(name)
+        if index < 0:
+            continue
+        try:
+            column = table.column(index).cast(pa.timestamp('s'))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+        table = table.set_column(index, pa.field(name, column.type), column)
+    return table
+
+
+def load_arrow_table(conn, table_name):
+    """在给定连接上读取整张表并构建紧凑类型的Arrow表"""
+    schema = table_schema(conn, table_name)
+    schema, batches = unify_batches(iter_record_batches(conn, CACHED_TABLES[table_name], schema=schema), schema)
+    table = pa.Table.from_batches(batches, schema=schema)
+    return compact_arrow_table(_cast_date_columns(table)).combine_chunks()
+
+
+def _load_table(table_name, db_path=DB_PATH):
+    """从数据库读取整张表并构建Arrow表"""
+    conn = connect(db_path, read_only=True, check_same_thread=False)
+    try:
+        return load_arrow_table(conn, table_name)
+    finally:
+        conn.close()
+
+
+def get_table(table_name, db_path=DB_PATH):
+    """获取缓存的Arrow表，数据版本变化时重新加载"""
+    if table_name not in CACHED_TABLES:
+        raise KeyError(f"表 {table_name} 不在Arrow缓存范围内")
+
+    version = current_data_version()
+    entry = _entries.get(table_name)
+    if entry is not None and entry['version'] == version:
+        return entry['table']
+
+    # 同一张表同一时刻只加载一次，其他线程等待后直接复用结果
+    with _load_locks[table_name]:
+        version = current_data_version()
+        entry = _entries.get(table_name)
+        if entry is not None and entry['version'] == version:
+            return entry['table']
+
+        start = time.perf_counter()
+        table = _load_table(table_name, db_path)
+        with _entries_lock:
+            _entries[table_name] = {
+                'version': version,
+                'table': table,
+                'loaded_at': time.time(),
+                'load_seconds': time.perf_counter() - start
+            }
+        return table
+
+
+def get_frame(table_name, db_path=DB_PATH):
+    """返回基于缓存Arrow表的pandas DataFrame（ArrowDtype零拷贝，低基数文本为category）"""
+    return get_table(table_name, db_path).to_pandas(types_mapper=arrow_types_mapper)
+
+
+def invalidate(table_name=None):
+    """丢弃缓存（table_name为None时清空全部）"""
+    with _entries_lock:
+        if table_name is None:
+            _entries.clear()
+        else:
+            _entries.pop(table_name, None)
+
+
+def cache_stats():
+    """返回各缓存表的行数、内存占用与加载信息"""
+    with _entries_lock:
+        entries = dict(_entries)
+
+    stats = []
+    for table_name, entry in entries.items():
+        stats.append({
+            'table': table_name,
+            'rows': entry['table'].num_rows,
+            'bytes': entry['table'].nbytes,
+            'version': str(entry['version']),
+            'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['loaded_at'])),
+            'load_seconds': round(entry['load_seconds'], 4)
+        })
+    return stats
+
+
+def cache_memory_report():
+    """返回各缓存表在紧凑类型与原始类型下的内存对比"""
+    with _entries_lock:
+        tables = {name: entry['table'] for name, entry in _entries.items()}
+    return memory_report(tables)
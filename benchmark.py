@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# ==================== 基准测试配置 ====================
+# 按几种数据规模分别生成数据库（使用 init_database.py 的数据生成逻辑），对数据层与页面计算函数计时：
+#   - query_database（未命中缓存与命中缓存）、get_data（每张业务表，冷读取与热读取）
+#   - 演唱会管理页面的合并与筛选、数据可视化页面的数据准备与各图表聚合
+#   - 城市推荐打分、热度序列读取与粉丝量/热度预测
+# 每个规模在独立的子进程中运行：子进程通过 STAR_DB_URI 指向自己的数据库，
+# 各模块的数据库位置、Arrow缓存与查询缓存互不干扰。结果写入JSON，可与之前的结果比较发现性能回归。
+
+# 规模名 -> (歌手倍数, 每位歌手的热度记录月数)；歌手数为 20 * 倍数
+SCALES = {
+    'small': (1, 12),
+    'medium': (10, 36),
+    'large': (50, 60)
+}
+
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 42
+DEFAULT_OUTPUT_DIR = "bench_results"
+
+# 与基线比较时，中位数变慢超过这个比例、且绝对差值超过 MIN_REGRESSION_MS 视为回归
+DEFAULT_THRESHOLD = 0.2
+MIN_REGRESSION_MS = 1.0
+
+# 等待导入star.py时提交的后台预取任务结束的最长时间（秒）
+PREFETCH_WAIT_SECONDS = 60
+
+# 演唱会筛选用例的搜索词（走全文索引）
+SEARCH_TERM = "巡回演唱会"
+
+# 预测用例的预测月数
+FORECAST_MONTHS = 12
+
+
+# ==================== 计时 ====================
+def time_case(func, repeat, setup=None):
+    """先预热一次，再计时repeat次；setup在每次执行前调用且不计时"""
+    if setup is not None:
+        setup()
+    func()
+
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'max_ms': round(max(samples), 3)
+    }
+
+
+# ==================== 用例（子进程内执行） ====================
+def _wait_for_prefetch(prefetch_stats):
+    """等待后台预取任务结束，避免与计时争用"""
+    deadline = time.time() + PREFETCH_WAIT_SECONDS
+    while prefetch_stats()['inflight'] and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def build_cases(star):
+    """返回 [(用例名, 计时函数, 准备函数)]，准备函数为None表示热读取"""
+    import streamlit as st
+    from arrow_cache import CACHED_TABLES, invalidate
+
+    tables = sorted(CACHED_TABLES)
+    singers_df = star.get_data('singers')
+    concerts_df = star.get_data('concerts')
+    cities_df = star.get_data('cities')
+
+    cases = []
+
+    # 数据层
+    for table in tables:
+        sql = f"SELECT * FROM {table}"
+        cases.append((f"query_database.{table}", lambda sql=sql: star.query_database(sql), st.cache_data.clear))
+    cases.append(("query_database.cached", lambda: star.query_database("SELECT * FROM popularity"), None))
+    for table in tables:
+        cases.append((f"get_data.{table}.cold", lambda table=table: star.get_data(table),
+                      lambda table=table: invalidate(table)))
+        cases.append((f"get_data.{table}.warm", lambda table=table: star.get_data(table), None))
+
+    # 演唱会管理：合并与筛选
+    merged = star.merge_concert_data(concerts_df, singers_df)
+    singer_name = merged['name'].iloc[0]
+    cases.append(("concerts.merge", lambda: star.merge_concert_data(concerts_df, singers_df), None))
+    cases.append(("concerts.filter", lambda: star.filter_concerts(merged, None, singer_name, '北京', 2023), None))
+    cases.append(("concerts.search_filter", lambda: star.filter_concerts(merged, SEARCH_TERM), None))
+
+    # 数据可视化：数据准备与各图表聚合
+    visualization_data = star.prepare_visualization_data(singers_df, concerts_df)
+    cases.append(("visualization.prepare",
+                  lambda: star.prepare_visualization_data(singers_df, concerts_df), None))
+    for name, builder in star.VISUALIZATION_FIGURES.items():
+        cases.append((name, lambda builder=builder: builder(visualization_data), None))
+
+    # 城市推荐：演出场次最多的歌手
+    singer_id = concerts_df['singer_id'].value_counts().idxmax()
+    singer_genre = singers_df[singers_df['singer_id'] == singer_id].iloc[0].get('genre', '流行')
+    singer_concerts = concerts_df[concerts_df['singer_id'] == singer_id].copy()
+    cases.append(("city_recommendation.score",
+                  lambda: star.score_cities(singer_genre, cities_df, singer_concerts), None))
+
+    # 预测：读取热度序列（按日与按月）并外推
+    cases.append(("forecast.series_day", lambda: star.get_popularity_series(singer_id, 'day'), None))
+    cases.append(("forecast.series_month", lambda: star.get_popularity_series(singer_id, 'month'), None))
+    series = star.get_popularity_series(singer_id, 'day')
+    fan_counts = series['fan_count'].values
+    dates = series['record_date'].values
+    topic_scores = series['topic_score'].values
+    popularity_scores = series['popularity_score'].values
+    cases.append(("forecast.fan_count",
+                  lambda: star.forecast_fan_counts(fan_counts, dates, FORECAST_MONTHS), None))
+    cases.append(("forecast.scores",
+                  lambda: star.forecast_scores(topic_scores, popularity_scores, FORECAST_MONTHS), None))
+    return cases
+
+
+def run_scale(scale, repeat, seed):
+    """在当前进程中生成指定规模的数据库并运行全部用例，返回该规模的结果"""
+    import numpy as np
+
+    from db_config import DB_PATH, connect
+    from init_database import create_database_with_real_data
+
+    factor, months = SCALES[scale]
+    np.random.seed(seed)
+    start = time.perf_counter()
+    if not create_database_with_real_data(DB_PATH, scale=factor, months=months):
+        raise RuntimeError(f"生成 {scale} 规模的数据库失败")
+    seed_seconds = time.perf_counter() - start
+
+    conn = connect(DB_PATH, read_only=True)
+    try:
+        rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('singers', 'concerts', 'popularity', 'cities')}
+    finally:
+        conn.close()
+
+    # 导入时以bare模式运行一次页面脚本，并提交后台预取任务
+    import star
+    from prefetch import prefetch_stats
+    _wait_for_prefetch(prefetch_stats)
+
+    cases = {}
+    for name, func, setup in build_cases(star):
+        cases[name] = time_case(func, repeat, setup)
+    return {
+        'factor': factor,
+        'months': months,
+        'rows': rows,
+        'seed_seconds': round(seed_seconds, 3),
+        'cases': cases
+    }
+
+
+# ==================== 调度（父进程） ====================
+def _git_commit():
+    """当前提交号，不在git仓库中时返回None"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _run_worker(scale, repeat, seed, memory):
+    """在子进程中运行一个规模，返回结果"""
+    from db_config import DB_URI_ENV
+
+    work_dir = tempfile.mkdtemp(prefix=f"star-bench-{scale}-")
+    result_path = os.path.join(work_dir, "result.json")
+    env = dict(os.environ)
+    env[DB_URI_ENV] = ':memory:' if memory else os.path.join(work_dir, f"{scale}.db")
+    env["STREAMLIT_LOGGER_LEVEL"] = "error"
+    try:
+        process = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", scale, "--result", result_path,
+             "--repeat", str(repeat), "--seed", str(seed)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            raise RuntimeError(f"{scale} 规模运行失败:\n{process.stdout[-2000:]}\n{process.stderr[-2000:]}")
+        with open(result_path, encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_benchmarks(scales, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED, memory=False):
+    """依次运行各个规模，返回完整结果"""
+    import pandas as pd
+
+    results = {
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'seed': seed,
+        'memory': memory,
+        'scales': {}
+    }
+    for scale in scales:
+        print(f"正在运行 {scale} 规模...")
+        results['scales'][scale] = _run_worker(scale, repeat, seed, memory)
+    return results
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """与基线结果比较各用例的中位数，返回变慢超过阈值的用例"""
+    regressions = []
+    for scale, scale_result in results['scales'].items():
+        baseline_cases = baseline.get('scales', {}).get(scale, {}).get('cases', {})
+        for name, timing in scale_result['cases'].items():
+            base = baseline_cases.get(name)
+            if not base or not base['median_ms']:
+                continue
+            ratio = timing['median_ms'] / base['median_ms']
+            if ratio > 1 + threshold and timing['median_ms'] - base['median_ms'] > MIN_REGRESSION_MS:
+                regressions.append({
+                    'scale': scale,
+                    'case': name,
+                    'baseline_ms': base['median_ms'],
+                    'median_ms': timing['median_ms'],
+                    'ratio': round(ratio, 2)
+                })
+    return regressions
+
+
+def format_results(results):
+    """格式化为便于阅读的文本表格"""
+    lines = []
+    for scale, scale_result in results['scales'].items():
+        rows = ', '.join(f"{table} {count}" for table, count in scale_result['rows'].items())
+        lines.append(f"== {scale}（{rows}；生成数据 {scale_result['seed_seconds']} 秒）")
+        for name, timing in scale_result['cases'].items():
+            lines.append(f"  {name:<36} 中位数 {timing['median_ms']:>10.3f} ms   "
+                         f"最小 {timing['min_ms']:>10.3f} ms   最大 {timing['max_ms']:>10.3f} ms")
+    return '\n'.join(lines)
+
+
+# ==================== 命令行入口 ====================
+def main(argv=None):
+    """命令行基准测试：python benchmark.py [--scales small medium] [--baseline 旧结果.json]"""
+    parser = argparse.ArgumentParser(description="数据层与页面计算函数的基准测试")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES), help="数据规模")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每个用例的计时次数")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="数据生成的随机种子")
+    parser.add_argument("--memory", action="store_true", help="使用内存库代替临时文件")
+    parser.add_argument("--output", default=None, help="结果JSON路径（默认写入 bench_results/ 目录）")
+    parser.add_argument("--baseline", default=None, help="用于比较的历史结果JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="视为回归的变慢比例")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--result", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = run_scale(args.worker, args.repeat, args.seed)
+        with open(args.result, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        return 0
+
+    try:
+        results = run_benchmarks(args.scales, args.repeat, args.seed, args.memory)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR,
+                                         f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(format_results(results))
+    print(f"结果已写入 {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"⚠️ {regression['scale']} {regression['case']}: {regression['baseline_ms']} ms -> "
+                  f"{regression['median_ms']} ms（{regression['ratio']} 倍）")
+        if regressions:
+            return 1
+        print("与基线相比没有发现性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
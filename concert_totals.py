@@ -0,0 +1,252 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+from db_config import DB_PATH, connect
+
+# ==================== 增量统计配置 ====================
+# 演唱会的场次、收入、出席人数与容量合计由concerts表上的触发器增量维护：
+#   - scope = 'all' 为全部演唱会的合计，scope = 'YYYY' 为各年度合计（日期缺失记入 'unknown'）
+#   - 插入时累加、删除时扣减、更新时先扣减旧值再累加新值，与原数据在同一事务内提交
+# 歌手与城市的行数同样由触发器维护，概览页与侧边栏的指标因此只需读取一行。
+
+COUNTED_TABLES = {
+    'singers': 'singer_count',
+    'cities': 'city_count'
+}
+
+TOTAL_COLUMNS = ['concert_count', 'total_revenue', 'total_attendance', 'total_capacity']
+
+# 演唱会所属年度
+YEAR_EXPRESSION = "COALESCE(strftime('%Y', {row}.concert_date), 'unknown')"
+
+# 浮点收入累加允许的误差
+REVENUE_TOLERANCE = 0.01
+
+
+def _apply_sql(row, sign):
+    """生成把一行演唱会累加（sign='+'）或扣减（sign='-'）到合计表的语句"""
+    statements = []
+    for scope in ("'all'", YEAR_EXPRESSION.format(row=row)):
+        statements.append(f'''
+        INSERT INTO concert_totals (scope, {', '.join(TOTAL_COLUMNS)})
+        VALUES ({scope}, {sign}1, {sign}COALESCE({row}.revenue, 0),
+                {sign}COALESCE({row}.attendance, 0), {sign}COALESCE({row}.capacity, 0))
+        ON CONFLICT (scope) DO UPDATE SET
+            concert_count = concert_count + excluded.concert_count,
+            total_revenue = total_revenue + excluded.total_revenue,
+            total_attendance = total_attendance + excluded.total_attendance,
+            total_capacity = total_capacity + excluded.total_capacity;
+        ''')
+    if sign == '-':
+        # 某年度的演唱会全部删除后移除该年度
+        statements.append("DELETE FROM concert_totals WHERE scope <> 'all' AND concert_count <= 0;")
+    return ''.join(statements)
+
+
+def _count_triggers(table_name):
+    """生成维护某张表行数的触发器"""
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table_name}_count_insert AFTER INSERT ON {table_name}
+        BEGIN
+            UPDATE table_counts SET row_count = row_count + 1 WHERE table_name = '{table_name}';
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table_name}_count_delete AFTER DELETE ON {table_name}
+        BEGIN
+            UPDATE table_counts SET row_count = row_count - 1 WHERE table_name = '{table_name}';
+        END
+        '''
+    ]
+
+
+TOTALS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS concert_totals (
+        scope TEXT PRIMARY KEY,
+        concert_count INTEGER NOT NULL DEFAULT 0,
+        total_revenue REAL NOT NULL DEFAULT 0,
+        total_attendance INTEGER NOT NULL DEFAULT 0,
+        total_capacity INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS table_counts (
+        table_name TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS concert_totals_insert AFTER INSERT ON concerts
+    BEGIN
+        {_apply_sql('NEW', '+')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS concert_totals_update
+    AFTER UPDATE OF concert_date, revenue, attendance, capacity ON concerts
+    BEGIN
+        {_apply_sql('OLD', '-')}
+        {_apply_sql('NEW', '+')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS concert_totals_delete AFTER DELETE ON concerts
+    BEGIN
+        {_apply_sql('OLD', '-')}
+    END
+    '''
+] + [trigger for table_name in COUNTED_TABLES for trigger in _count_triggers(table_name)]
+
+# 按全量数据重新计算的合计（用于初始化、重建与校验）
+RECOMPUTE_SQL = f'''
+    SELECT 'all' AS scope, COUNT(*) AS concert_count, COALESCE(SUM(revenue), 0) AS total_revenue,
+           COALESCE(SUM(attendance), 0) AS total_attendance, COALESCE(SUM(capacity), 0) AS total_capacity
+    FROM concerts
+    UNION ALL
+    SELECT {YEAR_EXPRESSION.format(row='concerts')}, COUNT(*), COALESCE(SUM(revenue), 0),
+           COALESCE(SUM(attendance), 0), COALESCE(SUM(capacity), 0)
+    FROM concerts
+    GROUP BY 1
+'''
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+# ==================== 表结构 ====================
+def _rebuild(conn):
+    """按全量数据重写合计表与行数表（调用方负责事务）"""
+    conn.execute("DELETE FROM concert_totals")
+    conn.execute(f"INSERT INTO concert_totals (scope, {', '.join(TOTAL_COLUMNS)}) {RECOMPUTE_SQL}")
+    conn.execute("DELETE FROM table_counts")
+    for table_name in COUNTED_TABLES:
+        conn.execute(f"INSERT INTO table_counts (table_name, row_count) "
+                     f"SELECT '{table_name}', COUNT(*) FROM {table_name}")
+
+
+def ensure_totals_schema(conn):
+    """创建合计表与触发器；首次创建时在同一事务内按全量数据初始化"""
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'concert_totals'"
+        ).fetchone()
+        for statement in TOTALS_SCHEMA:
+            conn.execute(statement)
+        if not exists:
+            _rebuild(conn)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def rebuild_totals(db_path=DB_PATH):
+    """按全量数据重建合计（校验不一致时使用）"""
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild(conn)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _connect(db_path=DB_PATH):
+    """打开合计使用的连接，每个数据库只初始化一次表结构"""
+    conn = connect(db_path, check_same_thread=False, isolation_level=None)
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            try:
+                ensure_totals_schema(conn)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            _schema_ready.add(db_path)
+    return conn
+
+
+def _read(db_path, reader):
+    """执行读取；数据库文件被重新创建（合计表不存在）时重新初始化后再读一次"""
+    for attempt in range(2):
+        conn = _connect(db_path)
+        try:
+            return reader(conn)
+        except sqlite3.OperationalError:
+            if attempt:
+                raise
+            with _schema_lock:
+                _schema_ready.discard(db_path)
+        finally:
+            conn.close()
+
+
+# ==================== 读取 ====================
+def get_totals(db_path=DB_PATH):
+    """返回全部演唱会的合计与歌手、城市数量"""
+    def reader(conn):
+        row = conn.execute(
+            f"SELECT {', '.join(TOTAL_COLUMNS)} FROM concert_totals WHERE scope = 'all'"
+        ).fetchone()
+        totals = dict(zip(TOTAL_COLUMNS, row or (0, 0.0, 0, 0)))
+        counts = dict(conn.execute("SELECT table_name, row_count FROM table_counts").fetchall())
+        for table_name, key in COUNTED_TABLES.items():
+            totals[key] = counts.get(table_name, 0)
+        return totals
+
+    totals = _read(db_path, reader)
+    totals['attendance_rate'] = (totals['total_attendance'] / totals['total_capacity']
+                                 if totals['total_capacity'] else 0.0)
+    return totals
+
+
+def get_yearly_totals(db_path=DB_PATH):
+    """返回各年度的合计，按年度排序"""
+    def reader(conn):
+        return pd.read_sql_query(
+            f"SELECT scope AS year, {', '.join(TOTAL_COLUMNS)} FROM concert_totals "
+            "WHERE scope <> 'all' ORDER BY scope",
+            conn
+        )
+
+    return _read(db_path, reader)
+
+
+# ==================== 校验 ====================
+def check_totals(db_path=DB_PATH):
+    """将触发器维护的合计与全量重新计算的结果逐项比较，返回不一致的项"""
+    def reader(conn):
+        stored = pd.read_sql_query("SELECT * FROM concert_totals", conn).set_index('scope')
+        expected = pd.read_sql_query(RECOMPUTE_SQL, conn).set_index('scope')
+        stored_counts = dict(conn.execute("SELECT table_name, row_count FROM table_counts").fetchall())
+        expected_counts = {table_name: conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+                           for table_name in COUNTED_TABLES}
+        return stored, expected, stored_counts, expected_counts
+
+    stored, expected, stored_counts, expected_counts = _read(db_path, reader)
+
+    mismatches = []
+    for scope in sorted(set(stored.index) | set(expected.index)):
+        for column in TOTAL_COLUMNS:
+            stored_value = stored[column].get(scope, 0)
+            expected_value = expected[column].get(scope, 0)
+            tolerance = REVENUE_TOLERANCE if column == 'total_revenue' else 0
+            if abs(float(stored_value) - float(expected_value)) > tolerance:
+                cast = float if column == 'total_revenue' else int
+                mismatches.append({'scope': scope, 'column': column,
+                                   'stored': cast(stored_value), 'expected': cast(expected_value)})
+    for table_name in COUNTED_TABLES:
+        if stored_counts.get(table_name) != expected_counts[table_name]:
+            mismatches.append({'scope': table_name, 'column': 'row_count',
+                               'stored': stored_counts.get(table_name), 'expected': expected_counts[table_name]})
+
+    return {'ok': not mismatches, 'checked_scopes': len(expected) + len(COUNTED_TABLES), 'mismatches': mismatches}
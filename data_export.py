@@ -0,0 +1,270 @@
+import argparse
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from db_config import DB_PATH, connect, database_exists
+
+# ==================== 导出配置 ====================
+# 每批读取的行数，内存占用只与批大小有关，与表大小无关
+BATCH_SIZE = 10000
+
+EXPORT_FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow'
+}
+
+EXPORT_MIME_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file'
+}
+
+
+# ==================== 类型映射 ====================
+def sqlite_type_to_arrow(declared_type):
+    """根据SQLite声明类型（按SQLite亲和性规则）返回Arrow类型"""
+    declared_type = (declared_type or '').upper()
+
+    if 'INT' in declared_type:
+        return pa.int64()
+    if 'REAL' in declared_type or 'FLOA' in declared_type or 'DOUB' in declared_type:
+        return pa.float64()
+    if 'BLOB' in declared_type:
+        return pa.binary()
+    # TEXT、DATE、TIMESTAMP等按原样以字符串导出，避免解析失败丢数据
+    return pa.string()
+
+
+def _value_type(value):
+    """返回单个Python值对应的Arrow类型"""
+    if isinstance(value, bool):
+        return pa.bool_()
+    if isinstance(value, int):
+        return pa.int64()
+    if isinstance(value, float):
+        return pa.float64()
+    if isinstance(value, bytes):
+        return pa.binary()
+    return pa.string()
+
+
+def merge_arrow_types(current, other):
+    """合并两个列类型：整数与浮点数合并为float64，其他不一致的组合退化为字符串"""
+    if current == other or pa.types.is_null(other):
+        return current
+    if pa.types.is_null(current):
+        return other
+    numeric = {pa.bool_(), pa.int64(), pa.float64()}
+    if current in numeric and other in numeric:
+        return pa.float64() if pa.float64() in (current, other) else pa.int64()
+    return pa.string()
+
+
+def infer_arrow_type(values):
+    """根据一批数据中的全部非NULL值推断列的Arrow类型（整列都是NULL时为null类型）"""
+    arrow_type = pa.null()
+    for value_type in {_value_type(value) for value in values if value is not None}:
+        arrow_type = merge_arrow_types(arrow_type, value_type)
+    return arrow_type
+
+
+def merge_schemas(current, other):
+    """逐列合并两个同名同序的schema"""
+    return pa.schema([
+        pa.field(field.name, merge_arrow_types(field.type, other_field.type))
+        for field, other_field in zip(current, other)
+    ])
+
+
+def table_schema(conn, table_name):
+    """根据表的列声明生成Arrow schema"""
+    columns = conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+    return pa.schema([pa.field(col[1].lower(), sqlite_type_to_arrow(col[2])) for col in columns])
+
+
+def list_tables(conn):
+    """返回数据库中的用户表"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+# ==================== 分批读取 ====================
+def _column_to_array(values, arrow_type):
+    """将一列Python值转换为Arrow数组（arrow_type已按整列的值推断并合并）"""
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        if arrow_type == pa.float64():
+            return pa.array([None if v is None else float(v) for v in values], type=arrow_type)
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def iter_record_batches(conn, query, params=None, batch_size=BATCH_SIZE, schema=None):
+    """执行查询并按批生成Arrow RecordBatch
+
+    schema为给定的列声明类型（None时从第一批数据开始推断），每批再按实际的值放宽：
+    整数列出现浮点数时变为float64，出现文本时变为字符串。后面的批可能比前面的批更宽，
+    需要统一类型时使用 unify_batches，流式写文件时见 export_query。
+    """
+    cursor = conn.cursor()
+    try:
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+
+        if cursor.description is None:
+            return
+
+        column_names = [col[0].lower() for col in cursor.description]
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            columns = list(zip(*rows))
+
+            batch_schema = pa.schema([
+                pa.field(name, infer_arrow_type(values))
+                for name, values in zip(column_names, columns)
+            ])
+            schema = batch_schema if schema is None else merge_schemas(schema, batch_schema)
+
+            arrays = [
+                _column_to_array(list(values), field.type)
+                for values, field in zip(columns, schema)
+            ]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+    finally:
+        cursor.close()
+
+
+def unify_batches(batches, schema=None):
+    """把各批转换为合并后的同一schema，返回 (schema, batches)"""
+    batches = list(batches)
+    for batch in batches:
+        schema = batch.schema if schema is None else merge_schemas(schema, batch.schema)
+    return schema, [batch if batch.schema == schema else batch.cast(schema) for batch in batches]
+
+
+# ==================== 导出函数 ====================
+class _SchemaWidened(Exception):
+    """流式写出过程中后面的批需要更宽的列类型"""
+
+    def __init__(self, schema):
+        super().__init__(str(schema))
+        self.schema = schema
+
+def _open_writer(sink, schema, fmt):
+    """按格式创建流式写入器"""
+    if fmt == 'parquet':
+        return pq.ParquetWriter(sink, schema, compression='zstd')
+    if fmt == 'arrow':
+        return pa.ipc.new_file(sink, schema)
+    raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def export_query(query, output, fmt='parquet', params=None, db_path=DB_PATH,
+                 batch_size=BATCH_SIZE, schema=None, conn=None):
+    """将查询结果按批流式写入Parquet或Arrow IPC文件，返回导出的行数"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(db_path, read_only=True, check_same_thread=False)
+
+    try:
+        while True:
+            try:
+                return _write_batches(conn, query, output, fmt, params, batch_size, schema)
+            except _SchemaWidened as e:
+                # 已写出的批无法再改类型：按放宽后的schema重新导出（类型只会变宽，最多重来有限次）
+                schema = e.schema
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _write_batches(conn, query, output, fmt, params, batch_size, schema):
+    """按第一批的schema打开写入器并写出各批，后面的批类型更宽时抛出 _SchemaWidened"""
+    writer = None
+    writer_schema = None
+    row_count = 0
+    try:
+        for batch in iter_record_batches(conn, query, params, batch_size, schema):
+            if writer is None:
+                writer_schema = batch.schema
+                writer = _open_writer(output, writer_schema, fmt)
+            elif batch.schema != writer_schema:
+                raise _SchemaWidened(batch.schema)
+            writer.write_batch(batch)
+            row_count += batch.num_rows
+
+        # 结果为空时也写出带schema的空文件
+        if writer is None:
+            empty_schema = schema if schema is not None else pa.schema([])
+            writer = _open_writer(output, empty_schema, fmt)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return row_count
+
+
+def export_table(table_name, output, fmt='parquet', db_path=DB_PATH, batch_size=BATCH_SIZE, conn=None):
+    """按表的列声明类型导出整张表，返回导出的行数"""
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(db_path, read_only=True, check_same_thread=False)
+
+    try:
+        if table_name not in list_tables(conn):
+            raise ValueError(f"表不存在: {table_name}")
+
+        schema = table_schema(conn, table_name)
+        return export_query(f'SELECT * FROM "{table_name}"', output, fmt,
+                            batch_size=batch_size, schema=schema, conn=conn)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def default_file_name(name, fmt):
+    """生成导出文件名"""
+    return f"{name}{EXPORT_FORMATS[fmt]}"
+
+
+# ==================== 命令行入口 ====================
+def main(argv=None):
+    """命令行导出：python data_export.py --table concerts --format parquet"""
+    parser = argparse.ArgumentParser(description="将数据表或SQL查询结果导出为Parquet/Arrow IPC文件")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--table", help="要导出的表名")
+    source.add_argument("--query", help="要导出的SELECT语句")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="parquet", help="导出格式")
+    parser.add_argument("--output", "-o", help="输出文件路径（默认按表名生成）")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="每批读取的行数")
+    args = parser.parse_args(argv)
+
+    if not database_exists(args.db):
+        parser.error(f"数据库文件不存在: {args.db}")
+
+    output = args.output or default_file_name(args.table or "query_result", args.format)
+
+    if args.table:
+        row_count = export_table(args.table, output, args.format, args.db, args.batch_size)
+    else:
+        row_count = export_query(args.query, output, args.format, db_path=args.db, batch_size=args.batch_size)
+
+    print(f"已导出 {row_count} 行数据到 {os.path.abspath(output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
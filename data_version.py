@@ -0,0 +1,58 @@
+import sqlite3
+import threading
+
+from db_config import DB_PATH, connect
+from storage import get_backend
+
+# ==================== 数据版本 ====================
+# 进程级的数据版本号，用于判断各类缓存是否过期。
+# 由两部分组成：
+#   1. 专用监视连接上的 PRAGMA data_version，其他任何连接（包括其他进程）提交写入后都会变化
+#   2. 本进程内的写入计数，由 execute_sql 等写入路径调用 bump_data_version() 递增
+# 非SQLite后端没有可供读取的变更计数，版本只包含本进程的写入计数，query_database对这类后端不做缓存。
+
+_lock = threading.Lock()
+_monitor_conn = None
+_local_writes = 0
+
+
+def _get_monitor_connection(db_path=DB_PATH):
+    """获取用于读取 data_version 的专用连接（只读、永不写入）"""
+    global _monitor_conn
+    if _monitor_conn is None:
+        _monitor_conn = connect(db_path, check_same_thread=False)
+    return _monitor_conn
+
+
+def current_data_version(db_path=DB_PATH):
+    """返回当前数据版本（可比较、可作为缓存键）"""
+    with _lock:
+        if get_backend().dialect != 'sqlite':
+            return (None, _local_writes)
+        try:
+            db_version = _get_monitor_connection(db_path).execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"读取数据版本失败: {str(e)}")
+            db_version = -1
+        return (db_version, _local_writes)
+
+
+def bump_data_version():
+    """本进程写入数据后调用，使所有依赖数据版本的缓存失效"""
+    global _local_writes
+    with _lock:
+        _local_writes += 1
+        return _local_writes
+
+
+def reset_monitor_connection():
+    """关闭监视连接并使缓存失效（数据库文件被替换后调用）"""
+    global _monitor_conn, _local_writes
+    with _lock:
+        if _monitor_conn is not None:
+            try:
+                _monitor_conn.close()
+            except sqlite3.Error:
+                pass
+            _monitor_conn = None
+        _local_writes += 1
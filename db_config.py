@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import toml as tomllib
+    except ImportError:
+        tomllib = None
+
+# ==================== 数据库位置配置 ====================
+# 业务库的位置按以下顺序确定：
+#   1. 环境变量 STAR_DB_URI
+#   2. 配置文件 [database] 段的 uri（文件由环境变量 STAR_SETTINGS_FILE 指定，默认 settings.toml）
+#   3. 默认的 concert_management.db
+# 可以是普通文件路径（例如tmpfs上的路径），也可以是SQLite URI（file:...?...）。
+# ":memory:" 表示进程内的命名内存库（memdb VFS）：所有连接访问同一个内存库，
+# 由一个常驻连接保证内存库在进程退出前一直存在（只能在单进程内使用，写入进程模式不可用）。
+# 不使用共享缓存（cache=shared）：共享缓存的表级锁返回SQLITE_LOCKED，busy_timeout不会重试，
+# 并发读取在写入期间直接失败；memdb使用与文件库相同的库级锁，等待超时规则不变。
+DEFAULT_DB_PATH = "concert_management.db"
+DEFAULT_ARCHIVE_PATH = "concert_archive.db"
+
+DB_URI_ENV = "STAR_DB_URI"
+SETTINGS_FILE_ENV = "STAR_SETTINGS_FILE"
+DEFAULT_SETTINGS_FILE = "settings.toml"
+
+MEMORY_URI = "file:/star_memdb?vfs=memdb"
+
+_keepalive_lock = threading.Lock()
+_keepalive = {}
+
+
+# ==================== 配置读取 ====================
+def load_settings(path=None):
+    """读取配置文件，文件不存在或无法解析时返回空字典"""
+    path = path or os.environ.get(SETTINGS_FILE_ENV, DEFAULT_SETTINGS_FILE)
+    if not os.path.exists(path):
+        return {}
+    if tomllib is None:
+        print(f"未安装toml，忽略配置文件 {path}")
+        return {}
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        # tomllib与toml包都接受str
+        return tomllib.loads(content.decode('utf-8'))
+    except Exception as e:
+        print(f"读取配置文件 {path} 失败: {str(e)}")
+        return {}
+
+
+def resolve_db_uri():
+    """按环境变量、配置文件、默认值的顺序确定数据库位置"""
+    uri = os.environ.get(DB_URI_ENV) or load_settings().get('database', {}).get('uri') or DEFAULT_DB_PATH
+    return MEMORY_URI if uri == ':memory:' else uri
+
+
+DB_PATH = resolve_db_uri()
+
+
+# ==================== 路径与URI ====================
+def is_uri(db_path):
+    """是否为SQLite URI"""
+    return db_path.startswith('file:')
+
+
+def is_memory(db_path):
+    """是否为内存库"""
+    return db_path == ':memory:' or (is_uri(db_path) and ('vfs=memdb' in db_path or 'mode=memory' in db_path))
+
+
+def database_file(db_path=DB_PATH):
+    """返回数据库对应的文件路径，内存库返回None"""
+    if is_memory(db_path):
+        return None
+    if is_uri(db_path):
+        return db_path[len('file:'):].split('?', 1)[0]
+    return db_path
+
+
+def database_name(db_path=DB_PATH):
+    """返回数据库名（不含目录与扩展名），用于快照等文件的命名"""
+    if is_memory(db_path):
+        return db_path[len('file:'):].split('?', 1)[0].lstrip('/') if is_uri(db_path) else 'memory'
+    return os.path.splitext(os.path.basename(database_file(db_path)))[0]
+
+
+def archive_path_for(db_path=DB_PATH):
+    """热度归档库的位置：默认业务库对应 concert_archive.db，其他文件库为同目录下的 <库名>_archive.db，
+    内存库对应另一个命名内存库"""
+    if is_memory(db_path):
+        return f"file:/{database_name(db_path)}_archive?vfs=memdb"
+    if db_path == DEFAULT_DB_PATH:
+        return DEFAULT_ARCHIVE_PATH
+    path = database_file(db_path)
+    return os.path.join(os.path.dirname(path), f"{database_name(db_path)}_archive.db")
+
+
+def with_uri_params(db_path, **params):
+    """在路径或URI上追加查询参数，返回URI"""
+    uri = db_path if is_uri(db_path) else f"file:{db_path}"
+    query = '&'.join(f"{key}={value}" for key, value in params.items())
+    return f"{uri}{'&' if '?' in uri else '?'}{query}"
+
+
+ARCHIVE_DB_PATH = archive_path_for(DB_PATH)
+
+
+# ==================== 连接 ====================
+def _keep_memory_database_alive(db_path):
+    """内存库在最后一个连接关闭时销毁，因此为每个内存库保留一个常驻连接"""
+    with _keepalive_lock:
+        if db_path not in _keepalive:
+            _keepalive[db_path] = sqlite3.connect(db_path, uri=True, check_same_thread=False)
+
+
+def connect(db_path=DB_PATH, read_only=False, **kwargs):
+    """按路径或URI打开SQLite连接；read_only为True时以只读方式打开"""
+    if db_path == ':memory:':
+        db_path = MEMORY_URI
+    if is_memory(db_path):
+        _keep_memory_database_alive(db_path)
+        if read_only and 'mode=memory' in db_path:
+            # 显式指定的共享缓存内存库不能以mode=ro打开，改为禁止写入
+            conn = sqlite3.connect(db_path, uri=True, **kwargs)
+            conn.execute("PRAGMA query_only = ON")
+            return conn
+    if read_only:
+        return sqlite3.connect(with_uri_params(db_path, mode='ro'), uri=True, **kwargs)
+    return sqlite3.connect(db_path, uri=is_uri(db_path), **kwargs)
+
+
+def database_exists(db_path=DB_PATH):
+    """数据库是否存在（内存库总是存在）"""
+    if is_memory(db_path):
+        return True
+    return os.path.exists(database_file(db_path))
+
+
+def database_size(db_path=DB_PATH):
+    """数据库大小（字节）；内存库按页数计算，不存在时为0"""
+    if is_memory(db_path):
+        conn = connect(db_path)
+        try:
+            return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+        finally:
+            conn.close()
+    path = database_file(db_path)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def describe_database(db_path=DB_PATH):
+    """返回数据库位置说明（用于页面展示）"""
+    if is_memory(db_path):
+        return f"内存库 ({db_path})"
+    return os.path.abspath(database_file(db_path))
@@ -0,0 +1,157 @@
+import pandas as pd
+import pyarrow as pa
+
+# ==================== 列类型映射 ====================
+# 按列名统一规定缓存DataFrame的紧凑类型：
+#   - 低基数文本列（城市、场馆、流派、国籍、状态）使用 category
+#   - ID与计数使用可空小整数
+#   - 评分与比率使用 float32，金额保留 float64 以免精度损失
+COLUMN_DTYPES = {
+    # ID
+    'singer_id': 'Int32',
+    'concert_id': 'Int32',
+    'popularity_id': 'Int32',
+    'city_id': 'Int32',
+
+    # 计数
+    'debut_year': 'Int16',
+    'capacity': 'Int32',
+    'attendance': 'Int32',
+    'fan_count': 'Int32',
+    'social_media_mentions': 'Int32',
+    'population': 'Int32',
+    'avg_concert_capacity': 'Int32',
+    'concert_frequency': 'Int16',
+    'record_count': 'Int32',
+    'row_version': 'Int32',
+
+    # 评分与比率
+    'attendance_rate': 'float32',
+    'topic_score': 'float32',
+    'popularity_score': 'float32',
+    'topic_score_min': 'float32',
+    'topic_score_max': 'float32',
+    'popularity_score_min': 'float32',
+    'popularity_score_max': 'float32',
+
+    # 金额
+    'ticket_price': 'float64',
+    'revenue': 'float64',
+
+    # 低基数文本
+    'nationality': 'category',
+    'genre': 'category',
+    'active_status': 'category',
+    'city': 'category',
+    'venue': 'category',
+    'country': 'category',
+
+    # 日期
+    'birth_date': 'datetime64[ns]',
+    'concert_date': 'datetime64[ns]',
+    'record_date': 'datetime64[ns]',
+    'created_at': 'datetime64[ns]',
+    'last_record_date': 'datetime64[ns]'
+}
+
+# pandas类型对应的Arrow类型（category对应字典编码）
+ARROW_TYPES = {
+    'Int16': pa.int16(),
+    'Int32': pa.int32(),
+    'Int64': pa.int64(),
+    'float32': pa.float32(),
+    'float64': pa.float64(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'datetime64[ns]': pa.timestamp('s')
+}
+
+
+# ==================== pandas ====================
+def apply_compact_dtypes(df):
+    """按列类型映射转换DataFrame，无法转换的列保持原样"""
+    for col in df.columns:
+        dtype = COLUMN_DTYPES.get(col)
+        if dtype is None:
+            continue
+        try:
+            if dtype == 'category':
+                df[col] = df[col].astype('category')
+            elif dtype.startswith('datetime'):
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+            else:
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        except (TypeError, ValueError, OverflowError) as e:
+            print(f"列 {col} 转换为 {dtype} 失败: {str(e)}")
+    return df
+
+
+def fillna_category(series, value):
+    """填充缺失值，category列会先补充新的类别"""
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+# ==================== Arrow ====================
+def compact_arrow_table(table):
+    """按列类型映射转换Arrow表，无法安全转换的列保持原样"""
+    for index, field in enumerate(table.schema):
+        dtype = COLUMN_DTYPES.get(field.name)
+        if dtype is None or dtype.startswith('datetime'):
+            continue
+
+        column = table.column(index)
+        try:
+            if dtype == 'category':
+                if not pa.types.is_string(field.type):
+                    continue
+                column = column.dictionary_encode()
+            else:
+                column = column.cast(ARROW_TYPES[dtype])
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            print(f"列 {field.name} 转换为 {dtype} 失败: {str(e)}")
+            continue
+
+        table = table.set_column(index, pa.field(field.name, column.type), column)
+    return table
+
+
+def arrow_types_mapper(arrow_type):
+    """Arrow转pandas时的类型映射：字典编码列转为category，其余使用ArrowDtype"""
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+# ==================== 内存报告 ====================
+def frame_memory_bytes(df):
+    """DataFrame实际占用的内存（含字符串内容）"""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def legacy_memory_bytes(table):
+    """按原始方式（object字符串 + float64数值）加载同样数据时的内存占用"""
+    df = table.to_pandas()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+        elif pd.api.types.is_integer_dtype(df[col].dtype) or pd.api.types.is_float_dtype(df[col].dtype):
+            df[col] = df[col].astype('float64')
+    return frame_memory_bytes(df)
+
+
+def memory_report(tables):
+    """生成各缓存表的内存报告，tables为 {表名: Arrow表}"""
+    report = []
+    for table_name, table in tables.items():
+        compact_bytes = frame_memory_bytes(table.to_pandas(types_mapper=arrow_types_mapper))
+        legacy_bytes = legacy_memory_bytes(table)
+        report.append({
+            'table': table_name,
+            'rows': table.num_rows,
+            'arrow_bytes': table.nbytes,
+            'compact_bytes': compact_bytes,
+            'legacy_bytes': legacy_bytes,
+            'ratio': round(legacy_bytes / compact_bytes, 2) if compact_bytes else None
+        })
+    return report
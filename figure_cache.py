@@ -0,0 +1,135 @@
+import collections
+import json
+import threading
+
+import plotly.io as pio
+import streamlit as st
+
+from data_version import current_data_version
+from single_flight import coalesce
+
+try:
+    from streamlit.elements.lib.form_utils import current_form_id
+    from streamlit.elements.lib.utils import compute_and_register_element_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+except ImportError:
+    # Streamlit内部接口变化时退回 st.plotly_chart（会重新序列化一次）
+    PlotlyChartProto = None
+
+# ==================== 图表缓存配置 ====================
+# 以 (图表名, 数据版本, 筛选参数) 为键缓存序列化后的Plotly JSON，
+# 数据未变化时直接把JSON交给前端，不再构建图表对象，也不再重新序列化。
+MAX_ENTRIES = 128
+
+# 图表缓存的默认主题与配置，与 st.plotly_chart 的默认值一致
+DEFAULT_THEME = "streamlit"
+DEFAULT_SELECTION_MODE = ("points", "box", "lasso")
+
+_lock = threading.Lock()
+_cache = collections.OrderedDict()
+_stats = {'hits': 0, 'misses': 0}
+
+# builder 返回 None（无数据可画）时缓存的占位值
+_EMPTY = object()
+
+
+# ==================== 缓存键 ====================
+def figure_key(name, filters=None):
+    """生成缓存键：图表名、当前数据版本与排序后的筛选参数"""
+    items = tuple(sorted((filters or {}).items()))
+    return name, current_data_version(), items
+
+
+# ==================== 读取与构建 ====================
+def get_figure_json(name, builder, filters=None):
+    """返回图表的Plotly JSON，未命中时调用 builder() 构建并序列化
+
+    builder 返回 None 表示没有可展示的数据，结果同样会被缓存，此时返回 None。
+    """
+    key = figure_key(name, filters)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            spec = _cache[key]
+            return None if spec is _EMPTY else spec
+
+    # 同一张图同时只构建一次，并发的其他调用等待并共享结果
+    return coalesce('figure', key, _build_figure, key, builder)
+
+
+def _build_figure(key, builder):
+    """构建、序列化并缓存一张图表"""
+    name = key[0]
+    fig = builder()
+    spec = _EMPTY if fig is None else pio.to_json(fig, validate=False)
+
+    with _lock:
+        _stats['misses'] += 1
+        # 同一图表、同一筛选参数的旧版本数据不会再被读取，直接丢弃
+        for stale in [k for k in _cache if k[0] == name and k[2] == key[2] and k[1] != key[1]]:
+            del _cache[stale]
+        _cache[key] = spec
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return None if spec is _EMPTY else spec
+
+
+def invalidate_figures(name=None):
+    """丢弃图表缓存（name为None时清空全部，否则只清除该图表名前缀的条目）"""
+    with _lock:
+        if name is None:
+            _cache.clear()
+            return
+        for key in [key for key in _cache if key[0].startswith(name)]:
+            del _cache[key]
+
+
+def figure_cache_stats():
+    """返回缓存条目数、命中与未命中次数"""
+    with _lock:
+        total = _stats['hits'] + _stats['misses']
+        return {
+            'entries': len(_cache),
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'hit_rate': _stats['hits'] / total if total else 0.0,
+            'bytes': sum(len(spec) for spec in _cache.values() if spec is not _EMPTY)
+        }
+
+
+# ==================== 渲染 ====================
+def render_figure_json(spec, use_container_width=True, config=None):
+    """直接把缓存的Plotly JSON发送给前端，跳过图表对象的校验与序列化"""
+    if PlotlyChartProto is not None:
+        try:
+            return _enqueue_spec(spec, use_container_width, config)
+        except (TypeError, AttributeError) as e:
+            # Streamlit升级后内部接口的参数或属性变化，退回公开接口
+            print(f"直接发送图表JSON失败，改用 st.plotly_chart: {e}")
+    return st.plotly_chart(json.loads(spec), use_container_width=use_container_width, config=config)
+
+
+def _enqueue_spec(spec, use_container_width, config):
+    """通过Streamlit内部接口发送 plotly_chart 元素（与 st.plotly_chart 生成的元素一致）"""
+    dg = st._main
+    proto = PlotlyChartProto()
+    proto.use_container_width = use_container_width
+    proto.theme = DEFAULT_THEME
+    proto.form_id = current_form_id(dg)
+    proto.spec = spec
+    proto.config = json.dumps(config or {})
+    proto.id = compute_and_register_element_id(
+        "plotly_chart",
+        user_key=None,
+        key_as_main_identity=False,
+        dg=dg,
+        plotly_spec=proto.spec,
+        plotly_config=proto.config,
+        selection_mode=DEFAULT_SELECTION_MODE,
+        is_selection_activated=False,
+        theme=DEFAULT_THEME,
+        use_container_width=use_container_width
+    )
+    return dg._enqueue("plotly_chart", proto)
@@ -4,22 +4,133 @@ import numpy as np
 from datetime import datetime, timedelta
 import os
 
+from db_config import DB_PATH, connect, database_file, describe_database
+from snapshots import SnapshotError, remove_database, snapshot_before_reset
+
+
+# ==================== 数据生成 ====================
+# 真实歌手之外按规模补充的虚构歌手，属性从以下取值中随机选择
+GENERATED_NATIONALITIES = ['中国', '新加坡', '美国', '日本', '韩国']
+GENERATED_GENRES = ['流行', '摇滚', '民谣', '流行/R&B', '流行/摇滚', '说唱']
+
+# 虚构演唱会的城市与场馆
+CONCERT_VENUES = {
+    '北京': ['国家体育场', '工人体育场', '凯迪拉克中心', '五棵松体育馆'],
+    '上海': ['上海体育场', '梅赛德斯奔驰文化中心', '虹口足球场'],
+    '广州': ['天河体育场', '广州体育馆'],
+    '深圳': ['深圳湾体育中心', '深圳体育场'],
+    '成都': ['成都体育中心'],
+    '杭州': ['黄龙体育中心'],
+    '南京': ['南京奥体中心'],
+    '武汉': ['武汉体育中心'],
+    '西安': ['陕西省体育场'],
+    '重庆': ['重庆奥林匹克体育中心']
+}
+
+
+def generate_singers(count, start_id):
+    """生成count位虚构歌手（编号从start_id开始），用于按规模扩充数据"""
+    singers = []
+    for singer_id in range(start_id, start_id + count):
+        debut_year = int(np.random.randint(1985, 2021))
+        birth_year = debut_year - int(np.random.randint(16, 26))
+        singers.append((
+            f'歌手{singer_id:04d}',
+            f'{birth_year}-{np.random.randint(1, 13):02d}-{np.random.randint(1, 28):02d}',
+            np.random.choice(GENERATED_NATIONALITIES),
+            debut_year,
+            np.random.choice(GENERATED_GENRES),
+            '活跃'
+        ))
+    return singers
+
+
+def generate_concerts(singer_ids):
+    """为每位歌手随机生成2-5场演唱会"""
+    concerts = []
+    for singer_id in singer_ids:
+        num_concerts = np.random.randint(2, 6)
+        for i in range(num_concerts):
+            year = np.random.choice([2022, 2023, 2024])
+            month = np.random.randint(1, 13)
+            day = np.random.randint(1, 28)
+            city = np.random.choice(list(CONCERT_VENUES))
+
+            venue = np.random.choice(CONCERT_VENUES[city] if city in CONCERT_VENUES else ['体育场'])
+            capacity = int(np.random.choice([10000, 15000, 20000, 30000, 50000, 80000]))
+            attendance_rate = np.random.uniform(0.85, 0.99)
+            attendance = int(capacity * attendance_rate)
+            ticket_price = int(np.random.choice([300, 400, 500, 600, 800, 1000]))
+            revenue = attendance * ticket_price
+
+            concerts.append((
+                singer_id,
+                f'{year}巡回演唱会-{city}站',
+                f'{year}-{month:02d}-{day:02d}',
+                city,
+                venue,
+                capacity,
+                attendance,
+                ticket_price,
+                revenue,
+                attendance_rate
+            ))
+    return concerts
+
+
+def generate_popularity(singer_ids, months=12):
+    """为每位歌手生成从2023年1月起每月一条的热度数据"""
+    rows = []
+    for singer_id in singer_ids:
+        base_fans = np.random.randint(500000, 10000000)
+        for month in range(1, months + 1):
+            record_date = f'{2023 + (month - 1) // 12}-{(month - 1) % 12 + 1:02d}-01'
+
+            # 模拟粉丝增长
+            month_growth = np.random.uniform(0.98, 1.05)
+            fan_count = int(base_fans * (month_growth ** (month - 1)) * np.random.uniform(0.95, 1.05))
+
+            # 话题度和传唱度
+            topic_score = np.random.uniform(60, 95)
+            popularity_score = np.random.uniform(60, 95)
+
+            # 社交媒体提及
+            social_media = np.random.randint(10000, 500000)
+
+            rows.append((singer_id, record_date, fan_count, topic_score, popularity_score, social_media))
+    return rows
+
+
+def create_database_with_real_data(db_path=DB_PATH, scale=1, months=12):
+    """创建数据库并填充真实数据
 
-def create_database_with_real_data():
-    """创建数据库并填充真实数据"""
+    scale大于1时按 20 * (scale - 1) 位虚构歌手扩充数据，months为每位歌手的热度记录月数。
+    """
 
-    # 删除旧的数据库文件（如果存在）
-    if os.path.exists("concert_management.db"):
-        os.remove("concert_management.db")
-        print("已删除旧的数据库文件")
+    # 删除旧的数据库文件（如果存在）；非空数据库必须先成功生成快照
+    db_file = database_file(db_path)
+    if db_file and os.path.exists(db_file):
+        try:
+            snapshot = snapshot_before_reset(db_path)
+        except SnapshotError as e:
+            print(f"❌ {e}")
+            return False
+        if snapshot:
+            print(f"旧数据库已备份到 {snapshot}")
+        # 连同WAL文件与归档库一起删除（快照已包含归档库）
+        removed = remove_database(db_path)
+        print(f"已删除旧的数据库文件: {', '.join(removed)}")
 
     # 创建数据库连接
-    conn = sqlite3.connect("concert_management.db")
+    conn = connect(db_path)
     conn.row_factory = sqlite3.Row
 
     # 启用外键支持
     conn.execute("PRAGMA foreign_keys = ON")
 
+    # auto_vacuum只能在建表前设置，删除数据后可用增量VACUUM回收空闲页（见maintenance.py）
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
     print("正在创建数据库表...")
 
     # 创建歌手表
@@ -119,7 +230,15 @@ def create_database_with_real_data():
             VALUES (?, ?, ?, ?, ?, ?)
         ''', singer)
 
-    print(f"已插入 {len(real_singers)} 位歌手数据")
+    # 按规模补充虚构歌手
+    generated_singers = generate_singers(len(real_singers) * (scale - 1), len(real_singers) + 1)
+    cursor.executemany('''
+        INSERT INTO singers (name, birth_date, nationality, debut_year, genre, active_status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', generated_singers)
+    singer_count = len(real_singers) + len(generated_singers)
+
+    print(f"已插入 {singer_count} 位歌手数据")
 
     # 插入城市数据
     real_cities = [
@@ -190,51 +309,8 @@ def create_database_with_real_data():
 
     all_concerts = jay_concerts + jj_concerts + gemi_concerts + taylor_concerts
 
-    # 为其他歌手生成演唱会数据
-    for singer_id in range(4, 21):
-        if singer_id == 5:  # Taylor Swift已经添加了
-            continue
-
-        num_concerts = np.random.randint(2, 6)
-        for i in range(num_concerts):
-            year = np.random.choice([2022, 2023, 2024])
-            month = np.random.randint(1, 13)
-            day = np.random.randint(1, 28)
-            cities = ['北京', '上海', '广州', '深圳', '成都', '杭州', '南京', '武汉', '西安', '重庆']
-            city = np.random.choice(cities)
-
-            venues = {
-                '北京': ['国家体育场', '工人体育场', '凯迪拉克中心', '五棵松体育馆'],
-                '上海': ['上海体育场', '梅赛德斯奔驰文化中心', '虹口足球场'],
-                '广州': ['天河体育场', '广州体育馆'],
-                '深圳': ['深圳湾体育中心', '深圳体育场'],
-                '成都': ['成都体育中心'],
-                '杭州': ['黄龙体育中心'],
-                '南京': ['南京奥体中心'],
-                '武汉': ['武汉体育中心'],
-                '西安': ['陕西省体育场'],
-                '重庆': ['重庆奥林匹克体育中心']
-            }
-
-            venue = np.random.choice(venues[city] if city in venues else ['体育场'])
-            capacity = np.random.choice([10000, 15000, 20000, 30000, 50000, 80000])
-            attendance_rate = np.random.uniform(0.85, 0.99)
-            attendance = int(capacity * attendance_rate)
-            ticket_price = np.random.choice([300, 400, 500, 600, 800, 1000])
-            revenue = attendance * ticket_price
-
-            all_concerts.append((
-                singer_id,
-                f'{year}巡回演唱会-{city}站',
-                f'{year}-{month:02d}-{day:02d}',
-                city,
-                venue,
-                capacity,
-                attendance,
-                ticket_price,
-                revenue,
-                attendance_rate
-            ))
+    # 为其他歌手生成演唱会数据（Taylor Swift已经添加了）
+    all_concerts += generate_concerts([singer_id for singer_id in range(4, singer_count + 1) if singer_id != 5])
 
     # 插入演唱会数据
     for concert in all_concerts:
@@ -248,32 +324,11 @@ def create_database_with_real_data():
     print(f"已插入 {len(all_concerts)} 场演唱会数据")
 
     # 插入热度数据
-    popularity_data = []
-    pop_id = 1
-
-    for singer_id in range(1, 21):
-        base_fans = np.random.randint(500000, 10000000)
-        for month in range(1, 13):
-            record_date = f'2023-{month:02d}-01'
-
-            # 模拟粉丝增长
-            month_growth = np.random.uniform(0.98, 1.05)
-            fan_count = int(base_fans * (month_growth ** (month - 1)) * np.random.uniform(0.95, 1.05))
-
-            # 话题度和传唱度
-            topic_score = np.random.uniform(60, 95)
-            popularity_score = np.random.uniform(60, 95)
-
-            # 社交媒体提及
-            social_media = np.random.randint(10000, 500000)
-
-            cursor.execute('''
-                INSERT INTO popularity 
-                (singer_id, record_date, fan_count, topic_score, popularity_score, social_media_mentions)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (singer_id, record_date, fan_count, topic_score, popularity_score, social_media))
-
-            pop_id += 1
+    cursor.executemany('''
+        INSERT INTO popularity 
+        (singer_id, record_date, fan_count, topic_score, popularity_score, social_media_mentions)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', generate_popularity(range(1, singer_count + 1), months))
 
     print("已插入热度数据")
 
@@ -290,7 +345,7 @@ def create_database_with_real_data():
     conn.close()
 
     print("\n数据库初始化完成！")
-    print(f"数据库文件: {os.path.abspath('concert_management.db')}")
+    print(f"数据库文件: {describe_database(db_path)}")
 
     return True
 
@@ -0,0 +1,183 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+# ==================== 压力测试配置 ====================
+# 模拟N个并发用户：每个用户通过WebSocket连接一个Streamlit进程，
+# 像浏览器一样切换侧边栏页面，记录每次页面脚本从请求到运行结束的耗时。
+DEFAULT_URLS = ["http://localhost:8501"]
+DEFAULT_USERS = 10
+DEFAULT_ITERATIONS = 5
+
+# 侧边栏导航单选框的标签（见 star.py）
+MENU_LABEL = "选择功能"
+
+# 单次页面运行的超时时间（秒）
+RUN_TIMEOUT = 120.0
+
+
+def _quantile(values, q):
+    """计算分位数（最近邻插值）"""
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class SimulatedUser:
+    """一个模拟浏览器会话"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.conn = None
+        self.page_script_hash = ""
+        self.menu_id = None
+        self.menu_options = []
+
+    async def connect(self):
+        ws_url = self.url.replace("http://", "ws://").replace("https://", "wss://") + "/_stcore/stream"
+        self.conn = await websocket_connect(HTTPRequest(ws_url), subprotocols=["streamlit"])
+
+    async def run_script(self, menu_index=None):
+        """发送一次重新运行请求并等待脚本结束，返回耗时（秒）"""
+        msg = BackMsg()
+        client_state = msg.rerun_script
+        client_state.query_string = ""
+        client_state.page_script_hash = self.page_script_hash
+        if menu_index is not None and self.menu_id is not None:
+            widget = client_state.widget_states.widgets.add()
+            widget.id = self.menu_id
+            widget.int_value = menu_index
+
+        start = time.perf_counter()
+        await self.conn.write_message(msg.SerializeToString(), binary=True)
+        while True:
+            payload = await asyncio.wait_for(self.conn.read_message(), RUN_TIMEOUT)
+            if payload is None:
+                raise ConnectionError("服务器关闭了连接")
+
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            message_type = forward.WhichOneof("type")
+            if message_type == "new_session":
+                self.page_script_hash = forward.new_session.page_script_hash
+            elif message_type == "delta":
+                self._find_menu(forward.delta)
+            elif message_type == "script_finished":
+                if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                return time.perf_counter() - start
+
+    def _find_menu(self, delta):
+        """从页面元素中找到侧边栏导航单选框的widget id"""
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        if element.WhichOneof("type") == "radio" and element.radio.label == MENU_LABEL:
+            self.menu_id = element.radio.id
+            self.menu_options = list(element.radio.options)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+async def simulate_user(user_id, url, iterations, think_time, results):
+    """一个用户：打开首页后随机浏览 iterations 个页面"""
+    user = SimulatedUser(url)
+    try:
+        await user.connect()
+        elapsed = await user.run_script()
+        results.append({'user': user_id, 'url': url, 'page': '首页', 'seconds': elapsed})
+
+        for _ in range(iterations):
+            if not user.menu_options:
+                break
+            index = random.randrange(len(user.menu_options))
+            elapsed = await user.run_script(index)
+            results.append({'user': user_id, 'url': url, 'page': user.menu_options[index], 'seconds': elapsed})
+            if think_time:
+                await asyncio.sleep(random.uniform(0, think_time))
+    except Exception as e:
+        results.append({'user': user_id, 'url': url, 'page': None, 'error': str(e)})
+    finally:
+        user.close()
+
+
+async def run_load_test(urls, users, iterations, think_time=0.0):
+    """并发运行所有模拟用户，用户按轮询方式分配到各个工作进程"""
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        simulate_user(user_id, urls[user_id % len(urls)], iterations, think_time, results)
+        for user_id in range(users)
+    ])
+    return results, time.perf_counter() - start
+
+
+def summarize(results, wall_seconds):
+    """汇总吞吐量与延迟分位数"""
+    ok = [r for r in results if 'error' not in r]
+    errors = [r for r in results if 'error' in r]
+    latencies = [r['seconds'] for r in ok]
+
+    summary = {
+        'requests': len(ok),
+        'errors': len(errors),
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_rps': round(len(ok) / wall_seconds, 3) if wall_seconds else 0.0,
+        'pages': {}
+    }
+    if latencies:
+        summary['p50_ms'] = round(_quantile(latencies, 0.5) * 1000, 1)
+        summary['p95_ms'] = round(_quantile(latencies, 0.95) * 1000, 1)
+        summary['max_ms'] = round(max(latencies) * 1000, 1)
+
+    for page in sorted({r['page'] for r in ok}):
+        page_latencies = [r['seconds'] for r in ok if r['page'] == page]
+        summary['pages'][page] = {
+            'count': len(page_latencies),
+            'p50_ms': round(_quantile(page_latencies, 0.5) * 1000, 1),
+            'p95_ms': round(_quantile(page_latencies, 0.95) * 1000, 1)
+        }
+    if errors:
+        summary['error_samples'] = [r['error'] for r in errors[:5]]
+    return summary
+
+
+# ==================== 命令行入口 ====================
+def main(argv=None):
+    """命令行压测：python loadtest.py --users 20 --url http://localhost:8501 --url http://localhost:8502"""
+    parser = argparse.ArgumentParser(description="模拟多个并发用户浏览页面，统计吞吐量与P95延迟")
+    parser.add_argument("--url", action="append", help="工作进程地址，可重复指定（默认 http://localhost:8501）")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS, help="并发用户数")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="每个用户浏览的页面数")
+    parser.add_argument("--think-time", type=float, default=0.0, help="两次页面切换之间的最长随机间隔（秒）")
+    parser.add_argument("--output", "-o", help="将结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    urls = args.url or DEFAULT_URLS
+    results, wall_seconds = asyncio.run(run_load_test(urls, args.users, args.iterations, args.think_time))
+    summary = summarize(results, wall_seconds)
+
+    print(f"并发用户 {args.users}，工作进程 {len(urls)} 个：完成 {summary['requests']} 次页面运行，"
+          f"失败 {summary['errors']} 次，耗时 {summary['wall_seconds']} 秒")
+    print(f"吞吐量 {summary['throughput_rps']} 次/秒，P50 {summary.get('p50_ms')} ms，P95 {summary.get('p95_ms')} ms")
+    for page, stats in summary['pages'].items():
+        print(f"  {page}: {stats['count']} 次，P50 {stats['p50_ms']} ms，P95 {stats['p95_ms']} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return 0 if not summary['errors'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,504 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+from archive import ARCHIVE_SCHEMA, attach_archive
+from data_version import bump_data_version
+from db_config import DB_PATH, connect, database_exists, database_size
+from writer_service import submit_transaction, writer_configured
+
+# ==================== 数据维护 ====================
+# 级联删除与孤儿清理都以集合方式在SQL中完成，并在同一个事务内提交：
+#   - 要删除的歌手以JSON数组传入（json_each展开），依次删除热度、演唱会（含归档库中的热度）和歌手
+#   - 多进程部署时这些语句作为一个请求交给写入进程执行（submit_transaction）
+#   - 孤儿清理删除 singer_id 指向不存在歌手的演唱会与热度记录，以及失去来源的汇总行
+# 汇总、合计与全文索引由各自的触发器同步更新。
+# 提交后执行增量VACUUM把空闲页归还给文件系统，并报告删除的行数与回收的页数；
+# 新建的数据库在建表前设置了 auto_vacuum = INCREMENTAL，旧数据库需先执行 enable-incremental-vacuum。
+# 日常维护：ANALYZE更新查询规划器的统计信息，integrity_check/quick_check检查完整性，
+# dbstat统计各表与索引占用的页数；这些任务可以交给后台线程按间隔定时执行。
+
+# 引用 singers.singer_id 的表（按删除顺序）
+CHILD_TABLES = ['popularity', 'concerts']
+
+# 每次增量VACUUM最多回收的页数，0表示回收全部空闲页
+DEFAULT_VACUUM_PAGES = 0
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+# 快速ANALYZE时每个索引最多扫描的行数（PRAGMA analysis_limit），0表示不限制
+ANALYSIS_LIMIT = 1000
+
+# 完整性检查最多报告的错误数
+MAX_INTEGRITY_ERRORS = 100
+
+# 可定时执行的维护任务及默认间隔（秒）
+SCHEDULED_TASKS = {
+    'analyze': '更新统计信息（ANALYZE）',
+    'vacuum': '增量VACUUM',
+    'quick_check': '快速完整性检查（quick_check）'
+}
+
+DEFAULT_INTERVALS = {
+    'analyze': 6 * 3600,
+    'vacuum': 24 * 3600,
+    'quick_check': 24 * 3600
+}
+
+# 调度线程检查到期任务的间隔（秒）
+SCHEDULER_POLL_SECONDS = 30
+
+# 保留的任务执行记录数
+HISTORY_SIZE = 50
+
+_scheduler_lock = threading.Lock()
+_scheduler = {'thread': None, 'stop': None, 'db_path': DB_PATH, 'intervals': {}, 'next_run': {}}
+_history = deque(maxlen=HISTORY_SIZE)
+
+
+# ==================== 页统计 ====================
+def page_stats(conn, schema='main'):
+    """返回数据库的页大小、总页数与空闲页数"""
+    return {
+        'page_size': conn.execute(f"PRAGMA {schema}.page_size").fetchone()[0],
+        'page_count': conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0],
+        'freelist_count': conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+    }
+
+
+def auto_vacuum_mode(conn):
+    """返回当前的auto_vacuum模式（none、full、incremental）"""
+    return AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 'none')
+
+
+def incremental_vacuum(conn, pages=DEFAULT_VACUUM_PAGES):
+    """回收空闲页（仅incremental模式有效），返回回收的页数"""
+    if auto_vacuum_mode(conn) != 'incremental':
+        return 0
+    before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    # execute() 只执行一步（回收一页），用 executescript() 执行到结束
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+    return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def enable_incremental_vacuum(db_path=DB_PATH):
+    """将数据库切换为incremental auto_vacuum模式，返回切换前后的页统计
+
+    需要一次完整VACUUM，期间独占数据库，并且会使其他已打开连接的表结构缓存失效，
+    应在应用停止时通过命令行执行：python maintenance.py enable-incremental-vacuum
+    """
+    conn = _connect(db_path, attach=False)
+    try:
+        before = page_stats(conn)
+        if auto_vacuum_mode(conn) != 'incremental':
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        after = page_stats(conn)
+    finally:
+        conn.close()
+    bump_data_version()
+    return {'before': before, 'after': after, 'auto_vacuum': 'incremental'}
+
+
+# ==================== 级联删除与孤儿清理 ====================
+def _connect(db_path=DB_PATH, attach=True):
+    """打开维护使用的连接（自动提交模式，由调用方显式开启事务）"""
+    conn = connect(db_path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA busy_timeout = 5000")
+    if attach:
+        attach_archive(conn)
+    return conn
+
+
+def _table_exists(conn, table_name, schema='main'):
+    """判断表是否存在"""
+    return conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone() is not None
+
+
+def _schemas(conn):
+    """返回连接上的数据库名（main、temp与挂载的库）"""
+    return [row[1] for row in conn.execute("PRAGMA database_list")]
+
+
+def _run_in_transaction(conn, statements, vacuum_pages):
+    """在一个事务内依次执行 [(名称, sql, 参数)]，提交后增量VACUUM，返回报告"""
+    start = time.perf_counter()
+    before = page_stats(conn)
+    deleted = {}
+    if writer_configured():
+        # 多进程部署时整组语句交给写入进程，在同一个SAVEPOINT内执行
+        rowcounts = submit_transaction([(sql, params) for _, sql, params in statements])['rowcounts']
+        for (name, _, _), count in zip(statements, rowcounts):
+            deleted[name] = deleted.get(name, 0) + count
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    else:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for name, sql, params in statements:
+                deleted[name] = deleted.get(name, 0) + conn.execute(sql, params).rowcount
+            violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    vacuumed = incremental_vacuum(conn, vacuum_pages)
+    after = page_stats(conn)
+    if any(deleted.values()):
+        bump_data_version()
+
+    return {
+        'deleted': deleted,
+        'total_deleted': sum(deleted.values()),
+        'foreign_key_violations': len(violations),
+        'auto_vacuum': auto_vacuum_mode(conn),
+        'pages_before': before['page_count'],
+        'pages_after': after['page_count'],
+        'freelist_after': after['freelist_count'],
+        'reclaimed_pages': vacuumed,
+        'reclaimed_bytes': vacuumed * after['page_size'],
+        'seconds': round(time.perf_counter() - start, 4)
+    }
+
+
+def delete_singers(singer_ids, db_path=DB_PATH, vacuum_pages=DEFAULT_VACUUM_PAGES):
+    """级联删除歌手及其演唱会、热度记录（含归档），返回删除与回收报告"""
+    singer_ids = sorted({int(singer_id) for singer_id in singer_ids})
+    conn = _connect(db_path)
+    try:
+        doomed = "SELECT value FROM json_each(?)"
+        params = (json.dumps(singer_ids),)
+        statements = []
+        if ARCHIVE_SCHEMA in _schemas(conn) and _table_exists(conn, 'popularity', ARCHIVE_SCHEMA):
+            statements.append(('archive.popularity',
+                               f"DELETE FROM {ARCHIVE_SCHEMA}.popularity WHERE singer_id IN ({doomed})", params))
+        statements += [(table, f"DELETE FROM main.{table} WHERE singer_id IN ({doomed})", params)
+                       for table in CHILD_TABLES]
+        statements.append(('singers', f"DELETE FROM main.singers WHERE singer_id IN ({doomed})", params))
+
+        report = _run_in_transaction(conn, statements, vacuum_pages)
+    finally:
+        conn.close()
+    report['singer_ids'] = singer_ids
+    return report
+
+
+def sweep_orphans(db_path=DB_PATH, vacuum_pages=DEFAULT_VACUUM_PAGES):
+    """删除引用不存在歌手的记录与失去来源的汇总行，返回删除与回收报告"""
+    conn = _connect(db_path)
+    try:
+        dangling = "singer_id IS NOT NULL AND singer_id NOT IN (SELECT singer_id FROM main.singers)"
+        statements = [(table, f"DELETE FROM main.{table} WHERE {dangling}", ()) for table in CHILD_TABLES]
+        if ARCHIVE_SCHEMA in _schemas(conn) and _table_exists(conn, 'popularity', ARCHIVE_SCHEMA):
+            statements.append(('archive.popularity', f"DELETE FROM {ARCHIVE_SCHEMA}.popularity WHERE {dangling}", ()))
+        if _table_exists(conn, 'popularity_rollup'):
+            statements.append(('popularity_rollup', f"DELETE FROM main.popularity_rollup WHERE {dangling}", ()))
+        if _table_exists(conn, 'search_index'):
+            statements.append(('search_index',
+                               "DELETE FROM main.search_index WHERE kind = 'singer' "
+                               "AND ref_id NOT IN (SELECT singer_id FROM main.singers)", ()))
+            statements.append(('search_index',
+                               "DELETE FROM main.search_index WHERE kind = 'concert' "
+                               "AND ref_id NOT IN (SELECT concert_id FROM main.concerts)", ()))
+        report = _run_in_transaction(conn, statements, vacuum_pages)
+    finally:
+        conn.close()
+    return report
+
+
+def count_orphans(db_path=DB_PATH):
+    """统计各表中引用不存在歌手的行数（不删除）"""
+    conn = _connect(db_path)
+    try:
+        dangling = "singer_id IS NOT NULL AND singer_id NOT IN (SELECT singer_id FROM main.singers)"
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {dangling}").fetchone()[0]
+                  for table in CHILD_TABLES}
+        if ARCHIVE_SCHEMA in _schemas(conn) and _table_exists(conn, 'popularity', ARCHIVE_SCHEMA):
+            counts['archive.popularity'] = conn.execute(
+                f"SELECT COUNT(*) FROM {ARCHIVE_SCHEMA}.popularity WHERE {dangling}"
+            ).fetchone()[0]
+    finally:
+        conn.close()
+    return counts
+
+
+def format_report(report):
+    """将报告格式化为一行文字"""
+    deleted = '，'.join(f"{name} {count} 行" for name, count in report['deleted'].items() if count) or '无'
+    return (f"删除：{deleted}；回收 {report['reclaimed_pages']} 页（{report['reclaimed_bytes'] / 1024:.1f} KB），"
+            f"剩余空闲页 {report['freelist_after']}，auto_vacuum={report['auto_vacuum']}，"
+            f"耗时 {report['seconds']} 秒")
+
+
+# ==================== 统计信息与完整性检查 ====================
+def analyze(db_path=DB_PATH, full=False):
+    """更新查询规划器的统计信息：full为False时按analysis_limit抽样，之后执行PRAGMA optimize"""
+    start = time.perf_counter()
+    conn = _connect(db_path, attach=False)
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {0 if full else ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE main")
+        conn.execute("PRAGMA optimize")
+        stat_rows = conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        'ok': True,
+        'mode': 'ANALYZE' if full else f'ANALYZE (analysis_limit={ANALYSIS_LIMIT})',
+        'stat_rows': stat_rows,
+        'seconds': round(time.perf_counter() - start, 4)
+    }
+
+
+def integrity_check(db_path=DB_PATH, quick=False, max_errors=MAX_INTEGRITY_ERRORS):
+    """执行integrity_check（quick为True时执行quick_check）与外键检查，返回错误信息"""
+    start = time.perf_counter()
+    pragma = 'quick_check' if quick else 'integrity_check'
+    conn = _connect(db_path)
+    try:
+        # 不指定库名时同时检查挂载的归档库
+        messages = [row[0] for row in conn.execute(f"PRAGMA {pragma}({int(max_errors)})").fetchall()]
+        violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    finally:
+        conn.close()
+    errors = [message for message in messages if message != 'ok']
+    return {
+        'ok': not errors and not violations,
+        'mode': pragma,
+        'errors': errors,
+        'foreign_key_violations': len(violations),
+        'seconds': round(time.perf_counter() - start, 4)
+    }
+
+
+def reclaim_space(db_path=DB_PATH, pages=DEFAULT_VACUUM_PAGES):
+    """执行增量VACUUM，返回回收的页数与剩余空闲页"""
+    start = time.perf_counter()
+    conn = _connect(db_path, attach=False)
+    try:
+        reclaimed = incremental_vacuum(conn, pages)
+        stats = page_stats(conn)
+        mode = auto_vacuum_mode(conn)
+    finally:
+        conn.close()
+    return {
+        'ok': True,
+        'auto_vacuum': mode,
+        'reclaimed_pages': reclaimed,
+        'reclaimed_bytes': reclaimed * stats['page_size'],
+        'freelist_count': stats['freelist_count'],
+        'seconds': round(time.perf_counter() - start, 4)
+    }
+
+
+# ==================== 空间统计 ====================
+def storage_report(db_path=DB_PATH):
+    """按表与索引统计占用的页数、字节数与未使用字节（dbstat虚拟表），按占用从大到小排序"""
+    conn = _connect(db_path, attach=False)
+    try:
+        # aggregate = TRUE 时每个B树只返回一行合计
+        report = pd.read_sql_query(
+            """
+            SELECT s.name, COALESCE(m.type, 'table') AS type, COALESCE(m.tbl_name, s.name) AS tbl_name,
+                   s.pageno AS pages, s.pgsize AS bytes, s.unused AS unused_bytes
+            FROM dbstat AS s
+            LEFT JOIN sqlite_master AS m ON m.name = s.name
+            WHERE s.aggregate = TRUE
+            ORDER BY s.pgsize DESC, s.name
+            """,
+            conn
+        )
+    finally:
+        conn.close()
+    report['fill_ratio'] = (1 - report['unused_bytes'] / report['bytes'].where(report['bytes'] > 0)).fillna(0.0)
+    return report
+
+
+def database_summary(db_path=DB_PATH):
+    """返回文件大小、页统计、auto_vacuum模式与是否已有统计信息"""
+    conn = _connect(db_path, attach=False)
+    try:
+        summary = page_stats(conn)
+        summary['auto_vacuum'] = auto_vacuum_mode(conn)
+        summary['analyzed'] = _table_exists(conn, 'sqlite_stat1')
+    finally:
+        conn.close()
+    summary['file_bytes'] = database_size(db_path)
+    return summary
+
+
+# ==================== 定时维护 ====================
+def _summarize(task, result):
+    """将任务结果格式化为一行文字"""
+    if task == 'analyze':
+        return f"{result['mode']}，统计信息 {result['stat_rows']} 行"
+    if task == 'vacuum':
+        return (f"auto_vacuum={result['auto_vacuum']}，回收 {result['reclaimed_pages']} 页，"
+                f"剩余空闲页 {result['freelist_count']}")
+    if result['ok']:
+        return f"{result['mode']} 通过"
+    return (f"{result['mode']} 发现 {len(result['errors'])} 个错误、"
+            f"{result['foreign_key_violations']} 个外键问题：{'；'.join(result['errors'][:3])}")
+
+
+def run_task(task, db_path=DB_PATH):
+    """执行一项维护任务并记入执行历史，返回执行记录"""
+    tasks = {
+        'analyze': lambda: analyze(db_path),
+        'vacuum': lambda: reclaim_space(db_path),
+        'quick_check': lambda: integrity_check(db_path, quick=True)
+    }
+    if task not in tasks:
+        raise ValueError(f"未知的维护任务: {task}")
+
+    started_at = datetime.now()
+    start = time.perf_counter()
+    try:
+        result = tasks[task]()
+        entry = {'task': task, 'ok': result['ok'], 'detail': _summarize(task, result)}
+    except Exception as e:
+        print(f"维护任务 {task} 执行失败: {e}")
+        entry = {'task': task, 'ok': False, 'detail': str(e)}
+    entry['started_at'] = started_at.strftime('%Y-%m-%d %H:%M:%S')
+    entry['seconds'] = round(time.perf_counter() - start, 4)
+
+    with _scheduler_lock:
+        _history.appendleft(entry)
+    return entry
+
+
+def _scheduler_loop(stop_event):
+    """调度线程：每隔SCHEDULER_POLL_SECONDS秒执行到期的任务"""
+    while True:
+        with _scheduler_lock:
+            now = time.time()
+            due = [task for task, next_run in _scheduler['next_run'].items() if next_run <= now]
+            db_path = _scheduler['db_path']
+        for task in due:
+            if stop_event.is_set():
+                return
+            run_task(task, db_path)
+            with _scheduler_lock:
+                if task in _scheduler['intervals']:
+                    _scheduler['next_run'][task] = time.time() + _scheduler['intervals'][task]
+        if stop_event.wait(SCHEDULER_POLL_SECONDS):
+            return
+
+
+def start_scheduler(intervals=None, db_path=DB_PATH):
+    """启动（或按新配置重启）后台维护线程；intervals为 {任务: 间隔秒数}，间隔为0的任务不执行"""
+    intervals = DEFAULT_INTERVALS if intervals is None else intervals
+    unknown = set(intervals) - set(SCHEDULED_TASKS)
+    if unknown:
+        raise ValueError(f"未知的维护任务: {', '.join(sorted(unknown))}")
+
+    stop_scheduler()
+    intervals = {task: int(seconds) for task, seconds in intervals.items() if seconds and int(seconds) > 0}
+    stop_event = threading.Event()
+    thread = threading.Thread(target=_scheduler_loop, args=(stop_event,), name="db-maintenance", daemon=True)
+    with _scheduler_lock:
+        now = time.time()
+        _scheduler.update({
+            'thread': thread,
+            'stop': stop_event,
+            'db_path': db_path,
+            'intervals': intervals,
+            'next_run': {task: now + seconds for task, seconds in intervals.items()}
+        })
+    thread.start()
+    print(f"后台维护已启动: {intervals}")
+
+
+def stop_scheduler(timeout=5):
+    """停止后台维护线程（等待正在执行的任务结束）"""
+    with _scheduler_lock:
+        thread, stop_event = _scheduler['thread'], _scheduler['stop']
+        _scheduler.update({'thread': None, 'stop': None, 'intervals': {}, 'next_run': {}})
+    if thread is None:
+        return False
+    stop_event.set()
+    thread.join(timeout)
+    print("后台维护已停止")
+    return True
+
+
+def scheduler_status():
+    """返回调度线程是否运行、各任务的间隔与下次执行时间，以及最近的执行记录"""
+    with _scheduler_lock:
+        thread = _scheduler['thread']
+        tasks = [{
+            'task': task,
+            'name': SCHEDULED_TASKS[task],
+            'interval_seconds': seconds,
+            'next_run': datetime.fromtimestamp(_scheduler['next_run'][task]).strftime('%Y-%m-%d %H:%M:%S')
+        } for task, seconds in _scheduler['intervals'].items()]
+        return {
+            'running': thread is not None and thread.is_alive(),
+            'db_path': _scheduler['db_path'],
+            'tasks': tasks,
+            'history': list(_history)
+        }
+
+
+# ==================== 命令行入口 ====================
+def main(argv=None):
+    """命令行维护：python maintenance.py sweep | delete-singers 3 5 | analyze | check | storage | schedule"""
+    parser = argparse.ArgumentParser(description="级联删除、孤儿清理、统计信息、完整性检查与空间回收")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    delete_parser = subparsers.add_parser("delete-singers", help="级联删除歌手")
+    delete_parser.add_argument("singer_ids", type=int, nargs="+")
+    subparsers.add_parser("sweep", help="清理孤儿记录")
+    subparsers.add_parser("enable-incremental-vacuum", help="切换为incremental auto_vacuum模式")
+    analyze_parser = subparsers.add_parser("analyze", help="更新查询规划器的统计信息")
+    analyze_parser.add_argument("--full", action="store_true", help="不限制扫描行数")
+    check_parser = subparsers.add_parser("check", help="完整性检查")
+    check_parser.add_argument("--quick", action="store_true", help="执行quick_check")
+    subparsers.add_parser("storage", help="各表与索引的空间占用")
+    schedule_parser = subparsers.add_parser("schedule", help="在前台按间隔执行维护任务（Ctrl+C停止）")
+    for task, seconds in DEFAULT_INTERVALS.items():
+        schedule_parser.add_argument(f"--{task.replace('_', '-')}", type=int, default=seconds, dest=task,
+                                     help=f"{SCHEDULED_TASKS[task]}的间隔秒数，0表示不执行")
+    args = parser.parse_args(argv)
+
+    if not database_exists(args.db):
+        parser.error(f"数据库文件不存在: {args.db}")
+
+    if args.command == "delete-singers":
+        print(format_report(delete_singers(args.singer_ids, args.db)))
+    elif args.command == "sweep":
+        print(format_report(sweep_orphans(args.db)))
+    elif args.command == "analyze":
+        result = analyze(args.db, full=args.full)
+        print(f"{result['mode']} 完成：统计信息 {result['stat_rows']} 行，耗时 {result['seconds']} 秒")
+    elif args.command == "check":
+        result = integrity_check(args.db, quick=args.quick)
+        print(_summarize('quick_check', result))
+        return 0 if result['ok'] else 1
+    elif args.command == "storage":
+        print(storage_report(args.db).to_string(index=False))
+    elif args.command == "schedule":
+        start_scheduler({task: getattr(args, task) for task in DEFAULT_INTERVALS}, args.db)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop_scheduler()
+    else:
+        report = enable_incremental_vacuum(args.db)
+        print(f"已切换为incremental模式：{report['before']['page_count']} 页 -> {report['after']['page_count']} 页")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
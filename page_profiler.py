@@ -0,0 +1,259 @@
+import collections
+import contextlib
+import cProfile
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==================== 页面性能采集配置 ====================
+# 每个(页面, 阶段)保留的最近样本数
+SAMPLE_SIZE = 500
+
+PHASES = ('fetch', 'transform', 'figure', 'render', 'other', 'total')
+QUANTILES = (0.5, 0.9, 0.99)
+
+# 环境变量：cProfile输出目录、Prometheus文本文件路径、HTTP端口
+PROFILE_DIR_ENV = "STAR_PROFILE_DIR"
+METRICS_FILE_ENV = "STAR_METRICS_FILE"
+METRICS_PORT_ENV = "STAR_METRICS_PORT"
+
+_lock = threading.Lock()
+_samples = collections.defaultdict(lambda: collections.deque(maxlen=SAMPLE_SIZE))
+_sums = collections.defaultdict(float)
+_counts = collections.defaultdict(int)
+_state = threading.local()
+_profile_dir = os.environ.get(PROFILE_DIR_ENV) or None
+_metrics_server = None
+
+
+# ==================== 阶段计时 ====================
+@contextlib.contextmanager
+def page_phase(name):
+    """统计页面中某一阶段的耗时（嵌套阶段只计入最内层，不重复计算）"""
+    stack = getattr(_state, 'stack', None)
+    if stack is None:
+        # 不在页面渲染过程中（例如侧边栏），不做统计
+        yield
+        return
+
+    frame = {'name': name, 'start': time.perf_counter(), 'child': 0.0}
+    stack.append(frame)
+    try:
+        yield
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - frame['start']
+        _state.phases[name] += elapsed - frame['child']
+        if stack:
+            stack[-1]['child'] += elapsed
+
+
+def timed_phase(name):
+    """装饰器形式的 page_phase"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with page_phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ==================== 页面计时 ====================
+def _record(page, phases, total):
+    """保存一次页面渲染的各阶段耗时"""
+    values = dict(phases)
+    values['other'] = max(total - sum(phases.values()), 0.0)
+    values['total'] = total
+    with _lock:
+        for phase, seconds in values.items():
+            key = (page, phase)
+            _samples[key].append(seconds)
+            _sums[key] += seconds
+            _counts[key] += 1
+
+
+def _dump_profile(profiler, page):
+    """将cProfile结果写入输出目录"""
+    try:
+        os.makedirs(_profile_dir, exist_ok=True)
+        path = os.path.join(_profile_dir, f"{page}_{time.strftime('%Y%m%d_%H%M%S')}_{time.time_ns() % 1000000}.prof")
+        profiler.dump_stats(path)
+    except OSError as e:
+        print(f"写入性能分析文件失败: {str(e)}")
+
+
+def profiled_page(func):
+    """装饰 show_* 页面函数：统计总耗时与各阶段耗时，可选cProfile"""
+    page = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # 页面函数之间互相调用时只统计最外层
+        if getattr(_state, 'stack', None) is not None:
+            return func(*args, **kwargs)
+
+        _state.stack = []
+        _state.phases = collections.defaultdict(float)
+        profiler = None
+        if _profile_dir:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                profiler = None
+
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            total = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                _dump_profile(profiler, page)
+            phases = _state.phases
+            _state.stack = None
+            _state.phases = None
+            _record(page, phases, total)
+            write_metrics_file()
+
+    return wrapper
+
+
+# ==================== cProfile开关 ====================
+def set_profile_dir(directory):
+    """设置cProfile输出目录，None表示关闭"""
+    global _profile_dir
+    _profile_dir = directory or None
+
+
+def get_profile_dir():
+    """返回当前的cProfile输出目录"""
+    return _profile_dir
+
+
+# ==================== 统计 ====================
+def _quantile(values, q):
+    """计算分位数（最近邻插值）"""
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def page_stats():
+    """返回各页面各阶段的样本数、平均值与分位数（单位：毫秒）"""
+    with _lock:
+        snapshot = {key: list(values) for key, values in _samples.items()}
+        counts = dict(_counts)
+        sums = dict(_sums)
+
+    stats = []
+    ordered = sorted(snapshot.items(), key=lambda item: (item[0][0], PHASES.index(item[0][1])))
+    for (page, phase), values in ordered:
+        if not values:
+            continue
+        row = {
+            'page': page,
+            'phase': phase,
+            'count': counts[(page, phase)],
+            'mean_ms': sums[(page, phase)] / counts[(page, phase)] * 1000
+        }
+        for q in QUANTILES:
+            row[f"p{int(q * 100)}_ms"] = _quantile(values, q) * 1000
+        stats.append(row)
+    return stats
+
+
+def reset_stats():
+    """清空所有样本"""
+    with _lock:
+        _samples.clear()
+        _sums.clear()
+        _counts.clear()
+
+
+# ==================== Prometheus导出 ====================
+def _escape_label(value):
+    """转义Prometheus标签值"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text():
+    """生成Prometheus文本格式的页面耗时摘要"""
+    with _lock:
+        snapshot = {key: list(values) for key, values in _samples.items()}
+        counts = dict(_counts)
+        sums = dict(_sums)
+
+    lines = [
+        "# HELP star_page_render_seconds Streamlit page render time by phase.",
+        "# TYPE star_page_render_seconds summary"
+    ]
+    for (page, phase), values in sorted(snapshot.items()):
+        if not values:
+            continue
+        labels = f'page="{_escape_label(page)}",phase="{_escape_label(phase)}"'
+        for q in QUANTILES:
+            lines.append(f'star_page_render_seconds{{{labels},quantile="{q}"}} {_quantile(values, q):.6f}')
+        lines.append(f"star_page_render_seconds_sum{{{labels}}} {sums[(page, phase)]:.6f}")
+        lines.append(f"star_page_render_seconds_count{{{labels}}} {counts[(page, phase)]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path=None):
+    """将指标写入文本文件（供node_exporter textfile collector读取）"""
+    path = path or os.environ.get(METRICS_FILE_ENV)
+    if not path:
+        return False
+    try:
+        # 先写临时文件再替换，避免采集到写了一半的文件
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"写入指标文件失败: {str(e)}")
+        return False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics HTTP处理器"""
+
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """在后台线程启动 /metrics 端点（每个进程只启动一次）"""
+    global _metrics_server
+    port = port or os.environ.get(METRICS_PORT_ENV)
+    if not port:
+        return None
+
+    with _lock:
+        if _metrics_server is not None:
+            return _metrics_server
+        try:
+            _metrics_server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+        except OSError as e:
+            print(f"启动指标端点失败: {str(e)}")
+            return None
+
+    thread = threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    print(f"指标端点已启动: http://0.0.0.0:{port}/metrics")
+    return _metrics_server
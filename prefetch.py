@@ -0,0 +1,93 @@
+import collections
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ==================== 后台预取配置 ====================
+# 会话开始和每次切换页面后，用线程池在后台预热最可能访问的下一页所需的缓存。
+# 同一个键在同一时刻只会有一个预取任务在执行（single-flight），重复提交直接跳过。
+MAX_WORKERS = 4
+
+# 每次导航后预热的页面数
+PREFETCH_PAGES = 2
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+_lock = threading.Lock()
+_inflight = {}
+_warmers = {}
+_default_next = []
+_transitions = collections.defaultdict(collections.Counter)
+_stats = collections.Counter()
+
+
+# ==================== 注册 ====================
+def register_warmer(page, func):
+    """注册某个页面的预热函数"""
+    with _lock:
+        _warmers[page] = func
+
+
+def set_default_next_pages(pages):
+    """没有导航记录时默认预热的页面（按优先级排列）"""
+    with _lock:
+        _default_next[:] = list(pages)
+
+
+# ==================== 提交 ====================
+def _finished(key, future):
+    """任务结束回调：移出进行中列表并记录结果"""
+    with _lock:
+        _inflight.pop(key, None)
+        if future.cancelled():
+            _stats['cancelled'] += 1
+        elif future.exception() is not None:
+            _stats['failed'] += 1
+            print(f"预取 {key} 失败: {str(future.exception())}")
+        else:
+            _stats['completed'] += 1
+
+
+def prefetch(key, func, *args, **kwargs):
+    """在后台执行预热任务；同一个键已在执行时不重复提交，返回Future或None"""
+    with _lock:
+        if key in _inflight:
+            _stats['skipped'] += 1
+            return None
+        future = _executor.submit(func, *args, **kwargs)
+        _inflight[key] = future
+        _stats['submitted'] += 1
+    future.add_done_callback(lambda f: _finished(key, f))
+    return future
+
+
+# ==================== 导航预测 ====================
+def record_navigation(previous_page, page):
+    """记录一次页面跳转（进程内所有会话共享）"""
+    if previous_page is None or previous_page == page:
+        return
+    with _lock:
+        _transitions[previous_page][page] += 1
+
+
+def predict_next_pages(page, limit=PREFETCH_PAGES):
+    """根据历史跳转次数预测下一页，不足时用默认页面补齐"""
+    with _lock:
+        ranked = [next_page for next_page, _ in _transitions[page].most_common()]
+        candidates = ranked + [p for p in _default_next if p not in ranked]
+        return [p for p in candidates if p != page and p in _warmers][:limit]
+
+
+def prefetch_pages(pages):
+    """预热若干页面"""
+    with _lock:
+        warmers = [(p, _warmers[p]) for p in pages if p in _warmers]
+    return [prefetch(('page', p), func) for p, func in warmers]
+
+
+# ==================== 统计 ====================
+def prefetch_stats():
+    """返回提交、跳过、完成、失败的任务数与当前进行中的任务"""
+    with _lock:
+        stats = {name: _stats[name] for name in ('submitted', 'skipped', 'completed', 'failed', 'cancelled')}
+        stats['inflight'] = [str(key) for key in _inflight]
+        stats['transitions'] = sum(sum(counter.values()) for counter in _transitions.values())
+    return stats
@@ -0,0 +1,156 @@
+import collections
+import functools
+import re
+import threading
+import time
+
+from db_config import DB_PATH
+from sql_console import explain_query_plan
+
+# ==================== 查询监控配置 ====================
+# 环形缓冲区大小，超出后丢弃最早的记录
+BUFFER_SIZE = 1000
+
+_lock = threading.Lock()
+_records = collections.deque(maxlen=BUFFER_SIZE)
+_plans = {}
+_state = threading.local()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+# ==================== 语句归一化 ====================
+def normalize_statement(sql):
+    """将字面量替换为 ? 并压缩空白，使同类语句归为一组"""
+    text = _STRING_LITERAL.sub("?", sql)
+    text = _NUMBER_LITERAL.sub("?", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def is_full_scan(detail):
+    """判断执行计划中的一步是否为全表扫描"""
+    detail = detail.upper()
+    return detail.startswith("SCAN ") and " USING " not in detail and "CONSTANT ROW" not in detail
+
+
+# ==================== 记录 ====================
+def note_execution(row_count=None):
+    """在被监控函数内部调用，标记语句确实执行了（未命中缓存）"""
+    _state.executed = True
+    _state.row_count = row_count
+
+
+def _query_plan(sql, params, normalized, db_path=DB_PATH):
+    """获取语句的执行计划，同一归一化语句只分析一次"""
+    with _lock:
+        if normalized in _plans:
+            return _plans[normalized]
+
+    try:
+        plan = [row['detail'] for row in explain_query_plan(sql, params, db_path=db_path)]
+    except Exception as e:
+        plan = [f"无法获取执行计划: {str(e)}"]
+
+    with _lock:
+        _plans[normalized] = plan
+    return plan
+
+
+def record_query(kind, sql, params, duration, row_count, cache_hit, db_path=DB_PATH):
+    """向环形缓冲区写入一条查询记录"""
+    normalized = normalize_statement(sql)
+    plan = [] if cache_hit else _query_plan(sql, params, normalized, db_path)
+    with _lock:
+        _records.append({
+            'time': time.time(),
+            'kind': kind,
+            'statement': normalized,
+            'duration_ms': duration * 1000,
+            'rows': row_count,
+            'cache_hit': cache_hit,
+            'plan': plan,
+            'full_scan': any(is_full_scan(step) for step in plan)
+        })
+
+
+def monitored(kind):
+    """装饰 query_database / execute_sql，记录耗时、行数、缓存命中与执行计划"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(sql, params=None, *args, **kwargs):
+            _state.executed = False
+            _state.row_count = None
+            start = time.perf_counter()
+            result = func(sql, params, *args, **kwargs)
+            duration = time.perf_counter() - start
+
+            cache_hit = not getattr(_state, 'executed', False)
+            row_count = getattr(_state, 'row_count', None)
+            if row_count is None and hasattr(result, '__len__'):
+                row_count = len(result)
+
+            try:
+                record_query(kind, sql, params, duration, row_count, cache_hit)
+            except Exception as e:
+                print(f"记录查询性能失败: {str(e)}")
+            return result
+        return wrapper
+    return decorator
+
+
+# ==================== 统计 ====================
+def get_records():
+    """返回缓冲区中的全部记录（从旧到新）"""
+    with _lock:
+        return list(_records)
+
+
+def get_plan(normalized):
+    """返回某条归一化语句的执行计划"""
+    with _lock:
+        return list(_plans.get(normalized, []))
+
+
+def slowest_statements(limit=20):
+    """按归一化语句汇总，返回平均耗时最高的语句"""
+    groups = {}
+    for record in get_records():
+        group = groups.setdefault(record['statement'], {
+            'statement': record['statement'],
+            'kind': record['kind'],
+            'calls': 0,
+            'executions': 0,
+            'cache_hits': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'rows': 0,
+            'full_scan': False
+        })
+        group['calls'] += 1
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        if record['cache_hit']:
+            group['cache_hits'] += 1
+        else:
+            # 平均耗时只统计真正执行的调用
+            group['executions'] += 1
+            group['total_ms'] += record['duration_ms']
+            group['rows'] += record['rows'] or 0
+        group['full_scan'] = group['full_scan'] or record['full_scan']
+
+    summary = []
+    for group in groups.values():
+        group['avg_ms'] = group['total_ms'] / group['executions'] if group['executions'] else 0.0
+        group['hit_rate'] = group['cache_hits'] / group['calls']
+        summary.append(group)
+
+    summary.sort(key=lambda g: g['avg_ms'], reverse=True)
+    return summary[:limit]
+
+
+def clear_records():
+    """清空记录与执行计划"""
+    with _lock:
+        _records.clear()
+        _plans.clear()
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from arrow_cache import get_frame
+from data_version import current_data_version
+from db_config import DB_PATH, connect
+from db_schema import apply_compact_dtypes
+from single_flight import coalesce, freeze
+
+# ==================== 并发读取配置 ====================
+# 页面需要的多张表、多个聚合查询互不依赖时，交给线程池同时读取再汇总结果，
+# 页面的取数耗时约等于最慢的一个查询，而不是所有查询之和。
+# 聚合查询在只读连接池上执行（WAL模式下读者之间、读者与写者之间互不阻塞）。
+
+# 连接池大小，也是同时执行的读取数上限
+POOL_SIZE = 4
+
+_executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="read")
+_pool = queue.LifoQueue()
+_lock = threading.Lock()
+_created = 0
+_stats = {'batches': 0, 'reads': 0, 'errors': 0, 'wall_seconds': 0.0, 'serial_seconds': 0.0}
+
+
+# ==================== 连接池 ====================
+def _open_connection(db_path=DB_PATH):
+    """打开一个只读连接"""
+    conn = connect(db_path, read_only=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+@contextmanager
+def read_connection(db_path=DB_PATH):
+    """从连接池借出一个只读连接，用完归还；池已满时等待其他读取归还"""
+    global _created
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        with _lock:
+            create = _created < POOL_SIZE
+            if create:
+                _created += 1
+        if create:
+            try:
+                conn = _open_connection(db_path)
+            except BaseException:
+                with _lock:
+                    _created -= 1
+                raise
+        else:
+            conn = _pool.get()
+
+    succeeded = False
+    try:
+        yield conn
+        succeeded = True
+    finally:
+        if succeeded:
+            _pool.put(conn)
+        else:
+            # 出错（包括非数据库异常、生成器被关闭）的连接不再复用，同时释放名额，避免池被耗尽后永久等待
+            conn.close()
+            with _lock:
+                _created -= 1
+
+
+def close_pool():
+    """关闭池中所有空闲连接（数据库文件被替换后调用）"""
+    global _created
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        conn.close()
+        with _lock:
+            _created -= 1
+
+
+# ==================== 读取 ====================
+def _run_sql(sql, params):
+    """在池化连接上执行查询并转换为紧凑类型的DataFrame"""
+    with read_connection() as conn:
+        cursor = conn.execute(sql, params or ())
+        columns = [col[0].lower() for col in cursor.description]
+        df = pd.DataFrame(cursor.fetchall(), columns=columns)
+    return apply_compact_dtypes(df) if not df.empty else df
+
+
+def read_sql(sql, params=None):
+    """执行只读查询；相同的查询与参数并发执行时只查询一次"""
+    return coalesce('read', (sql, freeze(params), current_data_version()), _run_sql, sql, params)
+
+
+def _timed(func, *args):
+    """执行一次读取并返回 (结果, 耗时)"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def fetch_concurrently(tables=(), queries=None, loader=get_frame):
+    """并发读取若干缓存表与聚合查询，返回 {名称: DataFrame}
+
+    tables 为 arrow_cache 中的表名，由 loader 读取（分析页面传入读取分析快照的函数）；
+    queries 为 {名称: sql} 或 {名称: (sql, params)}。
+    单个读取失败时打印错误并返回空DataFrame，不影响其他结果。
+    """
+    tasks = {name: (loader, name) for name in tables}
+    for name, query in (queries or {}).items():
+        sql, params = query if isinstance(query, tuple) else (query, None)
+        tasks[name] = (read_sql, sql, params)
+
+    start = time.perf_counter()
+    futures = {name: _executor.submit(_timed, *task) for name, task in tasks.items()}
+
+    results = {}
+    serial_seconds = 0.0
+    errors = 0
+    for name, future in futures.items():
+        try:
+            results[name], seconds = future.result()
+            serial_seconds += seconds
+        except Exception as e:
+            print(f"并发读取 {name} 失败: {str(e)}")
+            results[name] = pd.DataFrame()
+            errors += 1
+
+    with _lock:
+        _stats['batches'] += 1
+        _stats['reads'] += len(tasks)
+        _stats['errors'] += errors
+        _stats['wall_seconds'] += time.perf_counter() - start
+        _stats['serial_seconds'] += serial_seconds
+    return results
+
+
+# ==================== 统计 ====================
+def concurrent_read_stats():
+    """返回批次数、读取数、实际耗时与串行执行时的耗时之和"""
+    with _lock:
+        stats = dict(_stats)
+        stats['pool_connections'] = _created
+    stats['saved_seconds'] = max(stats['serial_seconds'] - stats['wall_seconds'], 0.0)
+    return stats
@@ -0,0 +1,228 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+from archive import attach_archive, popularity_source
+from db_config import DB_PATH, connect
+from db_schema import apply_compact_dtypes
+
+# ==================== 热度汇总配置 ====================
+# 按周/月/季度预先汇总每位歌手的热度数据：
+#   - 评分取平均、最小、最大值
+#   - 粉丝量取周期内最后一条记录的值
+#   - 社交媒体提及次数求和
+# popularity表上的触发器把发生变化的歌手记入脏表，读取时只重算这些歌手。
+# 存在归档库时汇总基于热表与归档表的联合数据，归档不会丢失历史周期。
+
+GRANULARITIES = {
+    'week': '按周',
+    'month': '按月',
+    'quarter': '按季度'
+}
+
+# 各粒度的周期起始日期（周从周一开始）
+PERIOD_EXPRESSIONS = {
+    'week': "date(record_date, '-6 days', 'weekday 1')",
+    'month': "strftime('%Y-%m-01', record_date)",
+    'quarter': ("printf('%s-%02d-01', strftime('%Y', record_date), "
+                "(CAST(strftime('%m', record_date) AS INTEGER) - 1) / 3 * 3 + 1)")
+}
+
+# 各粒度对应的pandas周期（与上面的SQL表达式一致），供没有汇总表的后端在内存中汇总
+PERIOD_FREQUENCIES = {
+    'week': 'W-SUN',
+    'month': 'M',
+    'quarter': 'Q'
+}
+
+ROLLUP_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS popularity_rollup (
+        singer_id INTEGER NOT NULL,
+        granularity TEXT NOT NULL,
+        period_start DATE NOT NULL,
+        record_count INTEGER,
+        last_record_date DATE,
+        fan_count INTEGER,
+        topic_score REAL,
+        topic_score_min REAL,
+        topic_score_max REAL,
+        popularity_score REAL,
+        popularity_score_min REAL,
+        popularity_score_max REAL,
+        social_media_mentions INTEGER,
+        PRIMARY KEY (singer_id, granularity, period_start)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS popularity_rollup_dirty (
+        singer_id INTEGER PRIMARY KEY
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS popularity_rollup_insert AFTER INSERT ON popularity
+    BEGIN
+        INSERT OR IGNORE INTO popularity_rollup_dirty (singer_id) VALUES (NEW.singer_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS popularity_rollup_update AFTER UPDATE ON popularity
+    BEGIN
+        INSERT OR IGNORE INTO popularity_rollup_dirty (singer_id) VALUES (OLD.singer_id);
+        INSERT OR IGNORE INTO popularity_rollup_dirty (singer_id) VALUES (NEW.singer_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS popularity_rollup_delete AFTER DELETE ON popularity
+    BEGIN
+        INSERT OR IGNORE INTO popularity_rollup_dirty (singer_id) VALUES (OLD.singer_id);
+    END
+    '''
+]
+
+ROLLUP_COLUMNS = [
+    'record_count', 'last_record_date', 'fan_count',
+    'topic_score', 'topic_score_min', 'topic_score_max',
+    'popularity_score', 'popularity_score_min', 'popularity_score_max',
+    'social_media_mentions'
+]
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+# ==================== 表结构 ====================
+def ensure_rollup_schema(conn):
+    """创建汇总表、脏表与触发器；汇总表首次创建时标记全部歌手待重算"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'popularity_rollup'"
+    ).fetchone()
+    for statement in ROLLUP_SCHEMA:
+        conn.execute(statement)
+    if not exists:
+        conn.execute("INSERT OR IGNORE INTO popularity_rollup_dirty (singer_id) "
+                     f"SELECT DISTINCT singer_id FROM {popularity_source(conn)} WHERE singer_id IS NOT NULL")
+    conn.commit()
+
+
+def _rollup_insert_sql(granularity, source="popularity"):
+    """生成某一粒度的汇总INSERT语句（只处理脏表中的歌手）"""
+    period = PERIOD_EXPRESSIONS[granularity]
+    return f'''
+        INSERT INTO popularity_rollup (
+            singer_id, granularity, period_start, {', '.join(ROLLUP_COLUMNS)}
+        )
+        WITH bucketed AS (
+            SELECT singer_id, {period} AS period_start, record_date,
+                   topic_score, popularity_score, social_media_mentions,
+                   FIRST_VALUE(fan_count) OVER (
+                       PARTITION BY singer_id, {period}
+                       ORDER BY record_date DESC, popularity_id DESC
+                   ) AS last_fan_count
+            FROM {source}
+            WHERE singer_id IN (SELECT singer_id FROM popularity_rollup_dirty)
+              AND record_date IS NOT NULL
+        )
+        SELECT singer_id, '{granularity}', period_start,
+               COUNT(*), MAX(record_date), MAX(last_fan_count),
+               AVG(topic_score), MIN(topic_score), MAX(topic_score),
+               AVG(popularity_score), MIN(popularity_score), MAX(popularity_score),
+               SUM(social_media_mentions)
+        FROM bucketed
+        WHERE period_start IS NOT NULL
+        GROUP BY singer_id, period_start
+    '''
+
+
+# ==================== 汇总维护 ====================
+def refresh_rollups(conn):
+    """重算脏表中歌手的全部粒度汇总，在一个事务内完成，返回重算的歌手数"""
+    dirty = conn.execute("SELECT COUNT(*) FROM popularity_rollup_dirty").fetchone()[0]
+    if not dirty:
+        return 0
+
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM popularity_rollup "
+                     "WHERE singer_id IN (SELECT singer_id FROM popularity_rollup_dirty)")
+        source = popularity_source(conn)
+        for granularity in GRANULARITIES:
+            conn.execute(_rollup_insert_sql(granularity, source))
+        conn.execute("DELETE FROM popularity_rollup_dirty")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return dirty
+
+
+def rebuild_rollups(conn):
+    """标记全部歌手并重建所有汇总"""
+    conn.execute("INSERT OR IGNORE INTO popularity_rollup_dirty (singer_id) "
+                 f"SELECT DISTINCT singer_id FROM {popularity_source(conn)} WHERE singer_id IS NOT NULL")
+    conn.commit()
+    return refresh_rollups(conn)
+
+
+# ==================== 读取 ====================
+def _connect(db_path=DB_PATH):
+    """打开汇总使用的连接，每个数据库只初始化一次表结构"""
+    conn = connect(db_path, check_same_thread=False, isolation_level=None)
+    attach_archive(conn)
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            conn.execute("BEGIN")
+            ensure_rollup_schema(conn)
+            _schema_ready.add(db_path)
+    return conn
+
+
+def get_rollup(singer_id, granularity, db_path=DB_PATH):
+    """读取某位歌手某一粒度的汇总序列，record_date为周期起始日期"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"不支持的汇总粒度: {granularity}")
+
+    conn = _connect(db_path)
+    try:
+        refresh_rollups(conn)
+        df = pd.read_sql_query(
+            f'''
+            SELECT period_start AS record_date, {', '.join(ROLLUP_COLUMNS)}
+            FROM popularity_rollup
+            WHERE singer_id = ? AND granularity = ?
+            ORDER BY period_start
+            ''',
+            conn,
+            params=(int(singer_id), granularity)
+        )
+    finally:
+        conn.close()
+
+    return apply_compact_dtypes(df)
+
+
+def rollup_frame(popularity_df, granularity):
+    """在pandas中按粒度汇总一位歌手的热度记录，列与get_rollup相同（用于没有汇总表的存储后端）"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"不支持的汇总粒度: {granularity}")
+
+    df = popularity_df.dropna(subset=['record_date']).copy()
+    df['record_date'] = pd.to_datetime(df['record_date'])
+    df = df.sort_values([column for column in ('record_date', 'popularity_id') if column in df.columns])
+    df['period_start'] = df['record_date'].dt.to_period(PERIOD_FREQUENCIES[granularity]).dt.start_time
+
+    grouped = df.groupby('period_start')
+    result = pd.DataFrame({
+        'record_count': grouped.size(),
+        'last_record_date': grouped['record_date'].max(),
+        'fan_count': grouped['fan_count'].agg(lambda values: values.iloc[-1]),
+        'topic_score': grouped['topic_score'].mean(),
+        'topic_score_min': grouped['topic_score'].min(),
+        'topic_score_max': grouped['topic_score'].max(),
+        'popularity_score': grouped['popularity_score'].mean(),
+        'popularity_score_min': grouped['popularity_score'].min(),
+        'popularity_score_max': grouped['popularity_score'].max(),
+        'social_media_mentions': grouped['social_media_mentions'].sum()
+    })
+    return apply_compact_dtypes(result.rename_axis('record_date').reset_index())
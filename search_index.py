@@ -0,0 +1,259 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+from db_config import DB_PATH, connect
+
+# ==================== 全文检索配置 ====================
+# 歌手（姓名、流派）与演唱会（名称、场馆、城市）写入同一个FTS5索引，由触发器与原表保持同步。
+# 使用trigram分词器：不依赖空格分词，中文姓名与场馆名可以按任意连续片段匹配，且不区分大小写。
+#   - 3个字符及以上的关键词走FTS5 MATCH，按相关度排序
+#   - 1~2个字符的关键词按片段匹配，前缀匹配的排在前面（trigram无法索引过短的片段，此时扫描索引表）
+# 安装了pypinyin时额外索引拼音全拼与首字母，例如 "zhoujielun zjl" 可以检索到 "周杰伦"。
+
+SEARCH_KINDS = {
+    'singer': '歌手',
+    'concert': '演唱会'
+}
+
+# 索引行的rowid由类型与原表主键决定：歌手为 2*id，演唱会为 2*id+1
+ROWID_EXPRESSIONS = {
+    'singer': "{row}.singer_id * 2",
+    'concert': "{row}.concert_id * 2 + 1"
+}
+
+INDEX_VALUES = {
+    'singer': "{row}.name, COALESCE({row}.genre, '')",
+    'concert': "{row}.concert_name, TRIM(COALESCE({row}.venue, '') || ' ' || COALESCE({row}.city, ''))"
+}
+
+SOURCE_TABLES = {
+    'singer': ('singers', 'singer_id', ('name', 'genre')),
+    'concert': ('concerts', 'concert_id', ('concert_name', 'venue', 'city'))
+}
+
+# 少于这个长度的关键词不走MATCH，改用LIKE扫描索引表
+MIN_MATCH_LENGTH = 3
+
+DEFAULT_LIMIT = 50
+
+
+def _sync_triggers(kind):
+    """生成某类记录的插入、更新、删除同步触发器"""
+    table, _, columns = SOURCE_TABLES[kind]
+    new_rowid = ROWID_EXPRESSIONS[kind].format(row='NEW')
+    old_rowid = ROWID_EXPRESSIONS[kind].format(row='OLD')
+    insert_sql = f'''
+        INSERT INTO search_index (rowid, kind, ref_id, title, detail)
+        VALUES ({new_rowid}, '{kind}', NEW.{SOURCE_TABLES[kind][1]}, {INDEX_VALUES[kind].format(row='NEW')});
+        INSERT OR IGNORE INTO search_pinyin_dirty (index_rowid) VALUES ({new_rowid});
+    '''
+    delete_sql = f'''
+        DELETE FROM search_index WHERE rowid = {old_rowid};
+        DELETE FROM search_pinyin_dirty WHERE index_rowid = {old_rowid};
+    '''
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS search_{table}_insert AFTER INSERT ON {table}
+        BEGIN
+            {insert_sql}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS search_{table}_update
+        AFTER UPDATE OF {SOURCE_TABLES[kind][1]}, {', '.join(columns)} ON {table}
+        BEGIN
+            {delete_sql}
+            {insert_sql}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS search_{table}_delete AFTER DELETE ON {table}
+        BEGIN
+            {delete_sql}
+        END
+        '''
+    ]
+
+
+SEARCH_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, ref_id UNINDEXED, title, detail, pinyin,
+        tokenize = 'trigram'
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS search_pinyin_dirty (
+        index_rowid INTEGER PRIMARY KEY
+    )
+    '''
+] + [trigger for kind in SOURCE_TABLES for trigger in _sync_triggers(kind)]
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+# ==================== 拼音 ====================
+def to_pinyin(text):
+    """返回全拼与首字母（如 "zhoujielun zjl"），未安装pypinyin时返回空字符串"""
+    if lazy_pinyin is None or not text:
+        return ''
+    syllables = [s.lower() for s in lazy_pinyin(text) if s.strip()]
+    return f"{''.join(syllables)} {''.join(s[0] for s in syllables)}"
+
+
+def refresh_pinyin(conn):
+    """为新写入的索引行补充拼音（触发器中无法调用Python），返回处理的行数"""
+    if lazy_pinyin is None:
+        return 0
+
+    rows = conn.execute(
+        "SELECT d.index_rowid, s.title FROM search_pinyin_dirty d "
+        "JOIN search_index s ON s.rowid = d.index_rowid"
+    ).fetchall()
+    if not rows:
+        return 0
+
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("UPDATE search_index SET pinyin = ? WHERE rowid = ?",
+                         [(to_pinyin(title), rowid) for rowid, title in rows])
+        conn.executemany("DELETE FROM search_pinyin_dirty WHERE index_rowid = ?", [(rowid,) for rowid, _ in rows])
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return len(rows)
+
+
+# ==================== 表结构 ====================
+def _rebuild(conn):
+    """按原表重写全部索引行（调用方负责事务）"""
+    conn.execute("DELETE FROM search_index")
+    conn.execute("DELETE FROM search_pinyin_dirty")
+    for kind, (table, key, _) in SOURCE_TABLES.items():
+        rowid = ROWID_EXPRESSIONS[kind].format(row=table)
+        conn.execute(f"INSERT INTO search_index (rowid, kind, ref_id, title, detail) "
+                     f"SELECT {rowid}, '{kind}', {key}, {INDEX_VALUES[kind].format(row=table)} FROM {table}")
+        conn.execute(f"INSERT INTO search_pinyin_dirty (index_rowid) SELECT {rowid} FROM {table}")
+
+
+def ensure_search_schema(conn):
+    """创建索引与触发器；首次创建时在同一事务内索引全部已有记录"""
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+        ).fetchone()
+        for statement in SEARCH_SCHEMA:
+            conn.execute(statement)
+        if not exists:
+            _rebuild(conn)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def rebuild_search_index(db_path=DB_PATH):
+    """按原表重建索引并合并FTS5段，返回索引行数"""
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild(conn)
+        conn.execute("INSERT INTO search_index (search_index) VALUES ('optimize')")
+        conn.execute("COMMIT")
+        refresh_pinyin(conn)
+        return conn.execute("SELECT COUNT(*) FROM search_index").fetchone()[0]
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _connect(db_path=DB_PATH):
+    """打开检索使用的连接，每个数据库只初始化一次表结构"""
+    conn = connect(db_path, check_same_thread=False, isolation_level=None)
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            try:
+                ensure_search_schema(conn)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            _schema_ready.add(db_path)
+    return conn
+
+
+# ==================== 检索 ====================
+def _escape_like(term):
+    """转义LIKE通配符"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _search_sql(term, kinds, limit):
+    """根据关键词长度生成检索语句与参数"""
+    kind_filter = f"kind IN ({', '.join('?' for _ in kinds)})"
+    if len(term) >= MIN_MATCH_LENGTH:
+        phrase = '"' + term.replace('"', '""') + '"'
+        sql = (f"SELECT kind, ref_id, title, detail FROM search_index "
+               f"WHERE search_index MATCH ? AND {kind_filter} ORDER BY rank LIMIT ?")
+        return sql, (phrase, *kinds, limit)
+
+    pattern = '%' + _escape_like(term) + '%'
+    prefix = _escape_like(term) + '%'
+    sql = (f"SELECT kind, ref_id, title, detail FROM search_index "
+           f"WHERE (title LIKE ? ESCAPE '\\' OR detail LIKE ? ESCAPE '\\' OR pinyin LIKE ? ESCAPE '\\') "
+           f"AND {kind_filter} "
+           f"ORDER BY title LIKE ? ESCAPE '\\' DESC, length(title), title LIMIT ?")
+    return sql, (pattern, pattern, pattern, *kinds, prefix, limit)
+
+
+def search(term, kinds=tuple(SEARCH_KINDS), limit=DEFAULT_LIMIT, db_path=DB_PATH):
+    """检索歌手与演唱会，返回 kind、ref_id、title、detail 列的DataFrame（按相关度排序）"""
+    term = (term or '').strip()
+    if not term:
+        return pd.DataFrame(columns=['kind', 'ref_id', 'title', 'detail'])
+
+    for attempt in range(2):
+        conn = _connect(db_path)
+        try:
+            refresh_pinyin(conn)
+            sql, params = _search_sql(term, list(kinds), int(limit))
+            return pd.read_sql_query(sql, conn, params=params)
+        except sqlite3.OperationalError:
+            # 数据库文件被重新创建（索引不存在）时重新初始化后再查一次
+            if attempt:
+                raise
+            with _schema_lock:
+                _schema_ready.discard(db_path)
+        finally:
+            conn.close()
+
+
+def search_ids(term, kind, limit=None, db_path=DB_PATH):
+    """返回匹配的某类记录主键列表；limit为None时不限制数量"""
+    results = search(term, kinds=(kind,), limit=-1 if limit is None else limit, db_path=db_path)
+    return [int(ref_id) for ref_id in results['ref_id']]
+
+
+def index_stats(db_path=DB_PATH):
+    """返回各类记录的索引行数与待补充拼音的行数"""
+    conn = _connect(db_path)
+    try:
+        counts = dict(conn.execute("SELECT kind, COUNT(*) FROM search_index GROUP BY kind").fetchall())
+        pending = conn.execute("SELECT COUNT(*) FROM search_pinyin_dirty").fetchone()[0]
+    finally:
+        conn.close()
+    return {'rows': counts, 'pinyin_pending': pending, 'pinyin_enabled': lazy_pinyin is not None}
@@ -0,0 +1,91 @@
+import argparse
+import multiprocessing
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+from db_config import DB_URI_ENV, database_exists, is_memory
+from writer_service import (DB_PATH, DEFAULT_ADDRESS, WRITER_ADDRESS_ENV, WRITER_AUTHKEY_ENV, enable_wal,
+                            run_writer)
+
+# ==================== 多进程部署 ====================
+# 启动一个写入进程和多个Streamlit工作进程，所有进程共享同一个WAL模式的数据库文件：
+#   - 工作进程各自独立运行页面脚本，一个会话的pandas计算不会阻塞其他进程中的会话
+#   - 写操作通过写入进程串行提交，各进程的缓存通过 PRAGMA data_version 判断是否过期
+# Streamlit会话绑定在WebSocket连接上，前置的反向代理需要按客户端做会话保持（如nginx的ip_hash）。
+WORKER_ID_ENV = "STAR_WORKER_ID"
+
+DEFAULT_WORKERS = 4
+DEFAULT_BASE_PORT = 8501
+
+
+def start_worker(worker_id, port, env):
+    """启动一个Streamlit工作进程"""
+    worker_env = dict(env, **{WORKER_ID_ENV: str(worker_id)})
+    command = [
+        sys.executable, "-m", "streamlit", "run", "star.py",
+        "--server.port", str(port),
+        "--server.headless", "true",
+        "--browser.gatherUsageStats", "false"
+    ]
+    return subprocess.Popen(command, env=worker_env)
+
+
+def main(argv=None):
+    """命令行启动：python serve.py --workers 4 --base-port 8501"""
+    parser = argparse.ArgumentParser(description="以多进程模式运行演唱会管理信息系统")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="工作进程数")
+    parser.add_argument("--base-port", type=int, default=DEFAULT_BASE_PORT, help="第一个工作进程的端口")
+    parser.add_argument("--writer-address", default=DEFAULT_ADDRESS, help="写入进程监听地址 host:port")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    args = parser.parse_args(argv)
+
+    if is_memory(args.db):
+        parser.error("内存库只能在单进程内使用，多进程部署需要数据库文件")
+    if not database_exists(args.db):
+        parser.error(f"数据库文件不存在: {args.db}，请先运行 python init_database.py")
+
+    print(f"数据库日志模式: {enable_wal(args.db)}")
+
+    # 写入进程与工作进程之间的认证密钥，每次启动随机生成
+    authkey = os.environ.get(WRITER_AUTHKEY_ENV) or secrets.token_hex(16)
+    env = dict(os.environ, **{WRITER_ADDRESS_ENV: args.writer_address, WRITER_AUTHKEY_ENV: authkey,
+                              DB_URI_ENV: args.db})
+
+    writer = multiprocessing.Process(target=run_writer, args=(args.writer_address, authkey, args.db),
+                                     name="star-writer", daemon=True)
+    writer.start()
+    # 等写入进程开始监听后再启动工作进程
+    time.sleep(0.5)
+
+    workers = []
+    for worker_id in range(args.workers):
+        port = args.base_port + worker_id
+        workers.append(start_worker(worker_id, port, env))
+        print(f"工作进程 {worker_id} 已启动: http://localhost:{port}")
+
+    try:
+        while writer.is_alive() and all(worker.poll() is None for worker in workers):
+            time.sleep(1)
+        print("有进程意外退出，正在关闭其余进程...")
+    except KeyboardInterrupt:
+        print("正在关闭...")
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.terminate()
+        for worker in workers:
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+        if writer.is_alive():
+            writer.terminate()
+            writer.join(timeout=5)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+import threading
+
+from cachetools import LRUCache
+
+from data_version import current_data_version
+from db_config import DB_PATH, connect
+from search_index import search_ids
+
+# ==================== 歌手查找配置 ====================
+# 歌手选择框不再加载整张歌手表：用户输入姓名开头的几个字后，
+# 通过 name 上的NOCASE索引做前缀查询（LIMIT限制返回条数），不足时再用全文索引补充片段匹配。
+# 每个前缀的查询结果按数据版本缓存，连续输入、删除时不会重复查询。
+
+# 每次最多返回的歌手数
+DEFAULT_LIMIT = 20
+
+# 缓存的前缀数
+CACHE_SIZE = 512
+
+LOOKUP_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_singers_name ON singers(name COLLATE NOCASE)"
+]
+
+_cache = LRUCache(maxsize=CACHE_SIZE)
+_cache_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+# ==================== 查询 ====================
+def _connect(db_path=DB_PATH):
+    """打开查找使用的连接，每个数据库只创建一次索引"""
+    conn = connect(db_path, check_same_thread=False)
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            for statement in LOOKUP_SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _schema_ready.add(db_path)
+    return conn
+
+
+def _prefix_query(conn, prefix, limit):
+    """按姓名前缀查询（大小写不敏感，走索引）"""
+    if not prefix:
+        return conn.execute(
+            "SELECT singer_id, name FROM singers ORDER BY name COLLATE NOCASE LIMIT ?", (limit,)
+        ).fetchall()
+    if '%' in prefix or '_' in prefix or '\\' in prefix:
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return conn.execute(
+            "SELECT singer_id, name FROM singers WHERE name LIKE ? ESCAPE '\\' "
+            "ORDER BY name COLLATE NOCASE LIMIT ?", (escaped + '%', limit)
+        ).fetchall()
+    return conn.execute(
+        "SELECT singer_id, name FROM singers WHERE name LIKE ? ORDER BY name COLLATE NOCASE LIMIT ?",
+        (prefix + '%', limit)
+    ).fetchall()
+
+
+def _lookup(prefix, limit, db_path):
+    """前缀匹配优先，数量不足时用全文索引补充姓名、流派中间的片段匹配"""
+    conn = _connect(db_path)
+    try:
+        matches = _prefix_query(conn, prefix, limit)
+        if prefix and len(matches) < limit:
+            found = {singer_id for singer_id, _ in matches}
+            extra_ids = [i for i in search_ids(prefix, 'singer', limit=limit, db_path=db_path) if i not in found]
+            if extra_ids:
+                placeholders = ', '.join('?' for _ in extra_ids)
+                names = dict(conn.execute(
+                    f"SELECT singer_id, name FROM singers WHERE singer_id IN ({placeholders})", extra_ids
+                ).fetchall())
+                matches += [(i, names[i]) for i in extra_ids if i in names][:limit - len(matches)]
+    finally:
+        conn.close()
+    return [(int(singer_id), name) for singer_id, name in matches]
+
+
+def lookup_singers(prefix='', limit=DEFAULT_LIMIT, db_path=DB_PATH):
+    """返回匹配的 [(singer_id, name), ...]，结果按 (前缀, 数量, 数据版本) 缓存"""
+    prefix = (prefix or '').strip()
+    key = (prefix.lower(), limit, db_path, current_data_version())
+    with _cache_lock:
+        if key in _cache:
+            _stats['hits'] += 1
+            return _cache[key]
+
+    matches = _lookup(prefix, limit, db_path)
+    with _cache_lock:
+        _stats['misses'] += 1
+        _cache[key] = matches
+    return matches
+
+
+def lookup_stats():
+    """返回前缀缓存的条目数与命中率"""
+    with _cache_lock:
+        total = _stats['hits'] + _stats['misses']
+        return {
+            'entries': len(_cache),
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'hit_rate': _stats['hits'] / total if total else 0.0
+        }
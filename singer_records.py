@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+
+from cachetools import LRUCache
+
+from data_version import bump_data_version, current_data_version
+from db_config import DB_PATH, connect
+from writer_service import submit_write, writer_configured
+
+# ==================== 歌手记录访问 ====================
+# 编辑页面按主键读取单个歌手，不再在整张歌手表中按姓名查找。
+# singers.row_version 为行版本号，任何UPDATE都会使其加1（触发器保证，包括SQL控制台的修改）。
+# 保存时带上开始编辑时的版本号（乐观并发控制）：期间被他人修改过则不会覆盖，而是提示冲突。
+
+SINGER_COLUMNS = ['singer_id', 'name', 'birth_date', 'nationality', 'debut_year', 'genre', 'active_status',
+                  'created_at', 'row_version']
+
+# 可编辑的列
+EDITABLE_COLUMNS = ['name', 'birth_date', 'nationality', 'debut_year', 'genre', 'active_status']
+
+# 缓存的记录数
+CACHE_SIZE = 256
+
+RECORD_SCHEMA = [
+    # 未显式修改版本号的UPDATE也递增版本号（recursive_triggers默认关闭，不会递归触发）
+    '''
+    CREATE TRIGGER IF NOT EXISTS singers_row_version AFTER UPDATE ON singers
+    WHEN NEW.row_version = OLD.row_version
+    BEGIN
+        UPDATE singers SET row_version = OLD.row_version + 1 WHERE singer_id = NEW.singer_id;
+    END
+    '''
+]
+
+_cache = LRUCache(maxsize=CACHE_SIZE)
+_cache_lock = threading.Lock()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+class RecordConflict(Exception):
+    """保存时记录已被他人修改或删除；current为最新记录（已删除时为None）"""
+
+    def __init__(self, message, current=None):
+        super().__init__(message)
+        self.current = current
+
+
+# ==================== 表结构 ====================
+def ensure_record_schema(conn):
+    """为singers表添加版本号列与触发器
+
+    检查与ALTER在同一个 BEGIN IMMEDIATE 事务内执行，多个工作进程同时初始化时不会重复添加列。
+    """
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(singers)").fetchall()]
+        if 'row_version' not in columns:
+            conn.execute("ALTER TABLE singers ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1")
+        for statement in RECORD_SCHEMA:
+            conn.execute(statement)
+        conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def _connect(db_path=DB_PATH):
+    """打开记录访问使用的连接，每个数据库只初始化一次表结构"""
+    conn = connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    with _schema_lock:
+        if db_path not in _schema_ready:
+            try:
+                ensure_record_schema(conn)
+            except sqlite3.Error:
+                conn.close()
+                raise
+            _schema_ready.add(db_path)
+    return conn
+
+
+# ==================== 读取 ====================
+def _fetch(singer_id, db_path):
+    """按主键读取一个歌手"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            f"SELECT {', '.join(SINGER_COLUMNS)} FROM singers WHERE singer_id = ?", (int(singer_id),)
+        ).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row is not None else None
+
+
+def fetch_singer(singer_id, db_path=DB_PATH):
+    """按singer_id读取歌手（dict，不存在时为None），结果按 (ID, 数据版本) 缓存"""
+    key = (int(singer_id), db_path, current_data_version())
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+
+    record = _fetch(singer_id, db_path)
+    with _cache_lock:
+        _cache[key] = record
+    return record
+
+
+# ==================== 写入 ====================
+def _execute(sql, params, db_path):
+    """执行写语句并返回影响的行数（多进程部署时交给写入进程）"""
+    if writer_configured():
+        return submit_write(sql, params)['rowcount']
+
+    conn = _connect(db_path)
+    try:
+        cursor = conn.execute(sql, params)
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def update_singer(singer_id, expected_version, values, db_path=DB_PATH):
+    """按版本号更新歌手，返回新版本号；版本不一致时抛出RecordConflict"""
+    columns = [column for column in EDITABLE_COLUMNS if column in values]
+    if not columns:
+        raise ValueError("没有需要更新的列")
+
+    # 先确保版本号列存在（写入进程的连接不会初始化表结构）
+    _connect(db_path).close()
+
+    sql = (f"UPDATE singers SET {', '.join(f'{column} = ?' for column in columns)}, "
+           f"row_version = row_version + 1 WHERE singer_id = ? AND row_version = ?")
+    params = tuple(values[column] for column in columns) + (int(singer_id), int(expected_version))
+    rowcount = _execute(sql, params, db_path)
+    bump_data_version()
+
+    if rowcount == 1:
+        return int(expected_version) + 1
+
+    current = fetch_singer(singer_id, db_path)
+    if current is None:
+        raise RecordConflict("该歌手已被删除")
+    raise RecordConflict(
+        f"该歌手已被他人修改（当前版本 {current['row_version']}，开始编辑时为 {expected_version}）",
+        current
+    )
@@ -0,0 +1,93 @@
+import collections
+import threading
+
+# ==================== 请求合并（single-flight） ====================
+# 同一个键同时只执行一次：第一个调用者负责执行，其余并发调用者等待并共享结果（或异常）。
+# 执行结束后键立即移除，之后的调用会重新执行（是否命中缓存由上层决定）。
+
+_lock = threading.Lock()
+_calls = {}
+_stats = collections.defaultdict(collections.Counter)
+
+
+class _Call:
+    """一次进行中的执行"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+def freeze(value):
+    """把参数转换为可哈希的形式，用于组成键"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(freeze(v) for v in value))
+    return value
+
+
+def coalesce(namespace, key, func, *args, **kwargs):
+    """合并同一 (namespace, key) 的并发调用，返回func的结果"""
+    full_key = (namespace, key)
+    with _lock:
+        call = _calls.get(full_key)
+        leader = call is None
+        if leader:
+            call = _Call()
+            _calls[full_key] = call
+            _stats[namespace]['executions'] += 1
+        else:
+            call.waiters += 1
+            _stats[namespace]['coalesced'] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = func(*args, **kwargs)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        with _lock:
+            _stats[namespace]['errors'] += 1
+        raise
+    finally:
+        with _lock:
+            _calls.pop(full_key, None)
+            if call.waiters:
+                _stats[namespace]['max_waiters'] = max(_stats[namespace]['max_waiters'], call.waiters)
+        call.done.set()
+
+
+# ==================== 统计 ====================
+def coalescing_stats():
+    """按命名空间返回实际执行次数、被合并的调用数、错误数与单次最多等待者数"""
+    with _lock:
+        stats = []
+        for namespace, counter in sorted(_stats.items()):
+            calls = counter['executions'] + counter['coalesced']
+            stats.append({
+                'namespace': namespace,
+                'calls': calls,
+                'executions': counter['executions'],
+                'coalesced': counter['coalesced'],
+                'coalesced_rate': counter['coalesced'] / calls if calls else 0.0,
+                'errors': counter['errors'],
+                'max_waiters': counter['max_waiters'],
+                'inflight': sum(1 for key in _calls if key[0] == namespace)
+            })
+    return stats
+
+
+def reset_coalescing_stats():
+    """清空统计（不影响进行中的执行）"""
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,300 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+from data_version import bump_data_version, reset_monitor_connection
+from db_config import (DB_PATH, archive_path_for, connect, database_exists, database_file, database_name,
+                       database_size)
+from read_pool import close_pool
+
+# ==================== 快照配置 ====================
+# 使用SQLite在线备份接口（sqlite3.Connection.backup）复制数据库：
+#   - 每一步只复制若干页，步与步之间释放源库的读锁，备份期间页面读写照常进行
+#   - 先写入临时文件，完成并通过quick_check后再改名为正式快照，中途失败不会留下半个快照
+#   - 只保留最近的若干个快照，更早的自动删除
+# 恢复时同样通过备份接口把快照写回原数据库文件（不替换文件），已打开的连接随后读到恢复后的数据。
+# 热度归档库（archive.py）与业务库一起快照、一起恢复，快照文件旁的 <快照>.archive 即归档库副本。
+# 初始化脚本删除或重建非空数据库之前必须先成功生成快照，删除时连同WAL文件与归档库一起删除。
+
+SNAPSHOT_DIR = "snapshots"
+
+# 每一步复制的页数，以及步与步之间的等待时间（秒）
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.005
+
+# 保留的快照个数
+KEEP_SNAPSHOTS = 10
+
+SNAPSHOT_SUFFIX = ".db"
+
+# 无法用备份接口读取（已损坏）的文件按原样复制，使用这个后缀
+RAW_COPY_SUFFIX = ".raw"
+
+# 归档库副本：快照文件名加上这个后缀（没有归档库时为空库）
+ARCHIVE_SUFFIX = ".archive"
+
+# 数据库文件旁的日志文件（WAL模式的 -wal/-shm 与回滚日志），删除数据库时一并删除
+SIDECAR_SUFFIXES = ('-wal', '-shm', '-journal')
+
+
+class SnapshotError(Exception):
+    """快照生成或恢复失败"""
+
+
+# ==================== 快照 ====================
+def _snapshot_name(db_path, label=None, suffix=SNAPSHOT_SUFFIX):
+    """生成快照文件名：<库名>-<时间>[-<标签>].db"""
+    name = f"{database_name(db_path)}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+    if label:
+        name += '-' + ''.join(c if c.isalnum() or c in '-_' else '_' for c in label)
+    return name + suffix
+
+
+def _copy_pages(source, target, pages, progress=None):
+    """分步把source库复制到target库"""
+    def on_step(status, remaining, total):
+        if STEP_SLEEP:
+            time.sleep(STEP_SLEEP)
+        if progress is not None:
+            progress(total - remaining, total)
+
+    source.backup(target, pages=pages, progress=on_step)
+
+
+def copy_database(db_path, target_path, pages=PAGES_PER_STEP, progress=None):
+    """在线把数据库复制到target_path（只读打开源库），复制完成后quick_check，返回页数"""
+    source = connect(db_path, read_only=True)
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            _copy_pages(source, target, pages, progress)
+            # 备份会带上源库的WAL模式；快照文件改回回滚日志模式，读取快照时不会生成 -wal/-shm
+            target.execute("PRAGMA journal_mode = DELETE")
+            check = target.execute("PRAGMA quick_check").fetchone()[0]
+            page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            target.close()
+    finally:
+        source.close()
+    if check != 'ok':
+        raise SnapshotError(f"快照校验失败: {check}")
+    return page_count
+
+
+def _copy_archive(archive_path, target_path, pages=PAGES_PER_STEP):
+    """复制归档库；归档库还不存在时写出一个空库，恢复时据此清空归档库"""
+    if database_exists(archive_path):
+        copy_database(archive_path, target_path, pages)
+    else:
+        sqlite3.connect(target_path).close()
+
+
+def create_snapshot(db_path=DB_PATH, label=None, snapshot_dir=SNAPSHOT_DIR, pages=PAGES_PER_STEP,
+                    keep=KEEP_SNAPSHOTS, progress=None, archive_path=None):
+    """在线生成数据库（连同归档库）快照并轮换旧快照，返回快照路径、大小、耗时与删除的旧快照"""
+    if not database_exists(db_path):
+        raise SnapshotError(f"数据库文件不存在: {db_path}")
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, _snapshot_name(db_path, label))
+    archive_copy = path + ARCHIVE_SUFFIX
+    partial_paths = [path + ".partial", archive_copy + ".partial"]
+    start = time.perf_counter()
+
+    try:
+        page_count = copy_database(db_path, partial_paths[0], pages, progress)
+        # 归档库在业务库之后复制：期间执行的归档（先写归档库、再删热表）只会让记录在两边都出现
+        # （读取时按热表去重），不会在两边都缺失
+        _copy_archive(archive_path or archive_path_for(db_path), partial_paths[1], pages)
+        os.replace(partial_paths[1], archive_copy)
+        os.replace(partial_paths[0], path)
+    except (sqlite3.Error, OSError, SnapshotError) as e:
+        for partial_path in partial_paths + [archive_copy]:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        if isinstance(e, SnapshotError):
+            raise
+        raise SnapshotError(f"生成快照失败: {e}") from e
+
+    rotated = rotate_snapshots(db_path, snapshot_dir, keep)
+    print(f"已生成快照: {path}")
+    return {
+        'path': path,
+        'bytes': os.path.getsize(path) + os.path.getsize(archive_copy),
+        'pages': page_count,
+        'seconds': round(time.perf_counter() - start, 4),
+        'rotated': rotated
+    }
+
+
+def list_snapshots(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """返回某个数据库的快照列表（新的在前）"""
+    if not os.path.isdir(snapshot_dir):
+        return []
+    stem = database_name(db_path) + '-'
+    snapshots = []
+    for name in os.listdir(snapshot_dir):
+        if not name.startswith(stem) or not name.endswith((SNAPSHOT_SUFFIX, RAW_COPY_SUFFIX)):
+            continue
+        path = os.path.join(snapshot_dir, name)
+        stat = os.stat(path)
+        snapshots.append({
+            'name': name,
+            'path': path,
+            'bytes': stat.st_size,
+            'created_at': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+            'restorable': name.endswith(SNAPSHOT_SUFFIX),
+            'mtime': stat.st_mtime
+        })
+    snapshots.sort(key=lambda snapshot: (snapshot['mtime'], snapshot['name']), reverse=True)
+    return snapshots
+
+
+def rotate_snapshots(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+    """删除超出保留个数的旧快照，返回删除的文件名"""
+    if not keep or keep <= 0:
+        return []
+    removed = []
+    for snapshot in [s for s in list_snapshots(db_path, snapshot_dir) if s['restorable']][keep:]:
+        for path in (snapshot['path'], snapshot['path'] + ARCHIVE_SUFFIX):
+            for file in (path,) + tuple(path + suffix for suffix in SIDECAR_SUFFIXES):
+                if os.path.exists(file):
+                    os.remove(file)
+        removed.append(snapshot['name'])
+    return removed
+
+
+# ==================== 恢复 ====================
+def _write_back(snapshot_file, db_path, pages):
+    """校验快照文件并通过备份接口写回数据库"""
+    try:
+        source = sqlite3.connect(f"file:{snapshot_file}?mode=ro", uri=True)
+        try:
+            check = source.execute("PRAGMA quick_check").fetchone()[0]
+            if check != 'ok':
+                raise SnapshotError(f"快照已损坏: {check}")
+            target = connect(db_path, timeout=30)
+            try:
+                # 写入目标库期间一直持有写锁，其他连接看到的是恢复前或恢复后的完整数据
+                _copy_pages(source, target, pages)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    except sqlite3.Error as e:
+        raise SnapshotError(f"恢复快照失败: {e}") from e
+
+
+def restore_snapshot(snapshot_path, db_path=DB_PATH, pages=PAGES_PER_STEP, snapshot_dir=SNAPSHOT_DIR,
+                     archive_path=None):
+    """把快照（连同归档库）写回数据库（恢复前先为当前数据库生成一个快照），返回恢复前的快照信息"""
+    if not os.path.exists(snapshot_path) or not snapshot_path.endswith(SNAPSHOT_SUFFIX):
+        raise SnapshotError(f"快照文件不存在或不可恢复: {snapshot_path}")
+    archive_path = archive_path or archive_path_for(db_path)
+
+    # 恢复前的数据同样保留一份，误操作时可以再恢复回来
+    before = create_snapshot(db_path, label='pre-restore', snapshot_dir=snapshot_dir, keep=0,
+                             archive_path=archive_path) if has_data(db_path) else None
+
+    _write_back(snapshot_path, db_path, pages)
+    archive_copy = snapshot_path + ARCHIVE_SUFFIX
+    if not os.path.exists(archive_copy):
+        print("快照不含归档库副本（旧版本生成），归档库保持不变")
+    elif database_exists(archive_path) or os.path.getsize(archive_copy):
+        _write_back(archive_copy, archive_path, pages)
+
+    # 连接池与数据版本监视连接重新打开，各类缓存随数据版本失效
+    close_pool()
+    reset_monitor_connection()
+    bump_data_version()
+    print(f"已从快照恢复: {snapshot_path}")
+    return before
+
+
+# ==================== 初始化保护 ====================
+def has_data(db_path=DB_PATH):
+    """数据库文件存在且不为空"""
+    return database_exists(db_path) and database_size(db_path) > 0
+
+
+def snapshot_before_reset(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """删除或重建数据库前调用：非空数据库必须先生成快照，否则抛出SnapshotError拒绝继续
+
+    文件已损坏、无法用备份接口读取时按原样复制一份。返回快照路径，空数据库返回None。
+    """
+    if not has_data(db_path):
+        return None
+    try:
+        return create_snapshot(db_path, label='pre-reset', snapshot_dir=snapshot_dir, keep=0)['path']
+    except SnapshotError as e:
+        print(f"备份接口无法读取数据库，按原样复制: {e}")
+
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        path = os.path.join(snapshot_dir, _snapshot_name(db_path, 'pre-reset', RAW_COPY_SUFFIX))
+        shutil.copy2(database_file(db_path), path)
+        archive_file = database_file(archive_path_for(db_path))
+        if archive_file and os.path.exists(archive_file):
+            shutil.copy2(archive_file, path + ARCHIVE_SUFFIX)
+    except (OSError, TypeError) as e:
+        raise SnapshotError(f"无法备份 {db_path}，拒绝删除: {e}") from e
+    return path
+
+
+def remove_database(db_path=DB_PATH):
+    """删除数据库文件、WAL/回滚日志与对应的归档库（先用snapshot_before_reset备份），返回删除的文件
+
+    遗留的 -wal 文件会被重放到同名的新数据库上，旧归档库会被挂载到新生成的数据上，因此一并删除。
+    """
+    # 先关闭本进程持有的只读连接
+    close_pool()
+    reset_monitor_connection()
+    removed = []
+    for path in (database_file(db_path), database_file(archive_path_for(db_path))):
+        if not path:
+            continue
+        for file in (path,) + tuple(path + suffix for suffix in SIDECAR_SUFFIXES):
+            if os.path.exists(file):
+                os.remove(file)
+                removed.append(file)
+    return removed
+
+
+# ==================== 命令行入口 ====================
+def main(argv=None):
+    """命令行快照：python snapshots.py create | list | restore <快照文件>"""
+    parser = argparse.ArgumentParser(description="数据库在线快照与恢复")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="快照目录")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    create_parser = subparsers.add_parser("create", help="生成快照")
+    create_parser.add_argument("--label", default=None, help="快照标签")
+    create_parser.add_argument("--keep", type=int, default=KEEP_SNAPSHOTS, help="保留的快照个数")
+    subparsers.add_parser("list", help="列出快照")
+    restore_parser = subparsers.add_parser("restore", help="从快照恢复")
+    restore_parser.add_argument("snapshot", help="快照文件路径")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "create":
+            report = create_snapshot(args.db, args.label, args.dir, keep=args.keep)
+            print(f"{report['pages']} 页，{report['bytes'] / 1024:.1f} KB，耗时 {report['seconds']} 秒；"
+                  f"删除旧快照 {len(report['rotated'])} 个")
+        elif args.command == "list":
+            for snapshot in list_snapshots(args.db, args.dir):
+                print(f"{snapshot['created_at']}  {snapshot['bytes']:>10}  {snapshot['path']}")
+        else:
+            before = restore_snapshot(args.snapshot, args.db, snapshot_dir=args.dir)
+            if before:
+                print(f"恢复前的数据已保存为 {before['path']}")
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
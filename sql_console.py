@@ -0,0 +1,217 @@
+import sqlite3
+import threading
+import time
+
+from data_version import bump_data_version
+from db_config import DB_PATH, connect
+from writer_service import submit_write, writer_configured
+
+# ==================== SQL控制台配置 ====================
+DEFAULT_MAX_ROWS = 1000
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_TIMEOUT = 5.0
+
+# 每执行多少条SQLite虚拟机指令检查一次超时/取消
+PROGRESS_INTERVAL = 1000
+
+READ_KEYWORDS = ('SELECT', 'WITH', 'VALUES', 'PRAGMA', 'EXPLAIN')
+
+# 可以包装为子查询（SELECT * FROM (...) LIMIT ? OFFSET ?）分页的语句，PRAGMA/EXPLAIN只能直接执行
+SUBQUERY_KEYWORDS = ('SELECT', 'WITH', 'VALUES')
+
+
+# ==================== 工具函数 ====================
+def strip_comments(sql):
+    """去掉 -- 行注释和 /* */ 块注释，字符串和带引号的标识符中的内容保持不变"""
+    parts = []
+    i = 0
+    while i < len(sql):
+        char = sql[i]
+        if char in ("'", '"', '`', '['):
+            # 引号内容原样保留，两个连续引号表示转义
+            close = ']' if char == '[' else char
+            end = sql.find(close, i + 1)
+            while end != -1 and close != ']' and sql[end + 1:end + 2] == close:
+                end = sql.find(close, end + 2)
+            end = len(sql) if end == -1 else end + 1
+            parts.append(sql[i:end])
+            i = end
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = len(sql) if end == -1 else end
+            parts.append(' ')
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = len(sql) if end == -1 else end + 2
+            parts.append(' ')
+        else:
+            parts.append(char)
+            i += 1
+    return ''.join(parts)
+
+
+def normalize_sql(sql):
+    """去掉注释、首尾空白和末尾分号，结果可以直接包装为子查询"""
+    sql = strip_comments(sql).strip()
+    while sql.endswith(';'):
+        sql = sql[:-1].rstrip()
+    return sql
+
+
+def _first_keyword(sql):
+    words = normalize_sql(sql).split(None, 1)
+    return words[0].upper() if words else ''
+
+
+def is_read_statement(sql):
+    """判断是否为只读查询语句；带赋值的PRAGMA（如 PRAGMA user_version = 1）按写入语句处理"""
+    keyword = _first_keyword(sql)
+    if keyword == 'PRAGMA':
+        return '=' not in normalize_sql(sql)
+    return keyword in READ_KEYWORDS
+
+
+def supports_subquery(sql):
+    """只读语句能否包装为子查询分页"""
+    return _first_keyword(sql) in SUBQUERY_KEYWORDS
+
+
+def _connect(read_only, db_path=DB_PATH):
+    """为控制台创建独立连接，不复用页面的线程连接"""
+    if read_only:
+        conn = connect(db_path, read_only=True, check_same_thread=False)
+    else:
+        conn = connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def _install_limits(conn, timeout_seconds, cancel_event=None):
+    """通过进度回调实现超时与取消，回调返回非0时SQLite中断当前语句"""
+    deadline = time.monotonic() + timeout_seconds
+
+    def progress_handler():
+        if cancel_event is not None and cancel_event.is_set():
+            return 1
+        return 1 if time.monotonic() > deadline else 0
+
+    conn.set_progress_handler(progress_handler, PROGRESS_INTERVAL)
+
+
+def _raise_if_interrupted(error, timeout_seconds, cancel_event):
+    """将SQLite的interrupted错误转换为更明确的异常"""
+    if 'interrupted' in str(error).lower():
+        if cancel_event is not None and cancel_event.is_set():
+            raise InterruptedError("查询已被取消") from error
+        raise TimeoutError(f"查询超过 {timeout_seconds} 秒，已自动取消") from error
+    raise error
+
+
+def new_cancel_event():
+    """创建取消标记，调用其 set() 即可中断正在执行的语句"""
+    return threading.Event()
+
+
+# ==================== 查询 ====================
+def fetch_page(sql, page=0, page_size=DEFAULT_PAGE_SIZE, max_rows=DEFAULT_MAX_ROWS,
+               timeout_seconds=DEFAULT_TIMEOUT, cancel_event=None, db_path=DB_PATH):
+    """分页执行只读查询，只读取当前页需要的行
+
+    SELECT/WITH/VALUES 包装为子查询由SQLite分页；PRAGMA/EXPLAIN 直接执行，跳过前面各页的行。
+    返回 columns、rows、has_more（是否还有下一页）、truncated（是否达到行数上限）和耗时。
+    """
+    if not is_read_statement(sql):
+        raise ValueError("分页查询只支持SELECT/WITH/VALUES/PRAGMA/EXPLAIN语句")
+
+    offset = page * page_size
+    limit = min(page_size, max_rows - offset)
+    if limit <= 0:
+        return {'columns': [], 'rows': [], 'page': page, 'has_more': False,
+                'truncated': True, 'elapsed': 0.0}
+
+    conn = _connect(read_only=True, db_path=db_path)
+    _install_limits(conn, timeout_seconds, cancel_event)
+    start = time.perf_counter()
+    try:
+        # 多取一行用于判断是否还有下一页
+        if supports_subquery(sql):
+            cursor = conn.execute(
+                f"SELECT * FROM ({normalize_sql(sql)}) LIMIT ? OFFSET ?",
+                (limit + 1, offset)
+            )
+        else:
+            cursor = conn.execute(normalize_sql(sql))
+            skipped = 0
+            while skipped < offset:
+                chunk = cursor.fetchmany(min(page_size, offset - skipped))
+                if not chunk:
+                    break
+                skipped += len(chunk)
+        columns = [col[0] for col in cursor.description] if cursor.description else []
+        rows = cursor.fetchmany(limit + 1)
+    except sqlite3.OperationalError as e:
+        _raise_if_interrupted(e, timeout_seconds, cancel_event)
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'columns': columns,
+        'rows': rows,
+        'page': page,
+        'has_more': has_more and offset + limit < max_rows,
+        'truncated': has_more and offset + limit >= max_rows,
+        'elapsed': time.perf_counter() - start
+    }
+
+
+def execute_statement(sql, timeout_seconds=DEFAULT_TIMEOUT, cancel_event=None, db_path=DB_PATH):
+    """在事务中执行写入语句，超时则回滚，返回受影响的行数
+
+    多进程部署时交给写入进程执行，此时超时由写入进程的请求超时控制，不能取消。
+    """
+    if writer_configured():
+        row_count = submit_write(normalize_sql(sql))['rowcount']
+        bump_data_version()
+        return row_count
+
+    conn = _connect(read_only=False, db_path=db_path)
+    _install_limits(conn, timeout_seconds, cancel_event)
+    try:
+        cursor = conn.execute(normalize_sql(sql))
+        row_count = cursor.rowcount
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        _raise_if_interrupted(e, timeout_seconds, cancel_event)
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    bump_data_version()
+    return row_count
+
+
+# ==================== 执行计划 ====================
+def explain_query_plan(sql, params=None, db_path=DB_PATH):
+    """返回 EXPLAIN QUERY PLAN 的结果行（id、parent、detail）"""
+    conn = _connect(read_only=True, db_path=db_path)
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {normalize_sql(sql)}", params or ()).fetchall()
+    finally:
+        conn.close()
+    return [{'id': row[0], 'parent': row[1], 'detail': row[3]} for row in rows]
+
+
+def format_query_plan(plan_rows):
+    """将执行计划格式化为缩进的树形文本"""
+    depth = {0: -1}
+    lines = []
+    for row in plan_rows:
+        level = depth.get(row['parent'], -1) + 1
+        depth[row['id']] = level
+        lines.append(f"{'   ' * level}└─ {row['detail']}")
+    return "\n".join(lines)
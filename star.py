@@ -8,10 +8,49 @@ from datetime import datetime, timedelta
 import warnings
 import sqlite3
 import os
-import threading
 import matplotlib.pyplot as plt
 import matplotlib
 import time
+import tempfile
+
+from data_export import (EXPORT_FORMATS, EXPORT_MIME_TYPES, default_file_name,
+                         export_query, export_table)
+from data_version import bump_data_version, current_data_version
+from arrow_cache import CACHED_TABLES, cache_memory_report, get_frame, get_table
+from db_schema import apply_compact_dtypes, fillna_category
+from sql_console import (DEFAULT_MAX_ROWS, DEFAULT_TIMEOUT, execute_statement, explain_query_plan,
+                         fetch_page, format_query_plan, is_read_statement, normalize_sql,
+                         supports_subquery)
+from query_monitor import (clear_records, get_plan, get_records, monitored, note_execution,
+                           slowest_statements)
+from timeseries import DEFAULT_MAX_POINTS, DOWNSAMPLE_METHODS, filter_window, scatter_trace
+from rollups import GRANULARITIES, get_rollup, rollup_frame
+from archive import (DEFAULT_HORIZON_DAYS, archive_cutoff, archive_popularity, archive_stats, popularity_date_range,
+                     read_popularity)
+from writer_service import submit_write, writer_configured, writer_stats
+from prefetch import (predict_next_pages, prefetch, prefetch_pages, prefetch_stats, record_navigation,
+                      register_warmer, set_default_next_pages)
+from concert_totals import (COUNTED_TABLES, TOTAL_COLUMNS, check_totals, get_totals, get_yearly_totals,
+                            rebuild_totals)
+from maintenance import (CHILD_TABLES, DEFAULT_INTERVALS, SCHEDULED_TASKS, analyze, count_orphans, database_summary,
+                         delete_singers, format_report, integrity_check, reclaim_space, run_task,
+                         scheduler_status, start_scheduler, stop_scheduler, storage_report, sweep_orphans)
+from singer_records import EDITABLE_COLUMNS, SINGER_COLUMNS, RecordConflict, fetch_singer, update_singer
+from singer_lookup import DEFAULT_LIMIT as SINGER_PICKER_LIMIT, lookup_singers, lookup_stats
+from search_index import SEARCH_KINDS, index_stats, rebuild_search_index, search_ids
+from read_pool import concurrent_read_stats, fetch_concurrently
+from analytics_snapshot import (REFRESH_SECONDS as ANALYTICS_REFRESH_SECONDS, analytics_enabled,
+                                analytics_source, analytics_status, get_analytics_frame,
+                                refresh_analytics_snapshot, set_analytics_enabled)
+from storage import get_backend
+from db_config import (ARCHIVE_DB_PATH, DB_PATH, connect, database_exists, database_file, database_size,
+                       describe_database)
+from snapshots import (KEEP_SNAPSHOTS, SnapshotError, create_snapshot, list_snapshots, remove_database,
+                       restore_snapshot, snapshot_before_reset)
+from single_flight import coalescing_stats, reset_coalescing_stats
+from figure_cache import figure_cache_stats, get_figure_json, invalidate_figures, render_figure_json
+from page_profiler import (get_profile_dir, page_phase, page_stats, profiled_page, prometheus_text,
+                           reset_stats, set_profile_dir, start_metrics_server, timed_phase)
 
 matplotlib.use('Agg')
 warnings.filterwarnings('ignore')
@@ -25,13 +64,27 @@ st.set_page_config(
 )
 
 
+# ==================== 存储后端 ====================
+# 合计表、全文索引、汇总、归档库与维护工具依赖本地SQLite库，其他后端下改为直接访问业务表或不提供
+LOCAL_SQLITE_ONLY = "该功能依赖本地SQLite库（触发器汇总、全文索引、归档库等），当前存储后端不可用"
+
+
+def uses_local_sqlite():
+    """当前存储后端是否为本地SQLite库"""
+    return get_backend().dialect == 'sqlite'
+
+
 # ==================== 数据库初始化 ====================
 def ensure_database_initialized():
     """确保数据库已初始化"""
-    db_path = "concert_management.db"
+    # 服务器数据库（如Oracle）不需要检查本地文件，缺少的表在后面的表结构检查中创建
+    if not uses_local_sqlite():
+        return True
+
+    db_path = DB_PATH
 
     # 如果数据库不存在，或者存在但为空（小于1KB），则重新初始化
-    if not os.path.exists(db_path) or os.path.getsize(db_path) < 1024:
+    if not database_exists(db_path) or database_size(db_path) < 1024:
         st.info("🔧 首次运行或数据库异常，正在初始化数据库...")
 
         # 使用简单的进度指示器
@@ -40,14 +93,20 @@ def ensure_database_initialized():
         # 创建数据库文件
         status_placeholder.text("创建数据库文件...")
         try:
-            # 如果数据库文件存在但损坏，先删除
-            if os.path.exists(db_path):
-                os.remove(db_path)
+            # 如果数据库文件存在但损坏，先备份（备份失败时抛出SnapshotError，不删除）再连同WAL文件与归档库一起删除
+            db_file = database_file(db_path)
+            if db_file and os.path.exists(db_file):
+                snapshot = snapshot_before_reset(db_path)
+                if snapshot:
+                    st.warning(f"原数据库文件已备份到 {snapshot}")
+                remove_database(db_path)
 
             # 连接到数据库（会自动创建文件）
-            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn = connect(db_path, check_same_thread=False)
             conn.row_factory = sqlite3.Row
             conn.execute("PRAGMA foreign_keys = ON")
+            # auto_vacuum只能在建表前设置
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
 
             # 创建表结构
             status_placeholder.text("创建表结构...")
@@ -332,7 +391,7 @@ def ensure_database_initialized():
             if st.button("尝试简单初始化"):
                 try:
                     # 创建最简单的数据库文件
-                    conn = sqlite3.connect(db_path, check_same_thread=False)
+                    conn = connect(db_path, check_same_thread=False)
                     conn.execute('CREATE TABLE IF NOT EXISTS singers (id INTEGER PRIMARY KEY, name TEXT)')
                     conn.execute('CREATE TABLE IF NOT EXISTS concerts (id INTEGER PRIMARY KEY, name TEXT)')
                     conn.execute('INSERT INTO singers (name) VALUES ("示例歌手")')
@@ -353,13 +412,9 @@ if not ensure_database_initialized():
 
 
 
-# ==================== 线程本地存储 ====================
-_thread_local = threading.local()
-
-
 def check_and_initialize_database():
     """检查并初始化数据库"""
-    if not os.path.exists("concert_management.db"):
+    if uses_local_sqlite() and not database_exists(DB_PATH):
         st.info("🔧 首次运行，正在初始化数据库...")
 
         # 显示进度条
@@ -368,12 +423,12 @@ def check_and_initialize_database():
 
         # 步骤1：创建数据库文件
         status_text.text("创建数据库文件...")
-        open("concert_management.db", 'w').close()
+        connect(DB_PATH).close()
         progress_bar.progress(25)
 
         # 步骤2：创建表结构
         status_text.text("创建表结构...")
-        conn = sqlite3.connect("concert_management.db", check_same_thread=False)
+        conn = connect(DB_PATH, check_same_thread=False)
         conn.row_factory = sqlite3.Row
 
         # 创建所有表
@@ -405,141 +460,58 @@ if __name__ == "__main__":
         st.rerun()
 
 def init_database():
-    """初始化数据库表"""
-    conn = get_db_connection()
-    if conn:
-        try:
-            # 创建歌手表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS singers (
-                    singer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    birth_date DATE,
-                    nationality TEXT,
-                    debut_year INTEGER,
-                    genre TEXT,
-                    active_status TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # 创建演唱会表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS concerts (
-                    concert_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    singer_id INTEGER,
-                    concert_name TEXT NOT NULL,
-                    concert_date DATE,
-                    city TEXT,
-                    venue TEXT,
-                    capacity INTEGER,
-                    attendance INTEGER,
-                    ticket_price REAL,
-                    revenue REAL,
-                    attendance_rate REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (singer_id) REFERENCES singers(singer_id)
-                )
-            ''')
-
-            # 创建热度表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS popularity (
-                    popularity_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    singer_id INTEGER,
-                    record_date DATE,
-                    fan_count INTEGER,
-                    topic_score REAL,
-                    popularity_score REAL,
-                    social_media_mentions INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (singer_id) REFERENCES singers(singer_id)
-                )
-            ''')
-
-            # 创建城市表
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS cities (
-                    city_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    city_name TEXT NOT NULL,
-                    country TEXT,
-                    population INTEGER,
-                    avg_concert_capacity INTEGER,
-                    concert_frequency INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            conn.commit()
-            print("数据库表初始化完成")
-        except Exception as e:
-            print(f"数据库初始化失败: {str(e)}")
+    """初始化数据库表（建表语句按存储后端的方言生成）"""
+    try:
+        get_backend().create_schema()
+        print("数据库表初始化完成")
+    except Exception as e:
+        print(f"数据库初始化失败: {str(e)}")
 
 
 def get_db_connection():
-    """获取当前线程的数据库连接"""
-    if not hasattr(_thread_local, "conn") or _thread_local.conn is None:
-        try:
-            # SQLite数据库文件路径
-            db_path = "concert_management.db"
-
-            # 创建数据库连接，启用check_same_thread=False以支持多线程
-            conn = sqlite3.connect(db_path, check_same_thread=False)
-
-            conn.text_factory = str
+    """获取当前线程的数据库连接（由存储后端创建，失败时返回None）"""
+    return get_backend().get_connection()
 
-            # 设置返回字典格式
-            conn.row_factory = sqlite3.Row
-
-            # 启用外键支持
-            conn.execute("PRAGMA foreign_keys = ON")
 
-            # 设置文本编码为UTF-8
-            conn.execute("PRAGMA encoding = 'UTF-8'")
+def close_db_connection():
+    """关闭（或归还）当前线程的数据库连接"""
+    get_backend().close_connection()
 
-            _thread_local.conn = conn
-            print(f"线程 {threading.current_thread().name} 创建了新的数据库连接")
 
-        except Exception as e:
-            print(f"创建数据库连接失败: {str(e)}")
-            _thread_local.conn = None
+# ==================== 数据库查询函数 ====================
+@timed_phase('fetch')
+@monitored('query')
+def query_database(query, params=None):
+    """执行数据库查询
 
-    return _thread_local.conn
+    缓存键包含数据版本：其他进程（或写入进程）提交后，本进程的缓存结果自动失效。
+    非SQLite后端无法感知其他会话的写入，每次直接查询。
+    """
+    if not uses_local_sqlite():
+        return _execute_query(query, params)
+    return _query_database_cached(query, params, current_data_version())
 
 
-def close_db_connection():
-    """关闭当前线程的数据库连接"""
-    if hasattr(_thread_local, "conn") and _thread_local.conn:
-        try:
-            _thread_local.conn.close()
-            print(f"线程 {threading.current_thread().name} 关闭了数据库连接")
-        except:
-            pass
-        finally:
-            _thread_local.conn = None
+@st.cache_data(ttl=600)
+def _query_database_cached(query, params, data_version):
+    """执行数据库查询（按查询、参数与数据版本缓存）
 
+    多个会话同时未命中缓存时，st.cache_data 按键加锁，相同的查询只执行一次，其余调用等待后读取缓存，
+    因此这里不再做请求合并（并发读取的合并见 read_pool.read_sql，图表的合并见 figure_cache）。
+    """
+    return _execute_query(query, params)
 
-# ==================== 数据库查询函数 ====================
-@st.cache_data(ttl=600)
-def query_database(query, params=None):
-    """执行数据库查询"""
-    conn = get_db_connection()
 
-    if conn is None:
-        print("没有可用的数据库连接")
-        return None
+def _execute_query(query, params):
+    """通过存储后端执行查询并转换为DataFrame"""
+    # 只有未命中缓存的调用才会执行到这里
+    note_execution()
 
     try:
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
+        columns, data = get_backend().fetch(query, params)
 
         # 获取列名
-        if cursor.description:
-            columns = [col[0] for col in cursor.description]
-            data = cursor.fetchall()
+        if columns:
             # 转换为字典列表
             data_dicts = []
             for row in data:
@@ -555,9 +527,6 @@ def query_database(query, params=None):
                                 value = value.decode('utf-8', errors='ignore')
                             except:
                                 value = str(value)
-                    # 如果值是None，转换为空字符串
-                    elif value is None:
-                        value = ''
                     row_dict[col_name] = value
                 data_dicts.append(row_dict)
 
@@ -565,29 +534,12 @@ def query_database(query, params=None):
             # 确保列名都是小写
             if not df.empty:
                 df.columns = [col.lower() for col in df.columns]
-                # 确保特定数值列是数值类型
-                numeric_columns = ['singer_id', 'concert_id', 'popularity_id', 'city_id',
-                                   'capacity', 'attendance', 'ticket_price', 'revenue',
-                                   'attendance_rate', 'fan_count', 'topic_score',
-                                   'popularity_score', 'social_media_mentions',
-                                   'population', 'avg_concert_capacity', 'concert_frequency',
-                                   'debut_year']
-
-                for col in numeric_columns:
-                    if col in df.columns:
-                        # 先转换为字符串，再转换为数值
-                        df[col] = pd.to_numeric(df[col], errors='coerce')
-
-                # 确保日期列是日期类型
-                date_columns = ['birth_date', 'concert_date', 'record_date', 'created_at']
-                for col in date_columns:
-                    if col in df.columns:
-                        df[col] = pd.to_datetime(df[col], errors='coerce')
+                # 按列类型映射转换为紧凑类型（category、可空小整数、float32、日期）
+                df = apply_compact_dtypes(df)
 
         else:
             df = pd.DataFrame()
 
-        cursor.close()
         return df
 
     except Exception as e:
@@ -596,21 +548,25 @@ def query_database(query, params=None):
 
 
 # ==================== 数据获取函数 ====================
-@st.cache_data(ttl=600)
+@timed_phase('fetch')
 def get_data(table_name):
-    """从数据库获取数据"""
-    if table_name == 'singers':
-        query = "SELECT * FROM singers ORDER BY singer_id"
-    elif table_name == 'concerts':
-        query = "SELECT * FROM concerts ORDER BY concert_date DESC"
-    elif table_name == 'popularity':
-        query = "SELECT * FROM popularity ORDER BY record_date DESC"
-    elif table_name == 'cities':
-        query = "SELECT * FROM cities ORDER BY city_id"
-    else:
-        query = f"SELECT * FROM {table_name}"
+    """从数据库获取数据
+
+    四张业务表从进程级Arrow缓存读取，所有会话共享同一份只读数据，
+    返回的DataFrame是ArrowDtype的零拷贝视图。Arrow缓存只读取本地SQLite库，其他后端改为直接查询。
+    """
+    if table_name in CACHED_TABLES and not uses_local_sqlite():
+        df = query_database(CACHED_TABLES[table_name])
+        return df if df is not None else pd.DataFrame()
+
+    if table_name in CACHED_TABLES:
+        try:
+            return get_frame(table_name)
+        except Exception as e:
+            print(f"读取Arrow缓存失败: {str(e)}")
+            return pd.DataFrame()
 
-    df = query_database(query)
+    df = query_database(f"SELECT * FROM {table_name}")
 
     if df is None:
         # 如果查询失败，返回空DataFrame
@@ -619,31 +575,154 @@ def get_data(table_name):
     return df
 
 
+@timed_phase('fetch')
+def get_analytics_data(table_name):
+    """分析页面获取业务表：开启分析快照时读取只读副本，否则与get_data相同"""
+    if not uses_local_sqlite():
+        return get_data(table_name)
+    try:
+        return get_analytics_frame(table_name)
+    except Exception as e:
+        print(f"读取分析快照失败: {str(e)}")
+        return get_data(table_name)
+
+
+# ==================== 非SQLite后端 ====================
+# 合计表、歌手前缀索引、行版本、全文索引、热度汇总、归档库与维护工具都建在本地SQLite库上。
+# 其他后端（Oracle）没有这些辅助表：下面的函数改为通过存储后端直接读写业务表，
+# SQL只使用两种数据库都支持的写法，按年度、按周期的分组在pandas中完成。
+def read_totals():
+    """全部演唱会的合计与歌手、城市数量：SQLite读取触发器维护的合计表，其他后端直接聚合业务表"""
+    if uses_local_sqlite():
+        return get_totals()
+
+    backend = get_backend()
+    _, rows = backend.fetch("SELECT COUNT(*), COALESCE(SUM(revenue), 0), COALESCE(SUM(attendance), 0), "
+                            "COALESCE(SUM(capacity), 0) FROM concerts")
+    totals = dict(zip(TOTAL_COLUMNS, rows[0]))
+    for table_name, key in COUNTED_TABLES.items():
+        totals[key] = backend.fetch(f"SELECT COUNT(*) FROM {table_name}")[1][0][0]
+    totals['attendance_rate'] = (totals['total_attendance'] / totals['total_capacity']
+                                 if totals['total_capacity'] else 0.0)
+    return totals
+
+
+def read_yearly_totals():
+    """各年度的合计：其他后端按演唱会日期在pandas中分组（日期缺失记入 unknown）"""
+    if uses_local_sqlite():
+        return get_yearly_totals()
+
+    concerts_df = get_data('concerts')
+    if concerts_df.empty:
+        return pd.DataFrame(columns=['year'] + TOTAL_COLUMNS)
+    years = pd.to_datetime(concerts_df['concert_date'], errors='coerce').dt.year
+    grouped = concerts_df.assign(year=years.map(lambda y: 'unknown' if pd.isna(y) else str(int(y)))).groupby('year')
+    return pd.DataFrame({
+        'concert_count': grouped.size(),
+        'total_revenue': grouped['revenue'].sum(),
+        'total_attendance': grouped['attendance'].sum(),
+        'total_capacity': grouped['capacity'].sum()
+    }).reset_index()
+
+
+def find_singers(prefix=''):
+    """按姓名前缀查找歌手，返回 [(singer_id, name), ...]"""
+    if uses_local_sqlite():
+        return lookup_singers(prefix)
+
+    backend = get_backend()
+    escaped = (prefix or '').strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    sql = backend.limit_sql("SELECT singer_id, name FROM singers WHERE name LIKE ? ESCAPE '\\' "
+                            "ORDER BY name, singer_id", SINGER_PICKER_LIMIT)
+    _, rows = backend.fetch(sql, (escaped + '%',))
+    return [(int(singer_id), name) for singer_id, name in rows]
+
+
+def load_singer(singer_id):
+    """按singer_id读取歌手（dict，不存在时为None）；其他后端没有行版本列，版本号固定为1"""
+    if uses_local_sqlite():
+        return fetch_singer(singer_id)
+
+    columns = [column for column in SINGER_COLUMNS if column != 'row_version']
+    names, rows = get_backend().fetch(f"SELECT {', '.join(columns)} FROM singers WHERE singer_id = ?",
+                                      (int(singer_id),))
+    return dict(zip(names, rows[0]), row_version=1) if rows else None
+
+
+def save_singer(singer_id, base_version, values):
+    """保存歌手修改并返回新版本号；其他后端没有行版本列，直接按主键更新"""
+    if uses_local_sqlite():
+        return update_singer(singer_id, base_version, values)
+
+    columns = [column for column in EDITABLE_COLUMNS if column in values]
+    sql = f"UPDATE singers SET {', '.join(f'{column} = ?' for column in columns)} WHERE singer_id = ?"
+    if not execute_sql(sql, tuple(values[column] for column in columns) + (int(singer_id),)):
+        raise RuntimeError("更新歌手失败")
+    return base_version
+
+
+def remove_singer(singer_id):
+    """级联删除歌手及其演唱会、热度记录，返回结果说明"""
+    if uses_local_sqlite():
+        return format_report(delete_singers([singer_id]))
+
+    tables = CHILD_TABLES + ['singers']
+    rowcounts = get_backend().execute_batch(
+        [(f"DELETE FROM {table} WHERE singer_id = ?", (int(singer_id),)) for table in tables]
+    )
+    bump_data_version()
+    return '，'.join(f"{table} {count} 行" for table, count in zip(tables, rowcounts) if count) or '无'
+
+
+# 搜索框的说明：3个字符及以上走全文索引，更短的关键词扫描索引表做片段匹配
+SEARCH_HELP = "3个字符及以上按全文索引检索、按相关度排序；1~2个字符按片段匹配（扫描整个索引，前缀匹配的排在前面）"
+
+
+def filter_by_search(df, term, kind, id_column, fallback_column):
+    """按全文索引的检索结果筛选DataFrame并保持检索结果的相关度顺序，索引不可用时退回到按列片段匹配"""
+    def fragment_match():
+        return df[df[fallback_column].astype(str).str.contains(term, case=False, na=False, regex=False)]
+
+    if not uses_local_sqlite():
+        return fragment_match()
+    try:
+        ids = search_ids(term, kind)
+    except Exception as e:
+        print(f"全文检索失败: {str(e)}")
+        return fragment_match()
+
+    positions = {ref_id: position for position, ref_id in enumerate(ids)}
+    matched = df[df[id_column].isin(ids)]
+    order = [positions[int(ref_id)] for ref_id in matched[id_column]]
+    return matched.iloc[np.argsort(order, kind='stable')]
+
+
 # ==================== 数据库操作函数 ====================
+@monitored('execute')
 def execute_sql(sql, params=None):
     """执行SQL语句（用于INSERT、UPDATE、DELETE）"""
-    conn = get_db_connection()
+    note_execution()
 
-    if conn is None:
-        print("没有可用的数据库连接")
-        return False
+    # 多进程部署时交给写入进程执行
+    if writer_configured():
+        try:
+            result = submit_write(sql, params)
+            note_execution(result['rowcount'])
+            bump_data_version()
+            print(f"SQL执行成功(写入进程): {sql[:50]}...")
+            return True
+        except Exception as e:
+            print(f"执行SQL失败: {str(e)}")
+            return False
 
     try:
-        cursor = conn.cursor()
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
-        conn.commit()
-        cursor.close()
+        # 后端在失败时回滚
+        note_execution(get_backend().execute(sql, params))
+        bump_data_version()
         print(f"SQL执行成功: {sql[:50]}...")
         return True
     except Exception as e:
         print(f"执行SQL失败: {str(e)}")
-        try:
-            conn.rollback()
-        except:
-            pass
         return False
 
 
@@ -651,10 +730,9 @@ def execute_sql(sql, params=None):
 def initialize_database():
     """初始化数据库并插入真实数据"""
     # 首先创建数据库文件（如果不存在）
-    db_path = "concert_management.db"
-    if not os.path.exists(db_path):
-        # 创建一个空文件
-        open(db_path, 'w').close()
+    if not database_exists(DB_PATH):
+        # 连接时自动创建数据库文件
+        connect(DB_PATH).close()
 
     # 创建数据库连接
     conn = get_db_connection()
@@ -904,7 +982,171 @@ def insert_real_data():
         conn.rollback()
 
 
+# ==================== 图表渲染 ====================
+@timed_phase('render')
+def plotly_chart(fig, **kwargs):
+    """渲染Plotly图表（耗时计入render阶段）"""
+    return st.plotly_chart(fig, **kwargs)
+
+
+@timed_phase('render')
+def plotly_chart_json(spec, use_container_width=True):
+    """渲染已序列化的Plotly JSON（耗时计入render阶段）"""
+    return render_figure_json(spec, use_container_width=use_container_width)
+
+
+def cached_figure(name, builder, filters=None):
+    """从图表缓存读取Plotly JSON，未命中时构建（耗时计入figure阶段）"""
+    with page_phase('figure'):
+        return get_figure_json(name, builder, filters)
+
+
+# ==================== 热度序列 ====================
+POPULARITY_GRANULARITIES = {'day': '按日', **GRANULARITIES}
+
+
+@timed_phase('fetch')
+def get_popularity_series(singer_id, granularity='day', include_archive=False):
+    """获取歌手按日期排序的热度序列：按日读取原始记录，其他粒度读取预汇总数据"""
+    if not uses_local_sqlite():
+        # 没有归档库与汇总表：读取热表，其他粒度在pandas中汇总
+        series = get_singer_popularity(get_data('popularity'), singer_id)
+        if granularity != 'day':
+            series = rollup_frame(series, granularity)
+    elif granularity == 'day' and include_archive:
+        # 热表与归档库的联合数据
+        series = read_popularity(singer_id)
+    elif granularity == 'day':
+        series = get_singer_popularity(get_data('popularity'), singer_id)
+    else:
+        series = get_rollup(singer_id, granularity)
+    series['record_date'] = pd.to_datetime(series['record_date'])
+    return series.sort_values('record_date')
+
+
+@timed_phase('fetch')
+def get_popularity_window(singer_id, start, end):
+    """只读取歌手在 [start, end] 时间窗口内的按日热度记录（热表与归档库的联合）"""
+    series = read_popularity(singer_id, start, end)
+    series['record_date'] = pd.to_datetime(series['record_date'])
+    return series.sort_values('record_date')
+
+
+def get_singer_popularity(popularity_df, singer_id):
+    """从热表数据中取出某位歌手的记录；热表中没有时（已全部归档）读取热表与归档库的联合数据"""
+    series = popularity_df[popularity_df['singer_id'] == singer_id].copy()
+    if series.empty and uses_local_sqlite():
+        series = read_popularity(singer_id)
+    return series
+
+
+def has_popularity_data(popularity_df):
+    """热表或归档库中是否有热度记录"""
+    if not popularity_df.empty:
+        return True
+    if not uses_local_sqlite():
+        return False
+    try:
+        return any(stat['rows'] for stat in archive_stats())
+    except Exception as e:
+        print(f"读取归档统计失败: {str(e)}")
+        return False
+
+
+# ==================== 后台预取 ====================
+def warm_tables():
+    """预热四张业务表的Arrow缓存（只用于SQLite后端）"""
+    if not uses_local_sqlite():
+        return
+    for table_name in CACHED_TABLES:
+        get_table(table_name)
+
+
+def warm_visualization():
+    """预热数据可视化页面的全部图表（与页面读取相同的数据来源）"""
+    # 先取来源标记再读数据：读取期间快照刷新时，缓存键偏旧，下次访问会重新构建
+    filters = {'source': analytics_source()}
+    singers_df = get_analytics_data('singers')
+    concerts_df = get_analytics_data('concerts')
+    if singers_df.empty or concerts_df.empty:
+        return
+
+    prepared = {}
+    for name, builder in VISUALIZATION_FIGURES.items():
+        def build(builder=builder):
+            if 'data' not in prepared:
+                prepared['data'] = prepare_visualization_data(singers_df, concerts_df)
+            return builder(prepared['data'])
+        cached_figure(name, build, filters)
+
+
+def warm_popularity():
+    """预热热度分析页面默认选中歌手的趋势图（默认粒度、时间范围与降采样参数）"""
+    # 与歌手选择器的默认选项一致
+    matches = find_singers()
+    if not matches:
+        return
+    singer_id = matches[0][0]
+    trend_df = get_popularity_series(singer_id)
+    if trend_df.empty:
+        return
+
+    window = (trend_df['record_date'].min().date(), trend_df['record_date'].max().date())
+    popularity_trend_spec(singer_id, filter_window(trend_df, 'record_date', *window), window)
+
+
+def start_prefetch(page):
+    """会话开始时预热数据表；每次切换页面后预热最可能访问的下一页"""
+    previous_page = st.session_state.get('prefetch_page')
+    if previous_page == page:
+        return
+
+    if previous_page is None:
+        prefetch('tables', warm_tables)
+    record_navigation(previous_page, page)
+    st.session_state['prefetch_page'] = page
+    prefetch_pages(predict_next_pages(page))
+
+
+register_warmer("📈 数据可视化", warm_visualization)
+register_warmer("📊 热度分析", warm_popularity)
+set_default_next_pages(["📈 数据可视化", "📊 热度分析"])
+
+
+# ==================== 歌手选择器 ====================
+def singer_picker(label, key, help=None):
+    """歌手选择器：按输入的姓名前缀查询匹配的歌手，选项携带singer_id，返回 (singer_id, name)
+
+    没有匹配的歌手时返回 (None, None)。同名歌手在选项中附带ID加以区分。
+    """
+    prefix = st.text_input(
+        f"🔍 {label}",
+        placeholder="输入姓名开头的几个字筛选",
+        key=f"{key}_prefix",
+        help=help or f"每次最多显示 {SINGER_PICKER_LIMIT} 位匹配的歌手"
+    )
+    try:
+        matches = find_singers(prefix)
+    except Exception as e:
+        print(f"查找歌手失败: {str(e)}")
+        matches = []
+    if not matches:
+        return None, None
+
+    names = dict(matches)
+    duplicated = {name for name in names.values() if list(names.values()).count(name) > 1}
+    singer_id = st.selectbox(
+        label,
+        list(names),
+        format_func=lambda i: f"{names[i]}（ID {i}）" if names[i] in duplicated else names[i],
+        key=key,
+        label_visibility="collapsed"
+    )
+    return singer_id, names.get(singer_id)
+
+
 # ==================== 页面函数定义 ====================
+@profiled_page
 def show_system_overview():
     """系统概览页面"""
     st.header("🏠 系统概览")
@@ -918,19 +1160,18 @@ def show_system_overview():
     total_revenue = 0
     city_count = 0
 
-    try:
-        singers_df = get_data('singers')
-        concerts_df = get_data('concerts')
-        cities_df = get_data('cities')
+    yearly_totals = pd.DataFrame()
 
-        if not singers_df.empty:
-            singers_count = len(singers_df)
-        if not concerts_df.empty:
-            concerts_count = len(concerts_df)
-            if 'revenue' in concerts_df.columns:
-                total_revenue = concerts_df['revenue'].sum()
-        if not cities_df.empty:
-            city_count = len(cities_df)
+    try:
+        # 合计由触发器增量维护，只需读取一行
+        with page_phase('fetch'):
+            totals = read_totals()
+            yearly_totals = read_yearly_totals()
+
+        singers_count = totals['singer_count']
+        concerts_count = totals['concert_count']
+        total_revenue = totals['total_revenue']
+        city_count = totals['city_count']
     except Exception as e:
         print(f"获取统计数据失败: {e}")
 
@@ -943,6 +1184,21 @@ def show_system_overview():
     with col4:
         st.metric("💰 总收入", f"¥{total_revenue:,.0f}")
 
+    if not yearly_totals.empty:
+        with st.expander("📅 年度统计"):
+            st.dataframe(
+                yearly_totals,
+                column_config={
+                    "year": "年度",
+                    "concert_count": "演唱会场次",
+                    "total_revenue": st.column_config.NumberColumn("总收入", format="¥%.0f"),
+                    "total_attendance": "出席人数",
+                    "total_capacity": "总容量"
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+
     st.markdown("---")
 
     # 功能简介
@@ -983,6 +1239,7 @@ def show_system_overview():
     """)
 
 
+@profiled_page
 def show_singer_management():
     """歌手管理页面"""
     st.header("🎤 歌手管理")
@@ -1003,7 +1260,8 @@ def show_singer_management():
         # 搜索和筛选
         col1, col2 = st.columns(2)
         with col1:
-            search_name = st.text_input("搜索歌手姓名", key="search_list")
+            search_name = st.text_input("搜索歌手姓名或流派", key="search_list",
+                                        help=f"支持姓名、流派的任意片段。{SEARCH_HELP}")
         with col2:
             if 'genre' in singers_df.columns:
                 genre_filter = st.multiselect(
@@ -1017,7 +1275,7 @@ def show_singer_management():
         # 应用筛选
         filtered_df = singers_df.copy()
         if search_name:
-            filtered_df = filtered_df[filtered_df['name'].str.contains(search_name, case=False, na=False)]
+            filtered_df = filter_by_search(filtered_df, search_name, 'singer', 'singer_id', 'name')
         if genre_filter:
             filtered_df = filtered_df[filtered_df['genre'].isin(genre_filter)]
 
@@ -1031,7 +1289,8 @@ def show_singer_management():
                 "nationality": "国籍",
                 "debut_year": "出道年份",
                 "genre": "音乐流派",
-                "active_status": "活跃状态"
+                "active_status": "活跃状态",
+                "row_version": None
             },
             hide_index=True,
             use_container_width=True
@@ -1101,40 +1360,35 @@ def show_singer_management():
         st.subheader("编辑歌手信息")
 
         if not singers_df.empty:
-            # 搜索过滤
+            # 选择要编辑的歌手（按姓名前缀检索）
             col_search, col_info = st.columns([3, 1])
 
             with col_search:
-                search_edit = st.text_input(
-                    "🔍 搜索歌手",
-                    placeholder="输入歌手姓名搜索",
-                    key="search_edit"
-                )
+                selected_id, singer_to_edit = singer_picker("选择要编辑的歌手", key="edit_singer_select")
 
             with col_info:
                 st.metric("总歌手数", len(singers_df))
 
-            # 过滤歌手列表
-            filtered_singers = singers_df.copy()
-            if search_edit:
-                filtered_singers = singers_df[
-                    singers_df['name'].str.contains(search_edit, case=False, na=False)
-                ]
-                st.caption(f"找到 {len(filtered_singers)} 位符合条件的歌手")
-
-            if filtered_singers.empty:
+            if selected_id is None:
                 st.warning("没有找到符合条件的歌手")
             else:
-                # 选择要编辑的歌手
-                singer_to_edit = st.selectbox(
-                    "选择要编辑的歌手",
-                    filtered_singers['name'].tolist(),
-                    key="edit_singer_select"
-                )
+                # 按主键读取选中的歌手，同名歌手不会混淆
+                singer_info = load_singer(selected_id)
 
-                if singer_to_edit:
-                    # 获取选中的歌手信息
-                    singer_info = singers_df[singers_df['name'] == singer_to_edit].iloc[0]
+                if singer_info is None:
+                    st.warning("该歌手已被删除")
+                else:
+                    singer_id = singer_info['singer_id']
+
+                    # 开始编辑时的版本号，保存时用于检测他人的修改；
+                    # 表单控件尚未创建（还没有开始编辑）时以当前版本为准
+                    version_key = f"edit_version_{singer_id}"
+                    base_version = st.session_state.get(version_key)
+                    if base_version is None or f"edit_name_{singer_id}_{base_version}" not in st.session_state:
+                        base_version = singer_info['row_version']
+                        st.session_state[version_key] = base_version
+                    # 表单控件的key包含版本号，载入新版本后显示最新数据
+                    form_key = f"{singer_id}_{base_version}"
 
                     # 使用容器分隔显示
                     st.divider()
@@ -1152,7 +1406,7 @@ def show_singer_management():
                                     "歌手姓名*",
                                     value=singer_info.get('name', ''),
                                     placeholder="请输入歌手全名",
-                                    key="edit_name"
+                                    key=f"edit_name_{form_key}"
                                 )
 
                                 # 处理出生日期
@@ -1162,25 +1416,25 @@ def show_singer_management():
                                         edit_birth_date = st.date_input(
                                             "出生日期",
                                             value=pd.to_datetime(birth_date_value),
-                                            key="edit_birth"
+                                            key=f"edit_birth_{form_key}"
                                         )
                                     except:
                                         edit_birth_date = st.date_input(
                                             "出生日期",
                                             value=datetime(1990, 1, 1),
-                                            key="edit_birth_alt"
+                                            key=f"edit_birth_alt_{form_key}"
                                         )
                                 else:
                                     edit_birth_date = st.date_input(
                                         "出生日期",
                                         value=datetime(1990, 1, 1),
-                                        key="edit_birth_default"
+                                        key=f"edit_birth_default_{form_key}"
                                     )
 
                                 edit_nationality = st.text_input(
                                     "国籍",
                                     value=singer_info.get('nationality', '中国'),
-                                    key="edit_nationality"
+                                    key=f"edit_nationality_{form_key}"
                                 )
 
                             with col2:
@@ -1189,26 +1443,23 @@ def show_singer_management():
                                     min_value=1900,
                                     max_value=2100,
                                     value=int(singer_info.get('debut_year', 2020)),
-                                    key="edit_debut"
+                                    key=f"edit_debut_{form_key}"
                                 )
 
                                 edit_genre = st.text_input(
                                     "音乐流派",
                                     value=singer_info.get('genre', ''),
                                     placeholder="例如：流行、摇滚、R&B",
-                                    key="edit_genre"
+                                    key=f"edit_genre_{form_key}"
                                 )
 
                                 edit_active_status = st.selectbox(
                                     "活跃状态",
                                     ["活跃", "不活跃"],
                                     index=0 if singer_info.get('active_status') == '活跃' else 1,
-                                    key="edit_status"
+                                    key=f"edit_status_{form_key}"
                                 )
 
-                            # 隐藏字段：存储歌手ID
-                            singer_id = singer_info.get('singer_id')
-
                             col_btn1, col_btn2 = st.columns(2)
                             with col_btn1:
                                 submitted = st.form_submit_button("💾 保存修改", type="primary",
@@ -1220,45 +1471,40 @@ def show_singer_management():
                                 if not edit_name:
                                     st.error("歌手姓名不能为空！")
                                 else:
-                                    # 构建更新SQL
-                                    sql = """
-                                        UPDATE singers 
-                                        SET name = ?, 
-                                            birth_date = ?, 
-                                            nationality = ?, 
-                                            debut_year = ?, 
-                                            genre = ?, 
-                                            active_status = ?
-                                        WHERE singer_id = ?
-                                    """
-
-                                    params = (
-                                        edit_name,
-                                        edit_birth_date.strftime('%Y-%m-%d'),
-                                        edit_nationality,
-                                        edit_debut_year,
-                                        edit_genre,
-                                        edit_active_status,
-                                        singer_id
-                                    )
-
-                                    # 执行更新
-                                    success = execute_sql(sql, params)
-
-                                    if success:
+                                    values = {
+                                        'name': edit_name,
+                                        'birth_date': edit_birth_date.strftime('%Y-%m-%d'),
+                                        'nationality': edit_nationality,
+                                        'debut_year': edit_debut_year,
+                                        'genre': edit_genre,
+                                        'active_status': edit_active_status
+                                    }
+
+                                    # 按版本号更新，期间被他人修改过时不覆盖
+                                    try:
+                                        st.session_state[version_key] = save_singer(singer_id, base_version, values)
                                         st.success(f"歌手 {edit_name} 信息更新成功！")
-                                        # 清除缓存，重新加载数据
-                                        st.cache_data.clear()
                                         # 添加延迟，确保用户看到成功消息
                                         import time
                                         time.sleep(1.5)
                                         st.rerun()
-                                    else:
+                                    except RecordConflict as e:
+                                        st.error(f"保存失败：{str(e)}，请载入最新数据后重新修改")
+                                        st.session_state[f"edit_conflict_{singer_id}"] = True
+                                    except Exception as e:
+                                        print(f"更新歌手失败: {str(e)}")
                                         st.error("更新失败，请检查数据库连接")
 
                             if cancel_clicked:
                                 st.info("编辑已取消")
 
+                        # 发生冲突后载入最新版本重新编辑
+                        if st.session_state.get(f"edit_conflict_{singer_id}"):
+                            if st.button("🔄 载入最新数据", key=f"edit_reload_{singer_id}"):
+                                st.session_state[version_key] = singer_info['row_version']
+                                st.session_state.pop(f"edit_conflict_{singer_id}", None)
+                                st.rerun()
+
                     with col_right:
                         st.markdown("### 📋 当前信息")
 
@@ -1272,7 +1518,8 @@ def show_singer_management():
                                 <strong>流派:</strong> {singer_info.get('genre')}<br>
                                 <strong>状态:</strong> {singer_info.get('active_status')}<br>
                                 <strong>出道年份:</strong> {singer_info.get('debut_year')}<br>
-                                <strong>出生日期:</strong> {singer_info.get('birth_date')}
+                                <strong>出生日期:</strong> {singer_info.get('birth_date')}<br>
+                                <strong>版本:</strong> {singer_info.get('row_version')}
                             </div>
                             """, unsafe_allow_html=True)
 
@@ -1282,7 +1529,7 @@ def show_singer_management():
                         st.markdown("### ⚠️ 危险操作")
 
                         with st.expander("删除该歌手", icon="🗑️"):
-                            st.warning("删除操作不可恢复，请谨慎操作！")
+                            st.warning("删除操作不可恢复，该歌手的演唱会与热度记录将一并删除，请谨慎操作！")
 
                             # 确认删除机制
                             delete_confirmed = st.checkbox("我确认要删除此歌手", key=f"delete_confirm_{singer_id}")
@@ -1312,21 +1559,67 @@ def show_singer_management():
                                     )
 
                                 if delete_clicked and confirm_text == singer_to_edit:
-                                    delete_sql = "DELETE FROM singers WHERE singer_id = ?"
-                                    if execute_sql(delete_sql, (singer_id,)):
-                                        st.success("歌手已成功删除")
-                                        # 清除缓存，重新加载数据
-                                        st.cache_data.clear()
+                                    # 级联删除该歌手的演唱会与热度记录，在一个事务内完成
+                                    try:
+                                        summary = remove_singer(singer_id)
+                                        st.success(f"歌手已成功删除（{summary}）")
                                         import time
                                         time.sleep(1.5)
                                         st.rerun()
-                                    else:
+                                    except Exception as e:
+                                        print(f"删除歌手失败: {str(e)}")
                                         st.error("删除失败，请检查数据库连接")
 
                                 if cancel_delete:
                                     st.info("删除操作已取消")
 
 
+def merge_concert_data(concerts_df, singers_df):
+    """合并演唱会与歌手数据，供演唱会列表筛选与展示"""
+    # 合并数据前确保数据类型正确
+    concerts_df = concerts_df.copy()
+    singers_df = singers_df.copy()
+
+    # 确保数值列是数值类型
+    numeric_cols_concerts = ['singer_id', 'capacity', 'attendance', 'ticket_price', 'revenue', 'attendance_rate']
+    for col in numeric_cols_concerts:
+        if col in concerts_df.columns:
+            concerts_df[col] = pd.to_numeric(concerts_df[col], errors='coerce')
+
+    if 'singer_id' in singers_df.columns:
+        singers_df['singer_id'] = pd.to_numeric(singers_df['singer_id'], errors='coerce')
+
+    merged_data = pd.merge(concerts_df, singers_df,
+                           left_on='singer_id', right_on='singer_id',
+                           how='left')
+
+    # 确保合并后的字符串列是字符串类型
+    string_cols = ['concert_name', 'city', 'venue', 'name']
+    for col in string_cols:
+        if col in merged_data.columns:
+            merged_data[col] = merged_data[col].astype(str)
+
+    if 'concert_date' in merged_data.columns:
+        merged_data['concert_date'] = pd.to_datetime(merged_data['concert_date'])
+
+    return merged_data
+
+
+def filter_concerts(merged_data, search_term=None, singer="全部", city="全部", year="全部"):
+    """按搜索词、歌手、城市与年份筛选合并后的演唱会数据"""
+    filtered_data = merged_data.copy()
+    if search_term:
+        filtered_data = filter_by_search(filtered_data, search_term, 'concert', 'concert_id', 'concert_name')
+    if singer != "全部":
+        filtered_data = filtered_data[filtered_data['name'] == singer]
+    if city != "全部":
+        filtered_data = filtered_data[filtered_data['city'] == city]
+    if year != "全部" and 'concert_date' in filtered_data.columns:
+        filtered_data = filtered_data[filtered_data['concert_date'].dt.year == int(year)]
+    return filtered_data
+
+
+@profiled_page
 def show_concert_management():
     """演唱会管理页面"""
     st.header("🎫 演唱会管理")
@@ -1344,30 +1637,11 @@ def show_concert_management():
     with tab1:
         st.subheader("所有演唱会")
 
-        # 合并数据前确保数据类型正确
-        concerts_df = concerts_df.copy()
-        singers_df = singers_df.copy()
-
-        # 确保数值列是数值类型
-        numeric_cols_concerts = ['singer_id', 'capacity', 'attendance', 'ticket_price', 'revenue', 'attendance_rate']
-        for col in numeric_cols_concerts:
-            if col in concerts_df.columns:
-                concerts_df[col] = pd.to_numeric(concerts_df[col], errors='coerce')
-
-        if 'singer_id' in singers_df.columns:
-            singers_df['singer_id'] = pd.to_numeric(singers_df['singer_id'], errors='coerce')
-
-        merged_data = pd.merge(concerts_df, singers_df,
-                               left_on='singer_id', right_on='singer_id',
-                               how='left')
-
-        # 确保合并后的字符串列是字符串类型
-        string_cols = ['concert_name', 'city', 'venue', 'name']
-        for col in string_cols:
-            if col in merged_data.columns:
-                merged_data[col] = merged_data[col].astype(str)
+        with page_phase('transform'):
+            merged_data = merge_concert_data(concerts_df, singers_df)
 
         # 筛选选项
+        search_concert = st.text_input("🔍 搜索演唱会名称、场馆或城市", key="search_concert", help=SEARCH_HELP)
         col1, col2, col3 = st.columns(3)
         with col1:
             singer_options = ["全部"] + list(merged_data['name'].unique())
@@ -1377,20 +1651,13 @@ def show_concert_management():
             city_filter = st.selectbox("选择城市", options=city_options)
         with col3:
             if 'concert_date' in merged_data.columns:
-                merged_data['concert_date'] = pd.to_datetime(merged_data['concert_date'])
                 year_options = ["全部"] + sorted(list(merged_data['concert_date'].dt.year.unique()), reverse=True)
                 year_filter = st.selectbox("选择年份", options=year_options)
             else:
                 year_filter = "全部"
 
         # 应用筛选
-        filtered_data = merged_data.copy()
-        if singer_filter != "全部":
-            filtered_data = filtered_data[filtered_data['name'] == singer_filter]
-        if city_filter != "全部":
-            filtered_data = filtered_data[filtered_data['city'] == city_filter]
-        if year_filter != "全部" and 'concert_date' in filtered_data.columns:
-            filtered_data = filtered_data[filtered_data['concert_date'].dt.year == int(year_filter)]
+        filtered_data = filter_concerts(merged_data, search_concert, singer_filter, city_filter, year_filter)
 
         # 显示数据
         if not filtered_data.empty:
@@ -1454,14 +1721,15 @@ def show_concert_management():
     with tab2:
         st.subheader("添加新演唱会")
         if not singers_df.empty:
+            # 歌手选择器需要随输入实时刷新，放在表单外
+            singer_id, singer_name = singer_picker("选择歌手", key="add_concert_singer")
+            if singer_id is None:
+                st.warning("没有找到符合条件的歌手")
+
             with st.form("add_concert_form"):
                 col1, col2 = st.columns(2)
 
                 with col1:
-                    singer_name = st.selectbox(
-                        "选择歌手",
-                        options=singers_df['name'].tolist()
-                    )
                     concert_name = st.text_input("演唱会名称*", placeholder="例如：2024世界巡回演唱会")
                     concert_date = st.date_input("演唱会日期", value=datetime.now())
                     city = st.text_input("城市*", placeholder="例如：北京")
@@ -1475,12 +1743,11 @@ def show_concert_management():
                 submitted = st.form_submit_button("🎫 添加演唱会", type="primary")
 
                 if submitted:
-                    if not concert_name or not city:
+                    if singer_id is None:
+                        st.error("请先选择歌手！")
+                    elif not concert_name or not city:
                         st.error("演唱会名称和城市不能为空！")
                     else:
-                        # 获取歌手ID
-                        singer_id = singers_df[singers_df['name'] == singer_name]['singer_id'].iloc[0]
-
                         # 计算收入
                         revenue = attendance * ticket_price
                         attendance_rate = attendance / capacity if capacity > 0 else 0
@@ -1585,6 +1852,54 @@ def show_concert_management():
                 )
 
 
+# ==================== 热度分析图表 ====================
+def build_popularity_trend_figure(singer_popularity, max_points=DEFAULT_MAX_POINTS, method='lttb'):
+    """歌手热度趋势 2×2 子图（粉丝量、话题度、传唱度、综合热度），每条曲线降采样到max_points"""
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=("粉丝量变化", "话题度变化", "传唱度变化", "综合热度"),
+        vertical_spacing=0.15
+    )
+    dates = singer_popularity['record_date']
+
+    # 粉丝量
+    if 'fan_count' in singer_popularity.columns:
+        fig.add_trace(scatter_trace(dates, singer_popularity['fan_count'], '粉丝量', max_points, method),
+                      row=1, col=1)
+
+    # 话题度
+    if 'topic_score' in singer_popularity.columns:
+        fig.add_trace(scatter_trace(dates, singer_popularity['topic_score'], '话题度', max_points, method),
+                      row=1, col=2)
+
+    # 传唱度
+    if 'popularity_score' in singer_popularity.columns:
+        fig.add_trace(scatter_trace(dates, singer_popularity['popularity_score'], '传唱度', max_points, method),
+                      row=2, col=1)
+
+    # 综合热度
+    if 'topic_score' in singer_popularity.columns and 'popularity_score' in singer_popularity.columns:
+        composite_score = (singer_popularity['topic_score'] + singer_popularity['popularity_score']) / 2
+        fig.add_trace(scatter_trace(dates, composite_score, '综合热度', max_points, method),
+                      row=2, col=2)
+
+    fig.update_layout(height=600, showlegend=False)
+    return fig
+
+
+def popularity_trend_spec(singer_id, visible, window, granularity='day', include_archive=False,
+                          max_points=DEFAULT_MAX_POINTS, method=DOWNSAMPLE_METHODS[0]):
+    """热度趋势图的Plotly JSON（按歌手、粒度、时间窗口与降采样参数缓存）"""
+    return cached_figure(
+        'popularity.trend',
+        lambda: build_popularity_trend_figure(visible, max_points, method),
+        {'singer_id': int(singer_id), 'granularity': granularity, 'archive': include_archive,
+         'start': window[0].isoformat(), 'end': window[1].isoformat(),
+         'max_points': max_points, 'method': method}
+    )
+
+
+@profiled_page
 def show_popularity_analysis():
     """热度分析页面"""
     st.header("📊 热度分析")
@@ -1597,22 +1912,16 @@ def show_popularity_analysis():
         st.warning("暂无歌手数据，请先初始化数据库")
         return
 
-    if popularity_df.empty:
+    if not has_popularity_data(popularity_df):
         st.warning("暂无热度数据，请先初始化数据库")
         return
 
     # 选择歌手
-    selected_singer = st.selectbox(
-        "选择歌手",
-        singers_df['name'].unique()
-    )
+    singer_id, selected_singer = singer_picker("选择歌手", key="popularity_singer")
 
     if selected_singer:
-        # 获取歌手ID
-        singer_id = singers_df[singers_df['name'] == selected_singer]['singer_id'].iloc[0]
-
         # 获取该歌手的热度数据
-        singer_popularity = popularity_df[popularity_df['singer_id'] == singer_id].copy()
+        singer_popularity = get_singer_popularity(popularity_df, singer_id)
 
         if not singer_popularity.empty:
             # 转换为日期格式
@@ -1647,64 +1956,78 @@ def show_popularity_analysis():
             # 热度趋势图
             st.subheader("热度趋势")
 
-            fig = make_subplots(
-                rows=2, cols=2,
-                subplot_titles=("粉丝量变化", "话题度变化", "传唱度变化", "综合热度"),
-                vertical_spacing=0.15
-            )
-
-            # 粉丝量
-            if 'fan_count' in singer_popularity.columns:
-                fig.add_trace(
-                    go.Scatter(x=singer_popularity['record_date'], y=singer_popularity['fan_count'],
-                               mode='lines+markers', name='粉丝量'),
-                    row=1, col=1
-                )
-
-            # 话题度
-            if 'topic_score' in singer_popularity.columns:
-                fig.add_trace(
-                    go.Scatter(x=singer_popularity['record_date'], y=singer_popularity['topic_score'],
-                               mode='lines+markers', name='话题度'),
-                    row=1, col=2
-                )
+            # 时间粒度：按日为原始记录，按周/月/季度读取预汇总数据
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                granularity = st.radio("时间粒度", list(POPULARITY_GRANULARITIES), horizontal=True,
+                                       format_func=POPULARITY_GRANULARITIES.get, key="popularity_granularity")
+            with col2:
+                # 汇总数据始终包含归档历史，按日查看时可选择联合归档库
+                include_archive = st.checkbox("包含归档历史", key="popularity_include_archive",
+                                              disabled=granularity != 'day')
+            # 联合归档库的按日数据可能很大：先读取日期范围，选定时间窗口后只读取窗口内的记录
+            read_window = granularity == 'day' and include_archive and uses_local_sqlite()
+            if read_window:
+                trend_df = None
+                first_date, last_date = (pd.Timestamp(value).date() for value in popularity_date_range(singer_id))
+            else:
+                if granularity == 'day' and not include_archive:
+                    trend_df = singer_popularity
+                else:
+                    trend_df = get_popularity_series(singer_id, granularity, include_archive)
+                first_date = trend_df['record_date'].min().date()
+                last_date = trend_df['record_date'].max().date()
 
-            # 传唱度
-            if 'popularity_score' in singer_popularity.columns:
-                fig.add_trace(
-                    go.Scatter(x=singer_popularity['record_date'], y=singer_popularity['popularity_score'],
-                               mode='lines+markers', name='传唱度'),
-                    row=2, col=1
-                )
+            # 显示范围与点数：缩小时间窗口后，窗口内的数据按完整精度绘制
+            col1, col2, col3 = st.columns([3, 1, 1])
+            with col1:
+                if first_date < last_date:
+                    window = st.slider("显示时间范围", min_value=first_date, max_value=last_date,
+                                       value=(first_date, last_date),
+                                       key=f"popularity_window_{granularity}_{include_archive}")
+                else:
+                    window = (first_date, last_date)
+            with col2:
+                max_points = st.selectbox("每条曲线最多点数", [200, 500, 1000, 2000, 5000, "全部"],
+                                          index=1, key="popularity_max_points")
+                max_points = None if max_points == "全部" else max_points
+            with col3:
+                method = st.selectbox("降采样方式", DOWNSAMPLE_METHODS, key="popularity_downsample",
+                                      help="lttb保持曲线形状，minmax保留每段的峰值")
 
-            # 综合热度
-            if 'topic_score' in singer_popularity.columns and 'popularity_score' in singer_popularity.columns:
-                singer_popularity['composite_score'] = (singer_popularity['topic_score'] + singer_popularity[
-                    'popularity_score']) / 2
-                fig.add_trace(
-                    go.Scatter(x=singer_popularity['record_date'], y=singer_popularity['composite_score'],
-                               mode='lines+markers', name='综合热度'),
-                    row=2, col=2
-                )
+            if read_window:
+                trend_df = visible = get_popularity_window(singer_id, *window)
+            else:
+                visible = filter_window(trend_df, 'record_date', *window)
+            if max_points is not None and len(visible) > max_points:
+                st.caption(f"时间窗口内共 {len(visible):,} 条记录，每条曲线降采样为 {max_points} 个点；"
+                           f"缩小时间范围可查看完整精度")
 
-            fig.update_layout(height=600, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            spec = popularity_trend_spec(singer_id, visible, window, granularity, include_archive, max_points, method)
+            plotly_chart_json(spec)
 
             # 显示详细数据表
             st.subheader("详细数据")
             display_cols = ['record_date']
 
-            for col in ['fan_count', 'topic_score', 'popularity_score', 'social_media_mentions']:
-                if col in singer_popularity.columns:
+            for col in ['record_count', 'fan_count', 'topic_score', 'topic_score_min', 'topic_score_max',
+                        'popularity_score', 'popularity_score_min', 'popularity_score_max',
+                        'social_media_mentions']:
+                if col in trend_df.columns:
                     display_cols.append(col)
 
             st.dataframe(
-                singer_popularity[display_cols],
+                trend_df[display_cols],
                 column_config={
-                    "record_date": "记录日期",
+                    "record_date": "记录日期" if granularity == 'day' else "周期开始",
+                    "record_count": "记录数",
                     "fan_count": "粉丝量",
                     "topic_score": "话题度",
+                    "topic_score_min": "话题度最低",
+                    "topic_score_max": "话题度最高",
                     "popularity_score": "传唱度",
+                    "popularity_score_min": "传唱度最低",
+                    "popularity_score_max": "传唱度最高",
                     "social_media_mentions": "社交媒体提及"
                 },
                 hide_index=True,
@@ -1714,6 +2037,7 @@ def show_popularity_analysis():
             st.warning("该歌手没有热度数据")
 
 
+@profiled_page
 def show_city_management():
     """城市管理页面"""
     st.header("🏙️ 城市管理")
@@ -1750,27 +2074,29 @@ def show_city_management():
 
         with col1:
             # 人口分布图
-            fig1 = px.bar(
-                cities_df.sort_values('population', ascending=False),
-                x='city_name',
-                y='population',
-                title="城市人口分布",
-                color='population',
-                color_continuous_scale='Viridis'
-            )
-            st.plotly_chart(fig1, use_container_width=True)
+            with page_phase('figure'):
+                fig1 = px.bar(
+                    cities_df.sort_values('population', ascending=False),
+                    x='city_name',
+                    y='population',
+                    title="城市人口分布",
+                    color='population',
+                    color_continuous_scale='Viridis'
+                )
+            plotly_chart(fig1, use_container_width=True)
 
         with col2:
             # 演唱会频率图
-            fig2 = px.bar(
-                cities_df.sort_values('concert_frequency', ascending=False),
-                x='city_name',
-                y='concert_frequency',
-                title="每月平均演唱会次数",
-                color='concert_frequency',
-                color_continuous_scale='Plasma'
-            )
-            st.plotly_chart(fig2, use_container_width=True)
+            with page_phase('figure'):
+                fig2 = px.bar(
+                    cities_df.sort_values('concert_frequency', ascending=False),
+                    x='city_name',
+                    y='concert_frequency',
+                    title="每月平均演唱会次数",
+                    color='concert_frequency',
+                    color_continuous_scale='Plasma'
+                )
+            plotly_chart(fig2, use_container_width=True)
 
     with tab2:
         st.subheader("添加新城市")
@@ -1818,18 +2144,65 @@ def show_city_management():
                         st.error("添加失败，请检查数据库连接")
 
 
+def forecast_fan_counts(fan_counts, dates, future_months):
+    """按历史平均增长率外推未来各月粉丝量，返回 (预测日期, 预测粉丝量)；无法计算增长率时返回None"""
+    # 计算历史增长率
+    growth_rates = []
+    for i in range(1, len(fan_counts)):
+        if fan_counts[i - 1] > 0:
+            growth_rate = (fan_counts[i] - fan_counts[i - 1]) / fan_counts[i - 1]
+            growth_rates.append(growth_rate)
+
+    if not growth_rates:
+        return None
+
+    avg_growth_rate = np.mean(growth_rates)
+    # 限制增长率范围在合理区间
+    avg_growth_rate = max(min(avg_growth_rate, 0.2), -0.1)
+
+    last_date = dates[-1]
+    last_fan_count = fan_counts[-1]
+
+    future_dates = []
+    future_fan_counts = []
+    for i in range(1, future_months + 1):
+        next_date = last_date + pd.DateOffset(months=i)
+        # 添加随机波动，使预测更真实
+        random_factor = np.random.uniform(0.95, 1.05)
+        next_fan_count = int(last_fan_count * (1 + avg_growth_rate) ** i * random_factor)
+        future_dates.append(next_date)
+        future_fan_counts.append(next_fan_count)
+    return future_dates, future_fan_counts
+
+
+def forecast_scores(topic_scores, popularity_scores, future_months):
+    """以历史平均值加随机波动预测未来的话题度与传唱度，返回 (预测话题度, 预测传唱度)"""
+    topic_avg = np.mean(topic_scores)
+    popularity_avg = np.mean(popularity_scores)
+
+    future_topic_scores = []
+    future_popularity_scores = []
+    for i in range(future_months):
+        # 基于平均值，添加随机波动
+        topic_random = np.random.uniform(0.95, 1.05)
+        popularity_random = np.random.uniform(0.95, 1.05)
+        future_topic_scores.append(topic_avg * topic_random)
+        future_popularity_scores.append(popularity_avg * popularity_random)
+    return future_topic_scores, future_popularity_scores
+
+
 def show_default_prediction_chart(selected_singer, future_months):
     """显示默认预测图表（当数据不足时）"""
     # 从数据库获取真实数据
     singers_df = get_data('singers')
     popularity_df = get_data('popularity')
 
-    if singers_df.empty or popularity_df.empty:
+    if singers_df.empty or not has_popularity_data(popularity_df):
         st.warning("没有足够的数据进行预测")
         return
 
     singer_id = singers_df[singers_df['name'] == selected_singer]['singer_id'].iloc[0]
-    singer_popularity = popularity_df[popularity_df['singer_id'] == singer_id].copy()
+    singer_popularity = get_singer_popularity(popularity_df, singer_id)
 
     if len(singer_popularity) < 3:
         st.warning(f"{selected_singer} 的历史数据不足，至少需要3个月的数据才能进行预测")
@@ -1844,34 +2217,12 @@ def show_default_prediction_chart(selected_singer, future_months):
         fan_counts = singer_popularity['fan_count'].values
         dates = singer_popularity['record_date'].values
 
-        # 计算历史增长率
+        # 按历史增长率生成预测数据
         if len(fan_counts) >= 2:
-            growth_rates = []
-            for i in range(1, len(fan_counts)):
-                if fan_counts[i - 1] > 0:
-                    growth_rate = (fan_counts[i] - fan_counts[i - 1]) / fan_counts[i - 1]
-                    growth_rates.append(growth_rate)
-
-            if growth_rates:
-                avg_growth_rate = np.mean(growth_rates)
-                # 限制增长率范围在合理区间
-                avg_growth_rate = max(min(avg_growth_rate, 0.2), -0.1)
-
-                # 生成预测数据
-                last_date = dates[-1]
-                last_fan_count = fan_counts[-1]
-
-                # 预测数据点
-                future_dates = []
-                future_fan_counts = []
-
-                for i in range(1, future_months + 1):
-                    next_date = last_date + pd.DateOffset(months=i)
-                    # 添加随机波动，使预测更真实
-                    random_factor = np.random.uniform(0.95, 1.05)
-                    next_fan_count = int(last_fan_count * (1 + avg_growth_rate) ** i * random_factor)
-                    future_dates.append(next_date)
-                    future_fan_counts.append(next_fan_count)
+            forecast = forecast_fan_counts(fan_counts, dates, future_months)
+
+            if forecast is not None:
+                future_dates, future_fan_counts = forecast
 
                 # 创建图表
                 fig = go.Figure()
@@ -1899,7 +2250,7 @@ def show_default_prediction_chart(selected_singer, future_months):
                     height=400
                 )
 
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
 
                 # 预测增长率
                 predicted_growth = ((future_fan_counts[-1] - fan_counts[-1]) / fan_counts[-1]) * 100 if fan_counts[
@@ -1914,7 +2265,81 @@ def show_default_prediction_chart(selected_singer, future_months):
                     st.warning(f"📉 预测粉丝量增长{predicted_growth:.1f}%，建议加强粉丝互动和内容创作")
 
 
-def show_prediction_analysis():
+def score_cities(singer_genre, cities_df, singer_concerts):
+    """按人口、演出频率、场馆容量、歌手历史表现与流派为各城市打分，返回按得分降序排列的推荐列表"""
+    recommendations = []
+    all_cities = cities_df.copy()
+
+    for _, city_row in all_cities.iterrows():
+        city_name = city_row['city_name']
+        population = city_row['population']
+        avg_capacity = city_row['avg_concert_capacity']
+        frequency = city_row['concert_frequency']
+
+        # 基础得分
+        score = 50  # 基础分
+
+        # 1. 人口因素（人口越多，得分越高）
+        population_score = min(population / 50, 20)  # 每50万人口加1分，最高20分
+        score += population_score
+
+        # 2. 演唱会频率因素（频率适中最好）
+        if 5 <= frequency <= 15:
+            frequency_score = 10
+        elif frequency < 5:
+            frequency_score = frequency  # 频率太低不好
+        else:
+            frequency_score = 20 - frequency  # 频率太高竞争激烈
+
+        score += frequency_score
+
+        # 3. 场馆容量因素
+        capacity_score = min(avg_capacity / 2000, 10)  # 每2000容量加1分，最高10分
+        score += capacity_score
+
+        # 4. 历史表现因素（如果该歌手在该城市有过演出）
+        if not singer_concerts.empty:
+            city_performance = singer_concerts[singer_concerts['city'] == city_name]
+            if not city_performance.empty:
+                # 计算平均上座率
+                avg_attendance_rate = city_performance[
+                    'attendance_rate'].mean() if 'attendance_rate' in city_performance.columns else 0.8
+                performance_score = avg_attendance_rate * 20  # 最高20分
+                score += performance_score
+
+        # 5. 音乐流派匹配因素
+        genre_bonus = 0
+        if '流行' in singer_genre and city_name in ['北京', '上海', '广州', '深圳']:
+            genre_bonus = 10  # 流行音乐在一线城市更受欢迎
+        elif '摇滚' in singer_genre and city_name in ['成都', '武汉', '南京']:
+            genre_bonus = 8  # 摇滚音乐在新一线城市有市场
+        elif '民谣' in singer_genre and city_name in ['杭州', '西安', '重庆']:
+            genre_bonus = 7  # 民谣音乐在文化城市更受欢迎
+
+        score += genre_bonus
+
+        # 6. 竞争程度因素（演唱会频率太高可能竞争激烈）
+        competition_penalty = max(0, (frequency - 10) * 0.5)  # 频率超过10场每月，每场扣0.5分
+        score -= competition_penalty
+
+        # 确保分数在0-100之间
+        score = max(0, min(100, score))
+
+        recommendations.append({
+            'city': city_name,
+            'score': round(float(score), 1),
+            'population': population,
+            'concert_frequency': frequency,
+            'avg_capacity': avg_capacity
+        })
+
+    # 按得分排序
+    recommendations.sort(key=lambda x: x['score'], reverse=True)
+    return recommendations
+
+
+@profiled_page
+def show_prediction_analysis():
     """预测分析页面"""
     st.header("🔮 预测分析")
 
@@ -1923,27 +2348,20 @@ def show_prediction_analysis():
     with tab1:
         st.subheader("歌手未来热度走势预测")
 
-        # 获取数据
-        singers_df = get_data('singers')
-        popularity_df = get_data('popularity')
+        # 获取数据（开启分析快照时读取只读副本）
+        singers_df = get_analytics_data('singers')
+        popularity_df = get_analytics_data('popularity')
 
-        if singers_df.empty or popularity_df.empty:
+        if singers_df.empty or not has_popularity_data(popularity_df):
             st.warning("暂无数据用于预测，请先初始化数据库")
             return
 
         # 选择歌手
-        selected_singer = st.selectbox(
-            "选择要预测的歌手",
-            singers_df['name'].unique(),
-            key="predict_singer"
-        )
+        singer_id, selected_singer = singer_picker("选择要预测的歌手", key="predict_singer")
 
         if selected_singer:
-            # 获取歌手ID
-            singer_id = singers_df[singers_df['name'] == selected_singer]['singer_id'].iloc[0]
-
             # 获取该歌手的历史热度数据
-            singer_popularity = popularity_df[popularity_df['singer_id'] == singer_id].copy()
+            singer_popularity = get_singer_popularity(popularity_df, singer_id)
 
             if not singer_popularity.empty:
                 # 按日期排序
@@ -1955,6 +2373,12 @@ def show_prediction_analysis():
                 # 预测未来月数
                 future_months = st.slider("预测未来月数", 1, 12, 3)
 
+                # 增长率按所选粒度的相邻周期计算，默认使用月度汇总
+                granularity = st.selectbox("数据粒度", list(POPULARITY_GRANULARITIES), index=2,
+                                           format_func=POPULARITY_GRANULARITIES.get, key="predict_granularity")
+                if granularity != 'day':
+                    singer_popularity = get_popularity_series(singer_id, granularity)
+
                 # ================ 基于实际数据的预测 ================
 
                 # 1. 粉丝量预测（基于历史增长趋势）
@@ -1962,169 +2386,137 @@ def show_prediction_analysis():
                     fan_counts = singer_popularity['fan_count'].values
                     dates = singer_popularity['record_date'].values
 
-                    # 计算历史增长率
+                    # 按相邻周期的平均增长率生成预测数据
                     if len(fan_counts) >= 2:
-                        # 计算月度增长率
-                        growth_rates = []
-                        for i in range(1, len(fan_counts)):
-                            if fan_counts[i - 1] > 0:
-                                growth_rate = (fan_counts[i] - fan_counts[i - 1]) / fan_counts[i - 1]
-                                growth_rates.append(growth_rate)
-
-                        if growth_rates:
-                            avg_growth_rate = np.mean(growth_rates)
-                            # 限制增长率范围在合理区间
-                            avg_growth_rate = max(min(avg_growth_rate, 0.2), -0.1)
-
-                            # 生成预测数据
-                            last_date = dates[-1]
-                            last_fan_count = fan_counts[-1]
+                        forecast = forecast_fan_counts(fan_counts, dates, future_months)
+
+                        if forecast is not None:
+                            future_dates, future_fan_counts = forecast
 
                             # 历史数据点
                             historical_dates = dates
                             historical_fan_counts = fan_counts
 
-                            # 预测数据点
-                            future_dates = []
-                            future_fan_counts = []
-
-                            for i in range(1, future_months + 1):
-                                next_date = last_date + pd.DateOffset(months=i)
-                                # 添加随机波动，使预测更真实
-                                random_factor = np.random.uniform(0.95, 1.05)
-                                next_fan_count = int(last_fan_count * (1 + avg_growth_rate) ** i * random_factor)
-                                future_dates.append(next_date)
-                                future_fan_counts.append(next_fan_count)
-
                             # 2. 热度评分预测
                             if 'topic_score' in singer_popularity.columns and 'popularity_score' in singer_popularity.columns:
                                 topic_scores = singer_popularity['topic_score'].values
                                 popularity_scores = singer_popularity['popularity_score'].values
 
-                                topic_avg = np.mean(topic_scores)
-                                popularity_avg = np.mean(popularity_scores)
-
                                 # 预测未来热度
-                                future_topic_scores = []
-                                future_popularity_scores = []
-
-                                for i in range(future_months):
-                                    # 基于平均值，添加随机波动
-                                    topic_random = np.random.uniform(0.95, 1.05)
-                                    popularity_random = np.random.uniform(0.95, 1.05)
-                                    future_topic_scores.append(topic_avg * topic_random)
-                                    future_popularity_scores.append(popularity_avg * popularity_random)
+                                future_topic_scores, future_popularity_scores = forecast_scores(
+                                    topic_scores, popularity_scores, future_months)
 
                             # ================ 显示预测图表 ================
 
                             # 创建子图
-                            fig = make_subplots(
-                                rows=2, cols=2,
-                                subplot_titles=("粉丝量预测", "话题度预测", "传唱度预测", "综合热度预测"),
-                                vertical_spacing=0.15
-                            )
-
-                            # 粉丝量预测图
-                            fig.add_trace(
-                                go.Scatter(
-                                    x=historical_dates,
-                                    y=historical_fan_counts,
-                                    mode='lines+markers',
-                                    name='历史粉丝量',
-                                    line=dict(color='blue', width=2)
-                                ),
-                                row=1, col=1
-                            )
-
-                            fig.add_trace(
-                                go.Scatter(
-                                    x=future_dates,
-                                    y=future_fan_counts,
-                                    mode='lines+markers',
-                                    name='预测粉丝量',
-                                    line=dict(color='red', width=2, dash='dash')
-                                ),
-                                row=1, col=1
-                            )
-
-                            # 话题度预测图
-                            if 'future_topic_scores' in locals():
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=historical_dates,
-                                        y=topic_scores,
-                                        mode='lines+markers',
-                                        name='历史话题度',
-                                        line=dict(color='green', width=2)
-                                    ),
-                                    row=1, col=2
+                            with page_phase('figure'):
+                                fig = make_subplots(
+                                    rows=2, cols=2,
+                                    subplot_titles=("粉丝量预测", "话题度预测", "传唱度预测", "综合热度预测"),
+                                    vertical_spacing=0.15
                                 )
 
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=future_dates,
-                                        y=future_topic_scores,
-                                        mode='lines+markers',
-                                        name='预测话题度',
-                                        line=dict(color='orange', width=2, dash='dash')
-                                    ),
-                                    row=1, col=2
-                                )
-
-                            # 传唱度预测图
-                            if 'future_popularity_scores' in locals():
+                                # 粉丝量预测图
                                 fig.add_trace(
                                     go.Scatter(
                                         x=historical_dates,
-                                        y=popularity_scores,
+                                        y=historical_fan_counts,
                                         mode='lines+markers',
-                                        name='历史传唱度',
-                                        line=dict(color='purple', width=2)
+                                        name='历史粉丝量',
+                                        line=dict(color='blue', width=2)
                                     ),
-                                    row=2, col=1
+                                    row=1, col=1
                                 )
 
                                 fig.add_trace(
                                     go.Scatter(
                                         x=future_dates,
-                                        y=future_popularity_scores,
+                                        y=future_fan_counts,
                                         mode='lines+markers',
-                                        name='预测传唱度',
-                                        line=dict(color='brown', width=2, dash='dash')
+                                        name='预测粉丝量',
+                                        line=dict(color='red', width=2, dash='dash')
                                     ),
-                                    row=2, col=1
+                                    row=1, col=1
                                 )
 
-                            # 综合热度预测图
-                            if 'future_topic_scores' in locals() and 'future_popularity_scores' in locals():
-                                historical_composite = (topic_scores + popularity_scores) / 2
-                                future_composite = (np.array(future_topic_scores) + np.array(
-                                    future_popularity_scores)) / 2
+                                # 话题度预测图
+                                if 'future_topic_scores' in locals():
+                                    fig.add_trace(
+                                        go.Scatter(
+                                            x=historical_dates,
+                                            y=topic_scores,
+                                            mode='lines+markers',
+                                            name='历史话题度',
+                                            line=dict(color='green', width=2)
+                                        ),
+                                        row=1, col=2
+                                    )
 
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=historical_dates,
-                                        y=historical_composite,
-                                        mode='lines+markers',
-                                        name='历史综合热度',
-                                        line=dict(color='darkblue', width=2)
-                                    ),
-                                    row=2, col=2
-                                )
+                                    fig.add_trace(
+                                        go.Scatter(
+                                            x=future_dates,
+                                            y=future_topic_scores,
+                                            mode='lines+markers',
+                                            name='预测话题度',
+                                            line=dict(color='orange', width=2, dash='dash')
+                                        ),
+                                        row=1, col=2
+                                    )
 
-                                fig.add_trace(
-                                    go.Scatter(
-                                        x=future_dates,
-                                        y=future_composite,
-                                        mode='lines+markers',
-                                        name='预测综合热度',
-                                        line=dict(color='darkred', width=2, dash='dash')
-                                    ),
-                                    row=2, col=2
-                                )
+                                # 传唱度预测图
+                                if 'future_popularity_scores' in locals():
+                                    fig.add_trace(
+                                        go.Scatter(
+                                            x=historical_dates,
+                                            y=popularity_scores,
+                                            mode='lines+markers',
+                                            name='历史传唱度',
+                                            line=dict(color='purple', width=2)
+                                        ),
+                                        row=2, col=1
+                                    )
+
+                                    fig.add_trace(
+                                        go.Scatter(
+                                            x=future_dates,
+                                            y=future_popularity_scores,
+                                            mode='lines+markers',
+                                            name='预测传唱度',
+                                            line=dict(color='brown', width=2, dash='dash')
+                                        ),
+                                        row=2, col=1
+                                    )
+
+                                # 综合热度预测图
+                                if 'future_topic_scores' in locals() and 'future_popularity_scores' in locals():
+                                    historical_composite = (topic_scores + popularity_scores) / 2
+                                    future_composite = (np.array(future_topic_scores) + np.array(
+                                        future_popularity_scores)) / 2
+
+                                    fig.add_trace(
+                                        go.Scatter(
+                                            x=historical_dates,
+                                            y=historical_composite,
+                                            mode='lines+markers',
+                                            name='历史综合热度',
+                                            line=dict(color='darkblue', width=2)
+                                        ),
+                                        row=2, col=2
+                                    )
+
+                                    fig.add_trace(
+                                        go.Scatter(
+                                            x=future_dates,
+                                            y=future_composite,
+                                            mode='lines+markers',
+                                            name='预测综合热度',
+                                            line=dict(color='darkred', width=2, dash='dash')
+                                        ),
+                                        row=2, col=2
+                                    )
 
-                            fig.update_layout(height=600, showlegend=True)
-                            st.plotly_chart(fig, use_container_width=True)
+                                fig.update_layout(height=600, showlegend=True)
+                            plotly_chart(fig, use_container_width=True)
 
                             # ================ 提供个性化建议 ================
                             st.subheader("📊 分析报告")
@@ -2160,7 +2552,7 @@ def show_prediction_analysis():
                             st.subheader("💡 投资建议")
 
                             # 获取歌手信息
-                            singer_info = singers_df[singers_df['name'] == selected_singer].iloc[0]
+                            singer_info = singers_df[singers_df['singer_id'] == singer_id].iloc[0]
                             genre = singer_info.get('genre', '未知')
                             active_status = singer_info.get('active_status', '未知')
 
@@ -2237,26 +2629,21 @@ def show_prediction_analysis():
     with tab2:
         st.subheader("适配开办城市推荐")
 
-        # 获取数据
-        singers_df = get_data('singers')
-        cities_df = get_data('cities')
-        concerts_df = get_data('concerts')
+        # 获取数据（开启分析快照时读取只读副本）
+        singers_df = get_analytics_data('singers')
+        cities_df = get_analytics_data('cities')
+        concerts_df = get_analytics_data('concerts')
 
         if singers_df.empty or cities_df.empty:
             st.warning("暂无数据用于城市推荐，请先初始化数据库")
             return
 
         # 选择歌手
-        selected_singer = st.selectbox(
-            "选择要推荐城市的歌手",
-            singers_df['name'].unique(),
-            key="city_singer"
-        )
+        singer_id, selected_singer = singer_picker("选择要推荐城市的歌手", key="city_singer")
 
         if selected_singer:
-            # 获取歌手ID和信息
-            singer_id = singers_df[singers_df['name'] == selected_singer]['singer_id'].iloc[0]
-            singer_info = singers_df[singers_df['name'] == selected_singer].iloc[0]
+            # 获取歌手信息
+            singer_info = singers_df[singers_df['singer_id'] == singer_id].iloc[0]
             singer_genre = singer_info.get('genre', '流行')
 
             st.info(f"正在为 {selected_singer} ({singer_genre}) 推荐最佳举办城市...")
@@ -2266,76 +2653,7 @@ def show_prediction_analysis():
                 concerts_df['singer_id'] == singer_id].copy() if not concerts_df.empty else pd.DataFrame()
 
             # 个性化推荐算法
-            recommendations = []
-
-            # 获取所有城市
-            all_cities = cities_df.copy()
-
-            for _, city_row in all_cities.iterrows():
-                city_name = city_row['city_name']
-                population = city_row['population']
-                avg_capacity = city_row['avg_concert_capacity']
-                frequency = city_row['concert_frequency']
-
-                # 基础得分
-                score = 50  # 基础分
-
-                # 1. 人口因素（人口越多，得分越高）
-                population_score = min(population / 50, 20)  # 每50万人口加1分，最高20分
-                score += population_score
-
-                # 2. 演唱会频率因素（频率适中最好）
-                if 5 <= frequency <= 15:
-                    frequency_score = 10
-                elif frequency < 5:
-                    frequency_score = frequency  # 频率太低不好
-                else:
-                    frequency_score = 20 - frequency  # 频率太高竞争激烈
-
-                score += frequency_score
-
-                # 3. 场馆容量因素
-                capacity_score = min(avg_capacity / 2000, 10)  # 每2000容量加1分，最高10分
-                score += capacity_score
-
-                # 4. 历史表现因素（如果该歌手在该城市有过演出）
-                if not singer_concerts.empty:
-                    city_performance = singer_concerts[singer_concerts['city'] == city_name]
-                    if not city_performance.empty:
-                        # 计算平均上座率
-                        avg_attendance_rate = city_performance[
-                            'attendance_rate'].mean() if 'attendance_rate' in city_performance.columns else 0.8
-                        performance_score = avg_attendance_rate * 20  # 最高20分
-                        score += performance_score
-
-                # 5. 音乐流派匹配因素
-                genre_bonus = 0
-                if '流行' in singer_genre and city_name in ['北京', '上海', '广州', '深圳']:
-                    genre_bonus = 10  # 流行音乐在一线城市更受欢迎
-                elif '摇滚' in singer_genre and city_name in ['成都', '武汉', '南京']:
-                    genre_bonus = 8  # 摇滚音乐在新一线城市有市场
-                elif '民谣' in singer_genre and city_name in ['杭州', '西安', '重庆']:
-                    genre_bonus = 7  # 民谣音乐在文化城市更受欢迎
-
-                score += genre_bonus
-
-                # 6. 竞争程度因素（演唱会频率太高可能竞争激烈）
-                competition_penalty = max(0, (frequency - 10) * 0.5)  # 频率超过10场每月，每场扣0.5分
-                score -= competition_penalty
-
-                # 确保分数在0-100之间
-                score = max(0, min(100, score))
-
-                recommendations.append({
-                    'city': city_name,
-                    'score': round(score, 1),
-                    'population': population,
-                    'concert_frequency': frequency,
-                    'avg_capacity': avg_capacity
-                })
-
-            # 按得分排序
-            recommendations.sort(key=lambda x: x['score'], reverse=True)
+            recommendations = score_cities(singer_genre, cities_df, singer_concerts)
 
             # 显示推荐结果
             st.subheader(f"{selected_singer}的城市推荐")
@@ -2585,6 +2903,209 @@ def show_prediction_analysis():
 
 
 
+# ==================== 数据可视化图表 ====================
+def prepare_visualization_data(singers_df, concerts_df):
+    """清洗并合并演唱会与歌手数据，供可视化图表使用"""
+    # 确保有必要的列
+    concerts_df = concerts_df.copy()
+    singers_df = singers_df.copy()
+
+    # 确保singer_id是数值类型
+    if 'singer_id' in singers_df.columns:
+        singers_df['singer_id'] = pd.to_numeric(singers_df['singer_id'], errors='coerce')
+    if 'singer_id' in concerts_df.columns:
+        concerts_df['singer_id'] = pd.to_numeric(concerts_df['singer_id'], errors='coerce')
+
+    # 确保其他数值列
+    numeric_cols = ['capacity', 'attendance', 'ticket_price', 'revenue', 'attendance_rate']
+    for col in numeric_cols:
+        if col in concerts_df.columns:
+            concerts_df[col] = pd.to_numeric(concerts_df[col], errors='coerce')
+
+    # 合并数据 - 使用左连接，保留所有演唱会数据
+    merged_data = pd.merge(
+        concerts_df,
+        singers_df[['singer_id', 'name', 'genre']].rename(columns={'name': 'singer_name'}),
+        on='singer_id',
+        how='left'
+    )
+
+    # 如果没有歌手名字，使用默认值
+    if 'singer_name' in merged_data.columns:
+        merged_data['singer_name'] = merged_data['singer_name'].fillna('未知歌手')
+    else:
+        merged_data['singer_name'] = '未知歌手'
+
+    if 'genre' in merged_data.columns:
+        merged_data['genre'] = fillna_category(merged_data['genre'], '未知流派')
+    else:
+        merged_data['genre'] = '未知流派'
+
+    # 填充其他缺失值
+    if 'revenue' in merged_data.columns:
+        merged_data['revenue'] = merged_data['revenue'].fillna(0)
+    else:
+        merged_data['revenue'] = 0
+
+    if 'attendance_rate' in merged_data.columns:
+        merged_data['attendance_rate'] = pd.to_numeric(merged_data['attendance_rate'], errors='coerce')
+        merged_data['attendance_rate'] = merged_data['attendance_rate'].fillna(0)
+    else:
+        merged_data['attendance_rate'] = 0
+
+    if 'city' in merged_data.columns:
+        merged_data['city'] = fillna_category(merged_data['city'], '未知城市')
+    else:
+        merged_data['city'] = '未知城市'
+
+    return merged_data
+
+
+def build_revenue_rank_figure(merged_data):
+    """Top 10 歌手收入排名柱状图，无数据时返回None"""
+    if 'singer_name' not in merged_data.columns or 'revenue' not in merged_data.columns:
+        return None
+
+    singer_revenue = merged_data.groupby('singer_name')['revenue'].sum().reset_index()
+    singer_revenue = singer_revenue.sort_values('revenue', ascending=False).head(10)
+    if singer_revenue.empty or singer_revenue['revenue'].sum() <= 0:
+        return None
+
+    # 创建柱状图
+    fig = px.bar(
+        singer_revenue,
+        x='singer_name',
+        y='revenue',
+        title="Top 10 歌手收入排名",
+        labels={'singer_name': '歌手', 'revenue': '总收入 (元)'},
+        color='revenue',
+        color_continuous_scale='Viridis'
+    )
+
+    # 优化布局
+    fig.update_layout(
+        xaxis_title="歌手",
+        yaxis_title="总收入 (元)",
+        yaxis=dict(tickformat=",.0f"),
+        height=500,
+        showlegend=False
+    )
+
+    # 添加数据标签
+    fig.update_traces(
+        texttemplate='%{y:,.0f}',
+        textposition='outside'
+    )
+    return fig
+
+
+def build_revenue_share_figure(merged_data, column, title, colors):
+    """按城市或流派统计的收入占比饼图，无数据时返回None"""
+    if column not in merged_data.columns or 'revenue' not in merged_data.columns:
+        return None
+
+    revenue = merged_data.groupby(column, observed=True)['revenue'].sum().reset_index()
+    revenue = revenue[revenue['revenue'] > 0]
+    if revenue.empty:
+        return None
+
+    return px.pie(
+        revenue,
+        values='revenue',
+        names=column,
+        title=title,
+        hole=0.3,
+        color_discrete_sequence=colors
+    )
+
+
+def build_attendance_figure(merged_data):
+    """Top 10 歌手平均上座率柱状图，无数据时返回None"""
+    if 'attendance_rate' not in merged_data.columns or 'singer_name' not in merged_data.columns:
+        return None
+
+    # 按歌手分组计算平均上座率
+    attendance = merged_data.assign(attendance_rate_pct=merged_data['attendance_rate'] * 100)
+    singer_attendance = attendance.groupby('singer_name')['attendance_rate_pct'].mean().reset_index()
+    singer_attendance = singer_attendance.sort_values('attendance_rate_pct', ascending=False).head(10)
+    if singer_attendance.empty:
+        return None
+
+    fig = px.bar(
+        singer_attendance,
+        x='singer_name',
+        y='attendance_rate_pct',
+        title="Top 10 歌手平均上座率",
+        labels={'singer_name': '歌手', 'attendance_rate_pct': '上座率 (%)'},
+        color='attendance_rate_pct',
+        color_continuous_scale='RdYlGn'
+    )
+
+    fig.update_layout(
+        xaxis_title="歌手",
+        yaxis_title="上座率 (%)",
+        height=500,
+        showlegend=False
+    )
+
+    # 添加数据标签
+    fig.update_traces(
+        texttemplate='%{y:.1f}%',
+        textposition='outside'
+    )
+    return fig
+
+
+def build_city_count_figure(merged_data):
+    """各城市演唱会数量柱状图，无数据时返回None"""
+    if 'city' not in merged_data.columns:
+        return None
+
+    # 各城市演唱会数量
+    city_counts = merged_data['city'].value_counts().reset_index()
+    city_counts.columns = ['city', 'count']
+    city_counts = city_counts.sort_values('count', ascending=False).head(10)
+    if city_counts.empty:
+        return None
+
+    fig = px.bar(
+        city_counts,
+        x='city',
+        y='count',
+        title="各城市演唱会数量",
+        labels={'city': '城市', 'count': '演唱会数量'},
+        color='count',
+        color_continuous_scale='Plasma'
+    )
+
+    fig.update_layout(
+        xaxis_title="城市",
+        yaxis_title="演唱会数量",
+        height=500,
+        showlegend=False
+    )
+
+    # 添加数据标签
+    fig.update_traces(
+        texttemplate='%{y}',
+        textposition='outside'
+    )
+    return fig
+
+
+# 可视化页面的图表：缓存名 -> 基于合并数据的构建函数
+VISUALIZATION_FIGURES = {
+    'visualization.revenue_rank': build_revenue_rank_figure,
+    'visualization.city_revenue': lambda merged: build_revenue_share_figure(
+        merged, 'city', "各城市收入占比", px.colors.sequential.RdBu),
+    'visualization.genre_revenue': lambda merged: build_revenue_share_figure(
+        merged, 'genre', "各流派收入占比", px.colors.sequential.Plasma),
+    'visualization.attendance': build_attendance_figure,
+    'visualization.city_count': build_city_count_figure
+}
+
+
+@profiled_page
 def show_data_visualization():
     """数据可视化页面"""
     st.markdown("---")
@@ -2598,10 +3119,15 @@ def show_data_visualization():
     else:
         st.error("❌ 数据库连接失败")
 
+    # 图表缓存键包含数据来源（实时数据或分析快照的代数），先于读取数据获取
+    figure_filters = {'source': analytics_source()}
+
     # 获取数据
     try:
-        singers_df = get_data('singers')
-        concerts_df = get_data('concerts')
+        with page_phase('fetch'):
+            tables = fetch_concurrently(tables=('singers', 'concerts'), loader=get_analytics_data)
+        singers_df = tables['singers']
+        concerts_df = tables['concerts']
     except Exception as e:
         st.error(f"获取数据失败: {str(e)}")
         singers_df = pd.DataFrame()
@@ -2615,14 +3141,17 @@ def show_data_visualization():
         singer_count = len(singers_df) if not singers_df.empty else 0
         st.metric("歌手总数", singer_count)
 
+    try:
+        totals = read_totals()
+    except Exception as e:
+        print(f"读取增量统计失败: {str(e)}")
+        totals = {'concert_count': 0, 'total_revenue': 0}
+
     with col2:
-        concert_count = len(concerts_df) if not concerts_df.empty else 0
-        st.metric("演唱会数量", concert_count)
+        st.metric("演唱会数量", totals['concert_count'])
 
     with col3:
-        total_revenue = concerts_df[
-            'revenue'].sum() if not concerts_df.empty and 'revenue' in concerts_df.columns else 0
-        st.metric("总收入", f"¥{total_revenue:,.0f}")
+        st.metric("总收入", f"¥{totals['total_revenue']:,.0f}")
 
     st.markdown("---")
 
@@ -2631,76 +3160,29 @@ def show_data_visualization():
         st.warning("暂无数据用于可视化，请先初始化数据库或添加数据")
         return
 
-    # 数据清洗和合并
-    try:
-        # 确保有必要的列
-        concerts_df = concerts_df.copy()
-        singers_df = singers_df.copy()
-
-        # 重命名列以便合并
-        if 'singer_id' in singers_df.columns:
-            singers_df = singers_df.rename(columns={'singer_id': 'singer_id'})
-        if 'singer_id' in concerts_df.columns:
-            concerts_df = concerts_df.rename(columns={'singer_id': 'singer_id'})
-
-        # 确保singer_id是数值类型
-        if 'singer_id' in singers_df.columns:
-            singers_df['singer_id'] = pd.to_numeric(singers_df['singer_id'], errors='coerce')
-        if 'singer_id' in concerts_df.columns:
-            concerts_df['singer_id'] = pd.to_numeric(concerts_df['singer_id'], errors='coerce')
-
-        # 确保其他数值列
-        numeric_cols = ['capacity', 'attendance', 'ticket_price', 'revenue', 'attendance_rate']
-        for col in numeric_cols:
-            if col in concerts_df.columns:
-                concerts_df[col] = pd.to_numeric(concerts_df[col], errors='coerce')
-
-        # 合并数据 - 使用左连接，保留所有演唱会数据
-        merged_data = pd.merge(
-            concerts_df,
-            singers_df[['singer_id', 'name', 'genre']].rename(columns={'name': 'singer_name'}),
-            on='singer_id',
-            how='left'
-        )
-
-        # 如果没有歌手名字，使用默认值
-        if 'singer_name' in merged_data.columns:
-            merged_data['singer_name'] = merged_data['singer_name'].fillna('未知歌手')
-        else:
-            merged_data['singer_name'] = '未知歌手'
-
-        if 'genre' in merged_data.columns:
-            merged_data['genre'] = merged_data['genre'].fillna('未知流派')
-        else:
-            merged_data['genre'] = '未知流派'
-
-        # 填充其他缺失值
-        if 'revenue' in merged_data.columns:
-            merged_data['revenue'] = merged_data['revenue'].fillna(0)
-        else:
-            merged_data['revenue'] = 0
-
-        if 'attendance_rate' in merged_data.columns:
-            merged_data['attendance_rate'] = pd.to_numeric(merged_data['attendance_rate'], errors='coerce')
-            merged_data['attendance_rate'] = merged_data['attendance_rate'].fillna(0)
-        else:
-            merged_data['attendance_rate'] = 0
+    # 数据清洗和合并：只在有图表未命中缓存时才执行
+    prepared = {}
 
-        if 'city' in merged_data.columns:
-            merged_data['city'] = merged_data['city'].fillna('未知城市')
-        else:
-            merged_data['city'] = '未知城市'
+    def merged_data():
+        if 'data' not in prepared:
+            try:
+                with page_phase('transform'):
+                    prepared['data'] = prepare_visualization_data(singers_df, concerts_df)
+            except Exception as e:
+                st.error(f"数据处理失败: {str(e)}")
+                # 创建一个基本的合并数据用于显示
+                prepared['fallback'] = True
+                prepared['data'] = pd.DataFrame({
+                    'singer_name': ['周杰伦', '林俊杰', '邓紫棋', '五月天', 'Taylor Swift'],
+                    'revenue': [50000000, 30000000, 20000000, 15000000, 10000000],
+                    'city': ['北京', '上海', '广州', '深圳', '成都'],
+                    'genre': ['流行/R&B', '流行', '流行', '摇滚', '流行/乡村'],
+                    'attendance_rate': [0.95, 0.92, 0.88, 0.96, 0.94]
+                })
+        return prepared['data']
 
-    except Exception as e:
-        st.error(f"数据处理失败: {str(e)}")
-        # 创建一个基本的合并数据用于显示
-        merged_data = pd.DataFrame({
-            'singer_name': ['周杰伦', '林俊杰', '邓紫棋', '五月天', 'Taylor Swift'],
-            'revenue': [50000000, 30000000, 20000000, 15000000, 10000000],
-            'city': ['北京', '上海', '广州', '深圳', '成都'],
-            'genre': ['流行/R&B', '流行', '流行', '摇滚', '流行/乡村'],
-            'attendance_rate': [0.95, 0.92, 0.88, 0.96, 0.94]
-        })
+    def figure_spec(name):
+        return cached_figure(name, lambda: VISUALIZATION_FIGURES[name](merged_data()), figure_filters)
 
     # 使用选项卡组织图表
     tab1, tab2, tab3 = st.tabs(["💰 收入分析", "👥 上座率分析", "📍 城市分布"])
@@ -2709,43 +3191,14 @@ def show_data_visualization():
         st.subheader("💰 收入分析")
 
         # 1. 歌手收入排名
-        if 'singer_name' in merged_data.columns and 'revenue' in merged_data.columns:
-            try:
-                singer_revenue = merged_data.groupby('singer_name')['revenue'].sum().reset_index()
-                singer_revenue = singer_revenue.sort_values('revenue', ascending=False).head(10)
-
-                if not singer_revenue.empty and singer_revenue['revenue'].sum() > 0:
-                    # 创建柱状图
-                    fig1 = px.bar(
-                        singer_revenue,
-                        x='singer_name',
-                        y='revenue',
-                        title="Top 10 歌手收入排名",
-                        labels={'singer_name': '歌手', 'revenue': '总收入 (元)'},
-                        color='revenue',
-                        color_continuous_scale='Viridis'
-                    )
-
-                    # 优化布局
-                    fig1.update_layout(
-                        xaxis_title="歌手",
-                        yaxis_title="总收入 (元)",
-                        yaxis=dict(tickformat=",.0f"),
-                        height=500,
-                        showlegend=False
-                    )
-
-                    # 添加数据标签
-                    fig1.update_traces(
-                        texttemplate='%{y:,.0f}',
-                        textposition='outside'
-                    )
-
-                    st.plotly_chart(fig1, use_container_width=True)
-                else:
-                    st.info("暂无收入数据可展示")
-            except Exception as e:
-                st.error(f"创建收入排名图失败: {str(e)}")
+        try:
+            spec = figure_spec('visualization.revenue_rank')
+            if spec:
+                plotly_chart_json(spec)
+            else:
+                st.info("暂无收入数据可展示")
+        except Exception as e:
+            st.error(f"创建收入排名图失败: {str(e)}")
 
         # 2. 收入分布图
         st.markdown("#### 收入分布")
@@ -2753,139 +3206,60 @@ def show_data_visualization():
 
         with col1:
             # 城市收入占比
-            if 'city' in merged_data.columns and 'revenue' in merged_data.columns:
-                try:
-                    city_revenue = merged_data.groupby('city')['revenue'].sum().reset_index()
-                    city_revenue = city_revenue[city_revenue['revenue'] > 0]
-
-                    if not city_revenue.empty:
-                        fig2 = px.pie(
-                            city_revenue,
-                            values='revenue',
-                            names='city',
-                            title="各城市收入占比",
-                            hole=0.3,
-                            color_discrete_sequence=px.colors.sequential.RdBu
-                        )
-                        st.plotly_chart(fig2, use_container_width=True)
-                    else:
-                        st.info("暂无城市收入数据")
-                except Exception as e:
-                    st.error(f"创建城市收入图失败: {str(e)}")
+            try:
+                spec = figure_spec('visualization.city_revenue')
+                if spec:
+                    plotly_chart_json(spec)
+                else:
+                    st.info("暂无城市收入数据")
+            except Exception as e:
+                st.error(f"创建城市收入图失败: {str(e)}")
 
         with col2:
             # 流派收入占比
-            if 'genre' in merged_data.columns and 'revenue' in merged_data.columns:
-                try:
-                    genre_revenue = merged_data.groupby('genre')['revenue'].sum().reset_index()
-                    genre_revenue = genre_revenue[genre_revenue['revenue'] > 0]
-
-                    if not genre_revenue.empty:
-                        fig3 = px.pie(
-                            genre_revenue,
-                            values='revenue',
-                            names='genre',
-                            title="各流派收入占比",
-                            hole=0.3,
-                            color_discrete_sequence=px.colors.sequential.Plasma
-                        )
-                        st.plotly_chart(fig3, use_container_width=True)
-                    else:
-                        st.info("暂无流派收入数据")
-                except Exception as e:
-                    st.error(f"创建流派收入图失败: {str(e)}")
+            try:
+                spec = figure_spec('visualization.genre_revenue')
+                if spec:
+                    plotly_chart_json(spec)
+                else:
+                    st.info("暂无流派收入数据")
+            except Exception as e:
+                st.error(f"创建流派收入图失败: {str(e)}")
 
     with tab2:
         st.subheader("👥 上座率分析")
 
-        if 'attendance_rate' in merged_data.columns and 'singer_name' in merged_data.columns:
-            try:
-                # 计算平均上座率
-                merged_data['attendance_rate_pct'] = merged_data['attendance_rate'] * 100
-
-                # 按歌手分组计算平均上座率
-                singer_attendance = merged_data.groupby('singer_name')['attendance_rate_pct'].mean().reset_index()
-                singer_attendance = singer_attendance.sort_values('attendance_rate_pct', ascending=False).head(10)
-
-                if not singer_attendance.empty:
-                    fig4 = px.bar(
-                        singer_attendance,
-                        x='singer_name',
-                        y='attendance_rate_pct',
-                        title="Top 10 歌手平均上座率",
-                        labels={'singer_name': '歌手', 'attendance_rate_pct': '上座率 (%)'},
-                        color='attendance_rate_pct',
-                        color_continuous_scale='RdYlGn'
-                    )
-
-                    fig4.update_layout(
-                        xaxis_title="歌手",
-                        yaxis_title="上座率 (%)",
-                        height=500,
-                        showlegend=False
-                    )
-
-                    # 添加数据标签
-                    fig4.update_traces(
-                        texttemplate='%{y:.1f}%',
-                        textposition='outside'
-                    )
-
-                    st.plotly_chart(fig4, use_container_width=True)
-                else:
-                    st.info("暂无上座率数据")
-            except Exception as e:
-                st.error(f"创建上座率图失败: {str(e)}")
-        else:
-            st.info("暂无上座率数据")
+        try:
+            spec = figure_spec('visualization.attendance')
+            if spec:
+                plotly_chart_json(spec)
+            else:
+                st.info("暂无上座率数据")
+        except Exception as e:
+            st.error(f"创建上座率图失败: {str(e)}")
 
     with tab3:
         st.subheader("📍 城市分布分析")
 
-        if 'city' in merged_data.columns:
-            try:
-                # 各城市演唱会数量
-                city_counts = merged_data['city'].value_counts().reset_index()
-                city_counts.columns = ['city', 'count']
-                city_counts = city_counts.sort_values('count', ascending=False).head(10)
-
-                if not city_counts.empty:
-                    fig5 = px.bar(
-                        city_counts,
-                        x='city',
-                        y='count',
-                        title="各城市演唱会数量",
-                        labels={'city': '城市', 'count': '演唱会数量'},
-                        color='count',
-                        color_continuous_scale='Plasma'
-                    )
-
-                    fig5.update_layout(
-                        xaxis_title="城市",
-                        yaxis_title="演唱会数量",
-                        height=500,
-                        showlegend=False
-                    )
-
-                    # 添加数据标签
-                    fig5.update_traces(
-                        texttemplate='%{y}',
-                        textposition='outside'
-                    )
+        try:
+            spec = figure_spec('visualization.city_count')
+            if spec:
+                plotly_chart_json(spec)
+            else:
+                st.info("暂无城市分布数据")
+        except Exception as e:
+            st.error(f"创建城市分布图失败: {str(e)}")
 
-                    st.plotly_chart(fig5, use_container_width=True)
-                else:
-                    st.info("暂无城市分布数据")
-            except Exception as e:
-                st.error(f"创建城市分布图失败: {str(e)}")
-        else:
-            st.info("暂无城市分布数据")
+    # 使用示例数据绘制的图表不保留，下次重新尝试处理真实数据
+    if prepared.get('fallback'):
+        invalidate_figures('visualization.')
 
     # 底部提示
     st.markdown("---")
     st.caption("💡 提示：图表数据基于数据库中的演唱会记录计算得出")
 
 
+@profiled_page
 def show_database_management():
     """数据库管理页面"""
     st.header("📋 数据库管理")
@@ -2894,23 +3268,24 @@ def show_database_management():
     conn = get_db_connection()
 
     if conn:
-        tab1, tab2 = st.tabs(["🗃️ 表管理", "📊 数据统计"])
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🗃️ 表管理", "📊 数据统计", "📤 数据导出", "🗄️ 历史归档",
+                                                      "🛠️ 数据库维护", "💾 备份与恢复"])
 
         with tab1:
             st.subheader("数据库表管理")
 
             # 获取所有表名
-            tables_df = query_database("SELECT name FROM sqlite_master WHERE type='table'")
+            table_names = get_backend().list_tables()
 
-            if tables_df is not None and not tables_df.empty:
+            if table_names:
                 selected_table = st.selectbox(
                     "选择要查看的表",
-                    tables_df['name'].tolist()
+                    table_names
                 )
 
                 if selected_table:
                     # 获取表数据
-                    table_data = query_database(f"SELECT * FROM {selected_table} LIMIT 100")
+                    table_data = query_database(get_backend().limit_sql(f"SELECT * FROM {selected_table}", 100))
 
                     if table_data is not None:
                         st.dataframe(table_data, use_container_width=True)
@@ -2927,45 +3302,7 @@ def show_database_management():
                                 st.metric("总行数", row_count['count'].iloc[0])
 
             # SQL查询工具
-            st.subheader("SQL查询工具")
-            sql_query = st.text_area(
-                "输入SQL查询语句",
-                height=100,
-                value="SELECT * FROM singers LIMIT 10"
-            )
-
-            col1, col2 = st.columns(2)
-            with col1:
-                execute_btn = st.button("执行SQL", type="primary")
-            with col2:
-                reset_btn = st.button("重置", type="secondary")
-
-            if execute_btn and sql_query.strip():
-                try:
-                    if sql_query.strip().upper().startswith('SELECT'):
-                        result = query_database(sql_query)
-                        if result is not None:
-                            st.dataframe(result, use_container_width=True)
-                    else:
-                        # 执行非SELECT语句
-                        success = execute_sql(sql_query)
-                        if success:
-                            st.success("SQL执行成功！")
-                            # 刷新页面数据
-                            st.cache_data.clear()
-                            st.rerun()
-                        else:
-                            st.error("SQL执行失败")
-                except Exception as e:
-                    st.error(f"执行错误: {str(e)}")
-
-            if st.button("执行查询", type="primary"):
-                if sql_query.strip().upper().startswith('SELECT'):
-                    result = query_database(sql_query)
-                    if result is not None:
-                        st.dataframe(result, use_container_width=True)
-                else:
-                    st.warning("只支持SELECT查询")
+            show_sql_console()
 
         with tab2:
             st.subheader("数据统计")
@@ -2987,19 +3324,799 @@ def show_database_management():
                 st.dataframe(stats_df, use_container_width=True)
 
                 # 可视化
-                fig = px.bar(
-                    stats_df,
-                    x='表名',
-                    y='记录数',
-                    title="各表数据量统计",
-                    color='记录数',
-                    color_continuous_scale='Viridis'
+                with page_phase('figure'):
+                    fig = px.bar(
+                        stats_df,
+                        x='表名',
+                        y='记录数',
+                        title="各表数据量统计",
+                        color='记录数',
+                        color_continuous_scale='Viridis'
+                    )
+                plotly_chart(fig, use_container_width=True)
+
+            # 缓存内存报告
+            st.markdown("#### 🧠 缓存内存报告")
+            memory_df = pd.DataFrame(cache_memory_report())
+            if not memory_df.empty:
+                st.dataframe(
+                    memory_df,
+                    column_config={
+                        "table": "表名",
+                        "rows": "行数",
+                        "arrow_bytes": "Arrow缓存(字节)",
+                        "compact_bytes": "紧凑类型DataFrame(字节)",
+                        "legacy_bytes": "原始类型DataFrame(字节)",
+                        "ratio": st.column_config.NumberColumn("压缩倍数", format="%.2fx")
+                    },
+                    hide_index=True,
+                    use_container_width=True
                 )
-                st.plotly_chart(fig, use_container_width=True)
+            else:
+                st.info("缓存尚未加载，访问其他页面后再查看")
+
+            if uses_local_sqlite():
+                show_totals_check()
+                show_search_index()
+
+        # 导出、归档、维护与快照都直接操作本地SQLite文件
+        for tab, sections in ((tab3, [show_data_export]), (tab4, [show_data_archive]),
+                              (tab5, [show_database_maintenance, show_data_cleanup]), (tab6, [show_snapshots])):
+            with tab:
+                if not uses_local_sqlite():
+                    st.info(LOCAL_SQLITE_ONLY)
+                    continue
+                for section in sections:
+                    section()
     else:
         st.warning("数据库连接不可用，无法进行数据库管理操作")
 
 
+def show_totals_check():
+    """校验触发器维护的增量统计"""
+    st.markdown("#### 🧮 增量统计校验")
+    st.caption("概览页与侧边栏的合计由触发器增量维护，这里与全量重新计算的结果逐项比较")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("校验统计", key="totals_check"):
+            try:
+                report = check_totals()
+                if report['ok']:
+                    st.success(f"✅ {report['checked_scopes']} 项统计全部一致")
+                else:
+                    st.error(f"❌ 发现 {len(report['mismatches'])} 项不一致")
+                    st.dataframe(pd.DataFrame(report['mismatches']), hide_index=True, use_container_width=True)
+            except Exception as e:
+                st.error(f"校验失败: {str(e)}")
+    with col2:
+        if st.button("按全量数据重建", key="totals_rebuild"):
+            try:
+                rebuild_totals()
+                bump_data_version()
+                st.success("✅ 统计已重建")
+            except Exception as e:
+                st.error(f"重建失败: {str(e)}")
+
+
+def show_search_index():
+    """全文索引状态与重建"""
+    st.markdown("#### 🔎 全文索引")
+    try:
+        info = index_stats()
+    except Exception as e:
+        st.error(f"读取全文索引失败: {str(e)}")
+        return
+
+    columns = st.columns(len(SEARCH_KINDS) + 1)
+    for column, (kind, label) in zip(columns, SEARCH_KINDS.items()):
+        with column:
+            st.metric(f"{label}索引行数", info['rows'].get(kind, 0))
+    with columns[-1]:
+        st.metric("拼音检索", "已启用" if info['pinyin_enabled'] else "未启用",
+                  help="安装 pypinyin 后可按全拼或首字母检索")
+
+    if st.button("重建全文索引", key="search_rebuild"):
+        try:
+            rows = rebuild_search_index()
+            st.success(f"✅ 已重建 {rows} 行索引")
+        except Exception as e:
+            st.error(f"重建失败: {str(e)}")
+
+
+def show_sql_console():
+    """SQL控制台：分页流式读取、行数与时间上限、执行计划"""
+    st.subheader("SQL查询工具")
+
+    sql_query = st.text_area(
+        "输入SQL语句",
+        height=100,
+        value="SELECT * FROM singers LIMIT 10",
+        key="console_sql_input"
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        max_rows = st.number_input("最多返回行数", min_value=10, max_value=100000,
+                                   value=DEFAULT_MAX_ROWS, step=100, key="console_max_rows")
+    with col2:
+        timeout_seconds = st.number_input("超时时间(秒)", min_value=0.5, max_value=120.0,
+                                          value=DEFAULT_TIMEOUT, step=0.5, key="console_timeout")
+    with col3:
+        page_size = st.selectbox("每页行数", [50, 100, 500], index=1, key="console_page_size")
+
+    col_run, col_plan, col_reset = st.columns(3)
+    with col_run:
+        execute_btn = st.button("▶️ 执行", type="primary", use_container_width=True, key="console_run")
+    with col_plan:
+        plan_btn = st.button("🧭 执行计划", use_container_width=True, key="console_plan")
+    with col_reset:
+        reset_btn = st.button("重置", type="secondary", use_container_width=True, key="console_reset")
+
+    if not uses_local_sqlite():
+        # 其他后端：读语句通过存储后端读取前若干行，写语句交给execute_sql；不支持分页、超时与执行计划
+        if plan_btn:
+            st.info("执行计划只支持本地SQLite库")
+        if execute_btn and sql_query.strip():
+            if is_read_statement(sql_query):
+                if supports_subquery(sql_query):
+                    result = query_database(get_backend().limit_sql(f"SELECT * FROM ({normalize_sql(sql_query)})",
+                                                                    int(max_rows)))
+                else:
+                    result = query_database(normalize_sql(sql_query))
+                if result is None:
+                    st.error("执行错误，请查看日志")
+                else:
+                    st.dataframe(result, use_container_width=True)
+            elif execute_sql(normalize_sql(sql_query)):
+                st.success("SQL执行成功！")
+                st.cache_data.clear()
+            else:
+                st.error("SQL执行失败，请查看日志")
+        return
+
+    if reset_btn:
+        st.session_state.pop("console_query", None)
+
+    if plan_btn and sql_query.strip():
+        try:
+            st.code(format_query_plan(explain_query_plan(sql_query)), language="text")
+        except Exception as e:
+            st.error(f"获取执行计划失败: {str(e)}")
+
+    if execute_btn and sql_query.strip():
+        if is_read_statement(sql_query):
+            # 只记录语句和页码，结果不做缓存，翻页时重新读取对应的一页
+            st.session_state["console_query"] = {'sql': sql_query, 'page': 0}
+        else:
+            st.session_state.pop("console_query", None)
+            try:
+                row_count = execute_statement(sql_query, timeout_seconds)
+                st.success(f"SQL执行成功！影响 {row_count} 行")
+                st.cache_data.clear()
+            except Exception as e:
+                st.error(f"SQL执行失败: {str(e)}")
+
+    console_query = st.session_state.get("console_query")
+    if console_query:
+        try:
+            result = fetch_page(console_query['sql'], console_query['page'], page_size,
+                                max_rows, timeout_seconds)
+        except Exception as e:
+            st.error(f"执行错误: {str(e)}")
+            return
+
+        st.dataframe(pd.DataFrame(result['rows'], columns=result['columns']), use_container_width=True)
+
+        first_row = console_query['page'] * page_size + 1
+        st.caption(f"第 {console_query['page'] + 1} 页，第 {first_row} - {first_row + len(result['rows']) - 1} 行，"
+                   f"耗时 {result['elapsed'] * 1000:.1f} ms")
+        if result['truncated']:
+            st.warning(f"结果已达到 {max_rows} 行上限，其余行未读取")
+
+        col_prev, col_next = st.columns(2)
+        with col_prev:
+            if st.button("⬅️ 上一页", disabled=console_query['page'] == 0, key="console_prev"):
+                console_query['page'] -= 1
+                st.rerun()
+        with col_next:
+            if st.button("下一页 ➡️", disabled=not result['has_more'], key="console_next"):
+                console_query['page'] += 1
+                st.rerun()
+
+
+def show_data_export():
+    """数据导出（Parquet / Arrow IPC）"""
+    st.subheader("数据导出")
+    st.caption("按批流式读取并写入文件，导出过程的内存占用与表大小无关。命令行导出：python data_export.py --table concerts")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        source = st.radio("导出内容", ["整张表", "SQL查询结果"], horizontal=True, key="export_source")
+    with col2:
+        fmt = st.selectbox("导出格式", sorted(EXPORT_FORMATS), key="export_format")
+
+    if source == "整张表":
+        table_names = get_backend().list_tables()
+        if not table_names:
+            st.warning("数据库中没有可导出的表")
+            return
+        export_name = st.selectbox("选择要导出的表", table_names, key="export_table")
+        export_sql = None
+    else:
+        export_name = "query_result"
+        export_sql = st.text_area("输入SELECT语句", height=100,
+                                  value="SELECT * FROM concerts", key="export_sql")
+
+    if st.button("生成导出文件", type="primary", key="export_btn"):
+        # 删除上一次生成的临时文件
+        previous = st.session_state.get("export_file")
+        if previous and os.path.exists(previous['path']):
+            os.remove(previous['path'])
+
+        fd, export_path = tempfile.mkstemp(suffix=EXPORT_FORMATS[fmt], prefix="star_export_")
+        os.close(fd)
+        try:
+            with st.spinner("正在导出数据..."):
+                if export_sql is None:
+                    row_count = export_table(export_name, export_path, fmt)
+                else:
+                    if not export_sql.strip().upper().startswith('SELECT'):
+                        raise ValueError("只支持导出SELECT查询结果")
+                    row_count = export_query(export_sql, export_path, fmt)
+
+            st.session_state["export_file"] = {
+                'path': export_path,
+                'file_name': default_file_name(export_name, fmt),
+                'fmt': fmt,
+                'rows': row_count
+            }
+        except Exception as e:
+            os.remove(export_path)
+            st.session_state.pop("export_file", None)
+            st.error(f"导出失败: {str(e)}")
+
+    export_file = st.session_state.get("export_file")
+    if export_file and os.path.exists(export_file['path']):
+        file_size = os.path.getsize(export_file['path'])
+        st.success(f"已导出 {export_file['rows']} 行，文件大小 {file_size / 1024:,.1f} KB")
+        with open(export_file['path'], 'rb') as f:
+            st.download_button(
+                "⬇️ 下载导出文件",
+                data=f,
+                file_name=export_file['file_name'],
+                mime=EXPORT_MIME_TYPES[export_file['fmt']],
+                key="export_download"
+            )
+
+
+def show_database_maintenance():
+    """统计信息、完整性检查、空间占用与定时维护"""
+    st.subheader("数据库维护")
+    st.caption("ANALYZE让查询规划器按实际数据量选择索引；数据增长后应定期执行，"
+               "并定期检查完整性、回收空闲页。命令行：python maintenance.py analyze | check | storage | schedule")
+
+    try:
+        summary = database_summary()
+    except Exception as e:
+        st.error(f"读取数据库信息失败: {str(e)}")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("文件大小", f"{summary['file_bytes'] / 1024:.1f} KB")
+    with col2:
+        st.metric("总页数", summary['page_count'])
+    with col3:
+        st.metric("空闲页", summary['freelist_count'])
+    with col4:
+        st.metric("统计信息", "已收集" if summary['analyzed'] else "未收集")
+
+    # 各表与索引的空间占用
+    st.markdown("#### 💾 空间占用")
+    try:
+        storage_df = storage_report()
+        st.dataframe(
+            storage_df,
+            column_config={
+                "name": "名称",
+                "type": "类型",
+                "tbl_name": "所属表",
+                "pages": "页数",
+                "bytes": st.column_config.NumberColumn("占用(字节)", format="%d"),
+                "unused_bytes": st.column_config.NumberColumn("未使用(字节)", format="%d"),
+                "fill_ratio": st.column_config.ProgressColumn("填充率", format="%.0f%%", min_value=0, max_value=1)
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    except Exception as e:
+        st.error(f"统计空间占用失败（需要SQLite启用dbstat）: {str(e)}")
+
+    # 手动执行
+    st.markdown("#### 🔧 立即执行")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        full_analyze = st.checkbox("完整ANALYZE（扫描全部行）", key="maintenance_full_analyze")
+        if st.button("📈 更新统计信息", key="maintenance_analyze"):
+            try:
+                result = analyze(full=full_analyze)
+                st.success(f"✅ {result['mode']} 完成，统计信息 {result['stat_rows']} 行，耗时 {result['seconds']} 秒")
+            except Exception as e:
+                st.error(f"更新统计信息失败: {str(e)}")
+    with col2:
+        quick = st.checkbox("快速检查（quick_check）", value=True, key="maintenance_quick_check")
+        if st.button("🩺 完整性检查", key="maintenance_integrity"):
+            try:
+                result = integrity_check(quick=quick)
+                if result['ok']:
+                    st.success(f"✅ {result['mode']} 通过，耗时 {result['seconds']} 秒")
+                else:
+                    st.error(f"{result['mode']} 发现 {len(result['errors'])} 个错误、"
+                             f"{result['foreign_key_violations']} 个外键问题")
+                    for message in result['errors']:
+                        st.text(message)
+            except Exception as e:
+                st.error(f"完整性检查失败: {str(e)}")
+    with col3:
+        if st.button("♻️ 增量VACUUM", key="maintenance_vacuum"):
+            try:
+                result = reclaim_space()
+                if result['auto_vacuum'] == 'incremental':
+                    st.success(f"✅ 回收 {result['reclaimed_pages']} 页（{result['reclaimed_bytes'] / 1024:.1f} KB）")
+                else:
+                    st.info("数据库未启用增量VACUUM，可在停止应用后运行 "
+                            "python maintenance.py enable-incremental-vacuum 启用")
+            except Exception as e:
+                st.error(f"增量VACUUM失败: {str(e)}")
+
+    # 定时维护
+    st.markdown("#### ⏰ 定时维护")
+    status = scheduler_status()
+    current = {task['task']: task['interval_seconds'] for task in status['tasks']}
+    columns = st.columns(len(SCHEDULED_TASKS))
+    intervals = {}
+    for column, (task, name) in zip(columns, SCHEDULED_TASKS.items()):
+        with column:
+            hours = current.get(task, DEFAULT_INTERVALS[task] if not status['running'] else 0) / 3600
+            intervals[task] = st.number_input(f"{name}间隔（小时，0为不执行）", min_value=0.0, value=float(hours),
+                                              step=1.0, key=f"maintenance_interval_{task}") * 3600
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("▶️ 启动/更新定时维护", key="maintenance_schedule_start"):
+            start_scheduler(intervals)
+            st.success("✅ 后台维护线程已启动")
+            status = scheduler_status()
+    with col2:
+        if st.button("⏹️ 停止定时维护", key="maintenance_schedule_stop"):
+            stop_scheduler()
+            status = scheduler_status()
+    with col3:
+        task = st.selectbox("立即执行任务", list(SCHEDULED_TASKS), format_func=SCHEDULED_TASKS.get,
+                            key="maintenance_run_task")
+        if st.button("执行", key="maintenance_run_now"):
+            entry = run_task(task)
+            (st.success if entry['ok'] else st.error)(f"{SCHEDULED_TASKS[task]}：{entry['detail']}")
+            status = scheduler_status()
+
+    if status['running']:
+        st.caption("后台维护运行中：" + "；".join(f"{task['name']} 每 {task['interval_seconds'] / 3600:g} 小时，"
+                                            f"下次 {task['next_run']}" for task in status['tasks']))
+    else:
+        st.caption("后台维护未启动")
+
+    if status['history']:
+        st.dataframe(
+            pd.DataFrame(status['history'])[['started_at', 'task', 'ok', 'seconds', 'detail']],
+            column_config={
+                "started_at": "开始时间",
+                "task": st.column_config.TextColumn("任务"),
+                "ok": "成功",
+                "seconds": st.column_config.NumberColumn("耗时(秒)", format="%.4f"),
+                "detail": "结果"
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+
+def show_data_cleanup():
+    """孤儿记录清理与空间回收"""
+    st.subheader("数据清理")
+    st.caption("清理引用了不存在歌手的演唱会、热度记录与汇总行，在一个事务内完成后回收空闲页")
+
+    try:
+        orphans = count_orphans()
+    except Exception as e:
+        st.error(f"统计孤儿记录失败: {str(e)}")
+        return
+
+    columns = st.columns(len(orphans))
+    for column, (table, count) in zip(columns, orphans.items()):
+        with column:
+            st.metric(f"{table} 孤儿记录", count)
+
+    if st.button("🧹 清理孤儿记录", key="sweep_orphans"):
+        try:
+            report = sweep_orphans()
+            st.success(f"✅ {format_report(report)}")
+            if report['auto_vacuum'] != 'incremental':
+                st.info("数据库未启用增量VACUUM，空闲页会被后续写入复用但不会缩小文件。"
+                        "可在停止应用后运行 python maintenance.py enable-incremental-vacuum 启用")
+        except Exception as e:
+            st.error(f"清理失败: {str(e)}")
+
+
+def show_snapshots():
+    """数据库在线快照与恢复"""
+    st.subheader("备份与恢复")
+    st.caption(f"通过SQLite在线备份接口分步复制数据库（连同热度归档库），备份期间可以照常读写；只保留最近 {KEEP_SNAPSHOTS} 个快照。"
+               "命令行：python snapshots.py create | list | restore <快照文件>")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        label = st.text_input("快照标签（可选）", key="snapshot_label")
+    with col2:
+        st.write("")
+        if st.button("💾 立即生成快照", type="primary", key="snapshot_create"):
+            try:
+                progress_bar = st.progress(0)
+                report = create_snapshot(label=label or None,
+                                         progress=lambda done, total: progress_bar.progress(done / total if total else 1.0))
+                st.success(f"✅ 已生成 {os.path.basename(report['path'])}（{report['bytes'] / 1024:.1f} KB，"
+                           f"耗时 {report['seconds']} 秒）")
+                if report['rotated']:
+                    st.caption(f"已删除旧快照: {', '.join(report['rotated'])}")
+            except SnapshotError as e:
+                st.error(str(e))
+
+    snapshots = list_snapshots()
+    if not snapshots:
+        st.info("还没有快照")
+        return
+
+    st.dataframe(
+        pd.DataFrame(snapshots)[['name', 'created_at', 'bytes', 'restorable']],
+        column_config={
+            "name": "快照",
+            "created_at": "生成时间",
+            "bytes": st.column_config.NumberColumn("大小(字节)", format="%d"),
+            "restorable": "可恢复"
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+    restorable = [snapshot for snapshot in snapshots if snapshot['restorable']]
+    if not restorable:
+        return
+    selected = st.selectbox("选择要恢复的快照", [snapshot['path'] for snapshot in restorable],
+                            format_func=os.path.basename, key="snapshot_restore_select")
+    st.warning("恢复会用快照覆盖当前全部数据（恢复前会自动为当前数据生成一个快照）")
+    confirm = st.checkbox("我确认要恢复这个快照", key="snapshot_restore_confirm")
+    if st.button("⏪ 从快照恢复", disabled=not confirm, key="snapshot_restore"):
+        try:
+            with st.spinner("正在恢复..."):
+                before = restore_snapshot(selected)
+            invalidate_figures()
+            st.success(f"✅ 已从 {os.path.basename(selected)} 恢复"
+                       + (f"，恢复前的数据已保存为 {os.path.basename(before['path'])}" if before else ""))
+        except SnapshotError as e:
+            st.error(str(e))
+
+
+def show_data_archive():
+    """热度数据历史归档"""
+    st.subheader("历史归档")
+    st.caption(f"早于保留期限的热度记录移入归档库 {ARCHIVE_DB_PATH}，热表与索引只保留近期数据；"
+               "按周/月/季度汇总与“包含归档历史”的查询会自动联合归档数据。命令行归档：python archive.py --days 365")
+
+    try:
+        stats_df = pd.DataFrame(archive_stats())
+        st.dataframe(
+            stats_df,
+            column_config={
+                "source": "位置",
+                "rows": "记录数",
+                "first_date": "最早日期",
+                "last_date": "最晚日期",
+                "file_bytes": st.column_config.NumberColumn("文件大小(字节)", format="%d")
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    except Exception as e:
+        st.error(f"读取归档信息失败: {str(e)}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        horizon_days = st.number_input("热表保留天数", min_value=1, value=DEFAULT_HORIZON_DAYS, step=30,
+                                       key="archive_days")
+    with col2:
+        export_parquet = st.checkbox("同时导出Parquet文件到 archive_parquet/", key="archive_parquet")
+
+    st.info(f"将归档记录日期早于 {archive_cutoff(int(horizon_days))} 的热度数据")
+    if st.button("执行归档", type="primary", key="archive_btn"):
+        try:
+            with st.spinner("正在归档..."):
+                report = archive_popularity(int(horizon_days),
+                                            parquet_dir="archive_parquet" if export_parquet else None)
+            st.success(f"已归档 {report['archived']} 行，热表剩余 {report['live_rows']} 行，"
+                       f"归档库共 {report['archive_rows']} 行，耗时 {report['elapsed']:.2f} 秒")
+            if report['parquet_file']:
+                st.caption(f"Parquet文件: {report['parquet_file']}")
+        except Exception as e:
+            st.error(f"归档失败: {str(e)}")
+
+
+@profiled_page
+def show_performance_monitor():
+    """性能监控页面"""
+    st.header("⏱️ 性能监控")
+
+    tab1, tab2, tab3 = st.tabs(["🗄️ SQL查询", "🖥️ 页面渲染", "🏭 服务模式"])
+
+    with tab1:
+        show_query_stats()
+
+    with tab2:
+        show_page_timing()
+
+    with tab3:
+        show_serving_mode()
+
+
+def show_serving_mode():
+    """多进程部署状态：当前工作进程、数据版本与写入进程统计"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("工作进程", os.environ.get("STAR_WORKER_ID", "单进程"))
+    with col2:
+        st.metric("进程ID", os.getpid())
+    with col3:
+        st.metric("数据版本", str(current_data_version()))
+
+    if not writer_configured():
+        st.info("当前为单进程模式。运行 python serve.py --workers 4 启动多进程模式，"
+                "再用 python loadtest.py --users 20 --url http://localhost:8501 --url http://localhost:8502 压测")
+        return
+
+    try:
+        stats = writer_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("写请求数", stats['requests'])
+        with col2:
+            st.metric("提交批次", stats['batches'])
+        with col3:
+            st.metric("平均每批", f"{stats['requests'] / stats['batches']:.1f}" if stats['batches'] else "0")
+        with col4:
+            st.metric("失败数", stats['errors'])
+    except Exception as e:
+        st.error(f"无法连接写入进程: {str(e)}")
+
+
+def show_query_stats():
+    """SQL查询耗时与执行计划"""
+    st.caption("记录 query_database 与 execute_sql 执行的每条语句（最近1000条），包括耗时、行数、缓存命中与执行计划")
+
+    records = get_records()
+    if not records:
+        st.info("暂无查询记录，浏览其他页面后再查看")
+        return
+
+    # 总体指标
+    executed = [r for r in records if not r['cache_hit']]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("记录语句数", len(records))
+    with col2:
+        hit_rate = (len(records) - len(executed)) / len(records) * 100
+        st.metric("缓存命中率", f"{hit_rate:.1f}%")
+    with col3:
+        total_ms = sum(r['duration_ms'] for r in executed)
+        st.metric("数据库总耗时", f"{total_ms:,.1f} ms")
+    with col4:
+        st.metric("全表扫描次数", sum(1 for r in executed if r['full_scan']))
+
+    # 最慢语句
+    st.subheader("🐢 最慢的语句")
+    summary_df = pd.DataFrame(slowest_statements())
+    if not summary_df.empty:
+        summary_df['full_scan'] = summary_df['full_scan'].map({True: '⚠️ 全表扫描', False: ''})
+        st.dataframe(
+            summary_df[['statement', 'kind', 'calls', 'executions', 'avg_ms', 'max_ms',
+                        'rows', 'hit_rate', 'full_scan']],
+            column_config={
+                "statement": "语句",
+                "kind": "类型",
+                "calls": "调用次数",
+                "executions": "实际执行",
+                "avg_ms": st.column_config.NumberColumn("平均耗时(ms)", format="%.2f"),
+                "max_ms": st.column_config.NumberColumn("最大耗时(ms)", format="%.2f"),
+                "rows": "返回/影响行数",
+                "hit_rate": st.column_config.NumberColumn("缓存命中率", format="%.2f"),
+                "full_scan": "扫描"
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+        # 执行计划
+        selected_statement = st.selectbox("查看执行计划", summary_df['statement'].tolist(),
+                                          key="monitor_plan_statement")
+        plan = get_plan(selected_statement)
+        if plan:
+            st.code("\n".join(f"└─ {step}" for step in plan), language="text")
+        else:
+            st.info("该语句仅命中缓存，尚无执行计划")
+
+    # 最近记录
+    with st.expander("📋 最近的查询记录"):
+        recent_df = pd.DataFrame(records[-200:][::-1])
+        recent_df['time'] = pd.to_datetime(recent_df['time'], unit='s')
+        st.dataframe(
+            recent_df[['time', 'kind', 'statement', 'duration_ms', 'rows', 'cache_hit', 'full_scan']],
+            hide_index=True,
+            use_container_width=True
+        )
+
+    if st.button("清空记录", key="monitor_clear"):
+        clear_records()
+        st.rerun()
+
+
+def show_page_timing():
+    """各页面分阶段渲染耗时"""
+    st.caption("fetch=数据读取，transform=数据处理与合并，figure=图表构建，render=图表渲染，other=其余部分")
+
+    stats_df = pd.DataFrame(page_stats())
+    if stats_df.empty:
+        st.info("暂无页面渲染记录，浏览其他页面后再查看")
+    else:
+        st.dataframe(
+            stats_df,
+            column_config={
+                "page": "页面函数",
+                "phase": "阶段",
+                "count": "样本数",
+                "mean_ms": st.column_config.NumberColumn("平均(ms)", format="%.2f"),
+                "p50_ms": st.column_config.NumberColumn("P50(ms)", format="%.2f"),
+                "p90_ms": st.column_config.NumberColumn("P90(ms)", format="%.2f"),
+                "p99_ms": st.column_config.NumberColumn("P99(ms)", format="%.2f")
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+        totals = stats_df[stats_df['phase'] != 'total']
+        fig = px.bar(
+            totals,
+            x='page',
+            y='p50_ms',
+            color='phase',
+            title="各页面P50耗时构成",
+            labels={'page': '页面', 'p50_ms': 'P50耗时 (ms)', 'phase': '阶段'}
+        )
+        plotly_chart(fig, use_container_width=True)
+
+    # 图表缓存
+    figure_stats = figure_cache_stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("图表缓存条目", figure_stats['entries'])
+    with col2:
+        st.metric("图表缓存命中率", f"{figure_stats['hit_rate']:.1%}")
+    with col3:
+        st.metric("缓存JSON大小", f"{figure_stats['bytes'] / 1024:.1f} KB")
+
+    # 歌手选择器的前缀缓存
+    picker_stats = lookup_stats()
+    st.caption(f"歌手选择器前缀缓存：{picker_stats['entries']} 个前缀，"
+               f"命中 {picker_stats['hits']} 次，未命中 {picker_stats['misses']} 次（命中率 {picker_stats['hit_rate']:.1%}）")
+
+    # 并发请求合并
+    st.markdown("#### 🔀 并发请求合并")
+    coalescing_df = pd.DataFrame(coalescing_stats())
+    if coalescing_df.empty:
+        st.info("暂无合并记录")
+    else:
+        st.dataframe(
+            coalescing_df,
+            column_config={
+                "namespace": "类型",
+                "calls": "调用数",
+                "executions": "实际执行",
+                "coalesced": "被合并",
+                "coalesced_rate": st.column_config.NumberColumn("合并比例", format="%.2f"),
+                "errors": "错误",
+                "max_waiters": "单次最多等待者",
+                "inflight": "进行中"
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+
+    # 并发读取
+    st.markdown("#### ⚡ 并发读取")
+    read_info = concurrent_read_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("并发批次", read_info['batches'])
+    with col2:
+        st.metric("读取数", read_info['reads'])
+    with col3:
+        st.metric("实际耗时", f"{read_info['wall_seconds'] * 1000:.0f} ms")
+    with col4:
+        st.metric("节省耗时", f"{read_info['saved_seconds'] * 1000:.0f} ms",
+                  help="各读取串行执行的耗时之和减去并发执行的实际耗时")
+
+    # 后台预取
+    prefetch_info = prefetch_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("预取任务", prefetch_info['submitted'])
+    with col2:
+        st.metric("完成", prefetch_info['completed'])
+    with col3:
+        st.metric("重复跳过", prefetch_info['skipped'])
+    with col4:
+        st.metric("失败", prefetch_info['failed'])
+
+    # Prometheus导出
+    with st.expander("📤 Prometheus指标"):
+        metrics_text = prometheus_text()
+        st.code(metrics_text, language="text")
+        st.download_button("下载 metrics.prom", data=metrics_text, file_name="metrics.prom",
+                           mime="text/plain", key="metrics_download")
+        st.caption("也可设置环境变量 STAR_METRICS_FILE 写入文本文件，或 STAR_METRICS_PORT 开启 /metrics 端点")
+
+    # cProfile开关
+    with st.expander("🔬 cProfile性能分析"):
+        profile_dir = st.text_input("输出目录", value=get_profile_dir() or "profiles", key="profile_dir")
+        enabled = st.toggle("每次页面渲染写出 .prof 文件", value=get_profile_dir() is not None,
+                            key="profile_enabled")
+        set_profile_dir(profile_dir if enabled else None)
+        if enabled:
+            st.info(f"性能分析文件将写入 {os.path.abspath(profile_dir)}，可用 snakeviz 或 pstats 查看")
+
+    if st.button("清空页面耗时", key="page_timing_clear"):
+        reset_stats()
+        reset_coalescing_stats()
+        st.rerun()
+
+
+def show_analytics_snapshot_settings():
+    """分析快照开关与状态"""
+    st.markdown("#### 📊 分析快照")
+    st.caption(f"开启后，数据可视化与预测分析页面读取每 {ANALYTICS_REFRESH_SECONDS // 60} 分钟刷新一次的只读副本"
+               "（immutable + mmap），不再与管理页面的写入争用数据库；也可通过环境变量 STAR_ANALYTICS_SNAPSHOT=1 默认开启")
+
+    enabled = st.toggle("分析页面读取快照", value=analytics_enabled(), key="analytics_snapshot_toggle")
+    if enabled != analytics_enabled():
+        set_analytics_enabled(enabled)
+
+    status = analytics_status()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("刷新次数", status['refreshes'])
+    with col2:
+        st.metric("快照年龄", f"{status['age_seconds']:.0f} 秒" if status['age_seconds'] is not None else "-")
+    with col3:
+        st.metric("快照大小", f"{status['bytes'] / 1024:.1f} KB")
+    if status['last_error']:
+        st.error(f"上次刷新失败: {status['last_error']}")
+
+    if st.button("🔄 立即刷新快照", key="analytics_snapshot_refresh"):
+        try:
+            report = refresh_analytics_snapshot()
+            st.success(f"✅ 快照已刷新（{report['pages']} 页，耗时 {report['seconds']} 秒）")
+        except Exception as e:
+            st.error(f"刷新快照失败: {str(e)}")
+
+
+@profiled_page
 def show_system_settings():
     """系统设置页面"""
     st.header("⚙️ 系统设置")
@@ -3026,6 +4143,12 @@ def show_system_settings():
         if st.button("保存设置", type="primary"):
             st.success("设置已保存")
 
+        show_analytics_snapshot_settings()
+
+        st.caption(f"存储后端: {get_backend().describe()}（环境变量 STAR_DB_BACKEND 选择 sqlite 或 oracle）")
+        st.caption(f"数据库位置: {describe_database(DB_PATH)}（环境变量 STAR_DB_URI 或 settings.toml 的 [database] uri 配置，"
+                   "\":memory:\" 为共享缓存的内存库）")
+
     with tab2:
         st.subheader("关于系统")
 
@@ -3059,12 +4182,15 @@ def show_system_settings():
 
 # ==================== 主程序 ====================
 
+# 按环境变量开启 /metrics 端点（每个进程只启动一次）
+start_metrics_server()
+
 # 页面标题
 st.title("🎵 星筹——演唱会管理信息系统")
 st.markdown("面向投资方的商业价值分析平台")
 
 # 检查数据库是否存在
-db_exists = os.path.exists("concert_management.db")
+db_exists = get_backend().database_exists()
 
 if not db_exists:
     st.warning("⚠️ 数据库文件不存在，正在初始化数据库...")
@@ -3111,8 +4237,7 @@ else:
             missing_tables = []
 
             for table in tables_to_check:
-                result = query_database(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
-                if result is None or result.empty:
+                if not get_backend().table_exists(table):
                     missing_tables.append(table)
 
             if missing_tables:
@@ -3152,28 +4277,23 @@ menu_options = [
     "🔮 预测分析",
     "📈 数据可视化",
     "📋 数据库管理",
+    "⏱️ 性能监控",
     "⚙️ 系统设置"
 ]
 
 page = st.sidebar.radio("选择功能", menu_options)
 
+# 后台预取下一页可能用到的数据与图表
+start_prefetch(page)
+
 # 侧边栏统计信息
 st.sidebar.markdown("---")
 st.sidebar.markdown("### 📊 实时统计")
 
 try:
-    singer_count = query_database("SELECT COUNT(*) as count FROM singers")
-    concert_count = query_database("SELECT COUNT(*) as count FROM concerts")
-
-    if singer_count is not None and not singer_count.empty:
-        st.sidebar.metric("歌手数量", singer_count['count'].iloc[0])
-    else:
-        st.sidebar.metric("歌手数量", "0")
-
-    if concert_count is not None and not concert_count.empty:
-        st.sidebar.metric("演唱会数量", concert_count['count'].iloc[0])
-    else:
-        st.sidebar.metric("演唱会数量", "0")
+    sidebar_totals = read_totals()
+    st.sidebar.metric("歌手数量", sidebar_totals['singer_count'])
+    st.sidebar.metric("演唱会数量", sidebar_totals['concert_count'])
 
 except Exception as e:
     st.sidebar.metric("歌手数量", "0")
@@ -3202,6 +4322,8 @@ elif page == "📈 数据可视化":
     show_data_visualization()
 elif page == "📋 数据库管理":
     show_database_management()
+elif page == "⏱️ 性能监控":
+    show_performance_monitor()
 elif page == "⚙️ 系统设置":
     show_system_settings()
 
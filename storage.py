@@ -0,0 +1,405 @@
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import oracledb
+except ImportError:
+    oracledb = None
+
+from db_config import DB_PATH, connect, database_exists, describe_database
+
+# ==================== 存储后端 ====================
+# get_db_connection / query_database / execute_sql 通过存储后端访问业务库：
+#   - SQLiteBackend（默认）：本地数据库文件，每个线程持有一个连接
+#   - OracleBackend：python-oracledb连接池，每次查询借出连接、用完归还，按arraysize批量取数
+# 后端负责方言相关的部分：建表语句、列出表名、行数限制与参数占位符。
+# 业务SQL统一使用 ? 占位符，由Oracle后端转换为 :1、:2 ……
+# 触发器维护的汇总、全文索引、dbstat等辅助模块依赖SQLite特性，只在SQLite后端下使用。
+
+# 环境变量：后端类型（sqlite / oracle）与Oracle连接参数
+BACKEND_ENV = "STAR_DB_BACKEND"
+ORACLE_DSN_ENV = "STAR_ORACLE_DSN"
+ORACLE_USER_ENV = "STAR_ORACLE_USER"
+ORACLE_PASSWORD_ENV = "STAR_ORACLE_PASSWORD"
+ORACLE_POOL_MAX_ENV = "STAR_ORACLE_POOL_MAX"
+
+# Oracle连接池大小与每次往返取回的行数
+ORACLE_POOL_MIN = 1
+ORACLE_POOL_MAX = 8
+ORACLE_ARRAYSIZE = 1000
+
+# 业务表的逻辑结构：(列名, 类型, 是否非空)
+TABLE_COLUMNS = {
+    'singers': [
+        ('singer_id', 'id', True),
+        ('name', 'text', True),
+        ('birth_date', 'date', False),
+        ('nationality', 'text', False),
+        ('debut_year', 'integer', False),
+        ('genre', 'text', False),
+        ('active_status', 'text', False),
+        ('created_at', 'timestamp', False)
+    ],
+    'concerts': [
+        ('concert_id', 'id', True),
+        ('singer_id', 'integer', False),
+        ('concert_name', 'text', True),
+        ('concert_date', 'date', False),
+        ('city', 'text', False),
+        ('venue', 'text', False),
+        ('capacity', 'integer', False),
+        ('attendance', 'integer', False),
+        ('ticket_price', 'real', False),
+        ('revenue', 'real', False),
+        ('attendance_rate', 'real', False),
+        ('created_at', 'timestamp', False)
+    ],
+    'popularity': [
+        ('popularity_id', 'id', True),
+        ('singer_id', 'integer', False),
+        ('record_date', 'date', False),
+        ('fan_count', 'integer', False),
+        ('topic_score', 'real', False),
+        ('popularity_score', 'real', False),
+        ('social_media_mentions', 'integer', False),
+        ('created_at', 'timestamp', False)
+    ],
+    'cities': [
+        ('city_id', 'id', True),
+        ('city_name', 'text', True),
+        ('country', 'text', False),
+        ('population', 'integer', False),
+        ('avg_concert_capacity', 'integer', False),
+        ('concert_frequency', 'integer', False),
+        ('created_at', 'timestamp', False)
+    ]
+}
+
+# 外键：{表: [(列, 引用表, 引用列)]}
+FOREIGN_KEYS = {
+    'concerts': [('singer_id', 'singers', 'singer_id')],
+    'popularity': [('singer_id', 'singers', 'singer_id')]
+}
+
+
+def _column_ddl(types, name, column_type, not_null):
+    """生成一列的定义"""
+    ddl = f"{name} {types[column_type]}"
+    if not_null and column_type != 'id':
+        ddl += " NOT NULL"
+    return ddl
+
+
+def create_table_sql(table_name, types, if_not_exists=True):
+    """按方言的类型映射生成建表语句"""
+    definitions = [_column_ddl(types, *column) for column in TABLE_COLUMNS[table_name]]
+    definitions += [f"FOREIGN KEY ({column}) REFERENCES {ref_table}({ref_column})"
+                    for column, ref_table, ref_column in FOREIGN_KEYS.get(table_name, [])]
+    exists_clause = "IF NOT EXISTS " if if_not_exists else ""
+    return f"CREATE TABLE {exists_clause}{table_name} (\n    " + ",\n    ".join(definitions) + "\n)"
+
+
+# ==================== SQLite ====================
+class SQLiteBackend:
+    """本地SQLite数据库（默认后端）"""
+
+    dialect = 'sqlite'
+
+    COLUMN_TYPES = {
+        'id': "INTEGER PRIMARY KEY AUTOINCREMENT",
+        'text': "TEXT",
+        'date': "DATE",
+        'integer': "INTEGER",
+        'real': "REAL",
+        'timestamp': "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+    }
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def describe(self):
+        """返回后端说明（用于页面展示）"""
+        return f"SQLite ({describe_database(self.db_path)})"
+
+    def database_exists(self):
+        """数据库是否存在（内存库总是存在）"""
+        return database_exists(self.db_path)
+
+    def get_connection(self):
+        """获取当前线程的数据库连接，创建失败时返回None"""
+        if getattr(self._local, "conn", None) is None:
+            try:
+                # 创建数据库连接，启用check_same_thread=False以支持多线程
+                conn = connect(self.db_path, check_same_thread=False)
+                conn.text_factory = str
+                # 设置返回字典格式
+                conn.row_factory = sqlite3.Row
+                # 启用外键支持
+                conn.execute("PRAGMA foreign_keys = ON")
+                # 设置文本编码为UTF-8
+                conn.execute("PRAGMA encoding = 'UTF-8'")
+                self._local.conn = conn
+                print(f"线程 {threading.current_thread().name} 创建了新的数据库连接")
+            except Exception as e:
+                print(f"创建数据库连接失败: {str(e)}")
+                self._local.conn = None
+        return self._local.conn
+
+    def close_connection(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.close()
+                print(f"线程 {threading.current_thread().name} 关闭了数据库连接")
+            except sqlite3.Error:
+                pass
+            finally:
+                self._local.conn = None
+
+    @contextmanager
+    def connection(self):
+        """借出当前线程的连接"""
+        conn = self.get_connection()
+        if conn is None:
+            raise sqlite3.OperationalError("没有可用的数据库连接")
+        yield conn
+
+    def fetch(self, sql, params=None):
+        """执行查询，返回 (列名列表, 行列表)"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params or ())
+                if cursor.description is None:
+                    return [], []
+                return [col[0] for col in cursor.description], [tuple(row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+
+    def execute(self, sql, params=None):
+        """执行写语句并提交，返回影响的行数；失败时回滚并抛出异常"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params or ())
+                rowcount = cursor.rowcount
+                conn.commit()
+                return rowcount
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def execute_batch(self, statements):
+        """在一个事务内依次执行 [(sql, params)]，返回各语句影响的行数；失败时全部回滚"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                rowcounts = [cursor.execute(sql, params or ()).rowcount for sql, params in statements]
+                conn.commit()
+                return rowcounts
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def list_tables(self):
+        """返回用户表名"""
+        _, rows = self.fetch("SELECT name FROM sqlite_master WHERE type = 'table' "
+                             "AND name NOT LIKE 'sqlite_%' ORDER BY name")
+        return [row[0] for row in rows]
+
+    def table_exists(self, table_name):
+        """判断表是否存在"""
+        _, rows = self.fetch("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+        return bool(rows)
+
+    def limit_sql(self, sql, limit):
+        """为查询加上行数限制"""
+        return f"{sql} LIMIT {int(limit)}"
+
+    def create_schema(self):
+        """创建缺少的业务表"""
+        with self.connection() as conn:
+            # 只在空数据库上生效（建表前），已有表的数据库保持原模式
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            for table_name in TABLE_COLUMNS:
+                conn.execute(create_table_sql(table_name, self.COLUMN_TYPES))
+            conn.commit()
+
+
+# ==================== Oracle ====================
+class OracleBackend:
+    """Oracle数据库（python-oracledb连接池）"""
+
+    dialect = 'oracle'
+
+    COLUMN_TYPES = {
+        'id': "NUMBER(19) GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+        'text': "VARCHAR2(400)",
+        'date': "DATE",
+        'integer': "NUMBER(19)",
+        'real': "BINARY_DOUBLE",
+        'timestamp': "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
+    }
+
+    def __init__(self, dsn, user, password, pool_min=ORACLE_POOL_MIN, pool_max=ORACLE_POOL_MAX,
+                 arraysize=ORACLE_ARRAYSIZE):
+        if oracledb is None:
+            raise RuntimeError("未安装oracledb，无法使用Oracle后端（pip install oracledb）")
+        self.dsn = dsn
+        self.arraysize = arraysize
+        self._pool = oracledb.create_pool(user=user, password=password, dsn=dsn,
+                                          min=pool_min, max=pool_max, increment=1)
+        self._local = threading.local()
+
+    def describe(self):
+        """返回后端说明（用于页面展示）"""
+        return f"Oracle ({self.dsn}，连接池 {self._pool.busy}/{self._pool.opened}）"
+
+    def database_exists(self):
+        """服务器数据库总是存在（能否连接由连接池决定）"""
+        return True
+
+    def get_connection(self):
+        """获取当前线程长期持有的连接（兼容直接使用连接的旧代码），失败时返回None"""
+        if getattr(self._local, "conn", None) is None:
+            try:
+                self._local.conn = self._pool.acquire()
+                print(f"线程 {threading.current_thread().name} 从连接池获取了数据库连接")
+            except Exception as e:
+                print(f"获取数据库连接失败: {str(e)}")
+                self._local.conn = None
+        return self._local.conn
+
+    def close_connection(self):
+        """把当前线程持有的连接归还连接池"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                self._pool.release(conn)
+            finally:
+                self._local.conn = None
+
+    @contextmanager
+    def connection(self):
+        """从连接池借出一个连接，用完归还"""
+        conn = self._pool.acquire()
+        try:
+            yield conn
+        finally:
+            self._pool.release(conn)
+
+    @staticmethod
+    def translate(sql):
+        """把 ? 占位符转换为 :1、:2 ……（忽略字符串常量中的问号）"""
+        counter = iter(range(1, sql.count('?') + 1))
+        return re.sub(r"'(?:[^']|'')*'|\?", lambda m: m.group(0) if m.group(0) != '?' else f":{next(counter)}", sql)
+
+    def fetch(self, sql, params=None):
+        """执行查询，返回 (列名列表, 行列表)；每次往返取回arraysize行
+
+        Oracle未加引号的标识符以大写返回，列名统一转为小写，与SQLite后端及页面代码一致。
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.arraysize = self.arraysize
+                cursor.prefetchrows = self.arraysize + 1
+                cursor.execute(self.translate(sql), list(params or ()))
+                if cursor.description is None:
+                    return [], []
+                return [col[0].lower() for col in cursor.description], cursor.fetchall()
+
+    def execute(self, sql, params=None):
+        """执行写语句并提交，返回影响的行数；失败时回滚并抛出异常"""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    cursor.execute(self.translate(sql), list(params or ()))
+                    conn.commit()
+                    return cursor.rowcount
+                except Exception:
+                    conn.rollback()
+                    raise
+
+    def execute_batch(self, statements):
+        """在一个事务内依次执行 [(sql, params)]，返回各语句影响的行数；失败时全部回滚"""
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    rowcounts = []
+                    for sql, params in statements:
+                        cursor.execute(self.translate(sql), list(params or ()))
+                        rowcounts.append(cursor.rowcount)
+                    conn.commit()
+                    return rowcounts
+                except Exception:
+                    conn.rollback()
+                    raise
+
+    def list_tables(self):
+        """返回当前用户的表名（小写）"""
+        _, rows = self.fetch("SELECT LOWER(table_name) FROM user_tables ORDER BY table_name")
+        return [row[0] for row in rows]
+
+    def table_exists(self, table_name):
+        """判断表是否存在"""
+        _, rows = self.fetch("SELECT 1 FROM user_tables WHERE table_name = UPPER(?)", (table_name,))
+        return bool(rows)
+
+    def limit_sql(self, sql, limit):
+        """为查询加上行数限制"""
+        return f"{sql} FETCH FIRST {int(limit)} ROWS ONLY"
+
+    def create_schema(self):
+        """创建缺少的业务表（Oracle没有 CREATE TABLE IF NOT EXISTS，先查询数据字典）"""
+        existing = set(self.list_tables())
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                for table_name in TABLE_COLUMNS:
+                    if table_name not in existing:
+                        cursor.execute(create_table_sql(table_name, self.COLUMN_TYPES, if_not_exists=False))
+
+
+# ==================== 后端选择 ====================
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _create_backend():
+    """按环境变量创建后端"""
+    kind = os.environ.get(BACKEND_ENV, 'sqlite').lower()
+    if kind == 'sqlite':
+        return SQLiteBackend()
+    if kind == 'oracle':
+        return OracleBackend(
+            dsn=os.environ.get(ORACLE_DSN_ENV),
+            user=os.environ.get(ORACLE_USER_ENV),
+            password=os.environ.get(ORACLE_PASSWORD_ENV),
+            pool_max=int(os.environ.get(ORACLE_POOL_MAX_ENV, ORACLE_POOL_MAX))
+        )
+    raise ValueError(f"未知的存储后端: {kind}（可选 sqlite、oracle）")
+
+
+def get_backend():
+    """返回进程内的存储后端（首次调用时创建）"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """替换存储后端（测试与基准测试使用）"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,58 @@
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from data_export import export_query, export_table, infer_arrow_type, iter_record_batches, unify_batches
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, x, n INTEGER)")
+    conn.executemany("INSERT INTO t (id, x, n) VALUES (?, ?, ?)",
+                     [(1, None, 1), (2, 1, 2), (3, 2.5, 3), (4, 'a', '1x')])
+    yield conn
+    conn.close()
+
+
+def test_infer_arrow_type_uses_all_values():
+    assert infer_arrow_type([None, 1, 2.5]) == pa.float64()
+    assert infer_arrow_type([1, 'a']) == pa.string()
+    assert infer_arrow_type([None, None]) == pa.null()
+
+
+def test_export_query_keeps_floats_after_ints(conn, tmp_path):
+    output = tmp_path / "coalesce.parquet"
+    export_query("SELECT COALESCE(x, 0) AS x FROM t WHERE id < 4 ORDER BY id", str(output), conn=conn)
+    table = pq.read_table(output)
+    assert table.schema.field('x').type == pa.float64()
+    assert table.column('x').to_pylist() == [0.0, 1.0, 2.5]
+
+
+def test_export_table_text_in_integer_column(conn, tmp_path):
+    output = tmp_path / "t.parquet"
+    assert export_table('t', str(output), conn=conn, batch_size=2) == 4
+    table = pq.read_table(output)
+    assert table.schema.field('n').type == pa.string()
+    assert table.column('n').to_pylist() == ['1', '2', '3', '1x']
+    assert table.column('x').to_pylist() == [None, '1', '2.5', 'a']
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_export_query_widens_schema_across_batches(conn, tmp_path, fmt):
+    output = tmp_path / f"widen.{fmt}"
+    export_query("SELECT x FROM t ORDER BY id", str(output), fmt, conn=conn, batch_size=2)
+    if fmt == 'parquet':
+        table = pq.read_table(output)
+    else:
+        table = pa.ipc.open_file(str(output)).read_all()
+    assert table.column('x').to_pylist() == [None, '1', '2.5', 'a']
+
+
+def test_unify_batches_casts_earlier_batches(conn):
+    schema, batches = unify_batches(iter_record_batches(conn, "SELECT x FROM t WHERE id < 4 ORDER BY id",
+                                                        batch_size=2))
+    assert schema.field('x').type == pa.float64()
+    assert pa.Table.from_batches(batches, schema=schema).column('x').to_pylist() == [None, 1.0, 2.5]
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# ==================== 时间序列降采样配置 ====================
+# 单条曲线默认最多绘制的点数
+DEFAULT_MAX_POINTS = 500
+
+# 超过该点数时改用WebGL渲染（Scattergl）
+WEBGL_THRESHOLD = 1000
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+# ==================== 类型转换 ====================
+def _as_datetime64(values):
+    """将日期列统一转换为 numpy datetime64[ns] 数组"""
+    return np.asarray(pd.to_datetime(pd.Series(values)).astype('datetime64[ns]'))
+
+
+def _as_float(values):
+    """将数值列统一转换为 float64 数组，缺失值为NaN"""
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+# ==================== 降采样算法 ====================
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets：返回保留点的下标（保持曲线形状）"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        # 下一个桶的平均点作为三角形的第三个顶点
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def minmax_indices(y, threshold):
+    """按桶保留最小值与最大值：返回保留点的下标（保留峰值）"""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    buckets = np.array_split(np.arange(1, n - 1), (threshold - 2) // 2)
+    indices = [0, n - 1]
+    for bucket in buckets:
+        if len(bucket) == 0:
+            continue
+        values = y[bucket]
+        indices.append(bucket[int(np.argmin(values))])
+        indices.append(bucket[int(np.argmax(values))])
+    return np.unique(indices)
+
+
+def downsample(x, y, max_points=DEFAULT_MAX_POINTS, method='lttb'):
+    """对一条时间序列降采样，返回 (x, y)；max_points为None时不降采样"""
+    x = _as_datetime64(x)
+    y = _as_float(y)
+
+    # 缺失值不参与降采样
+    valid = ~np.isnan(y) & ~np.isnat(x)
+    x, y = x[valid], y[valid]
+    if max_points is None or len(y) <= max_points:
+        return x, y
+
+    if method == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        indices = lttb_indices(x.astype('int64').astype('float64'), y, max_points)
+    return x[indices], y[indices]
+
+
+# ==================== 绘图 ====================
+def scatter_trace(x, y, name, max_points=DEFAULT_MAX_POINTS, method='lttb', **kwargs):
+    """生成降采样后的折线trace，点数超过WEBGL_THRESHOLD时使用Scattergl"""
+    x, y = downsample(x, y, max_points, method)
+    trace_type = go.Scattergl if len(y) > WEBGL_THRESHOLD else go.Scatter
+    # 点很多时不再绘制标记，只画折线
+    mode = 'lines+markers' if len(y) <= WEBGL_THRESHOLD else 'lines'
+    return trace_type(x=x, y=y, mode=mode, name=name, **kwargs)
+
+
+def filter_window(df, date_column, start=None, end=None):
+    """只保留 [start, end] 时间窗口内的行（按天，包含两端）"""
+    dates = pd.to_datetime(df[date_column])
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+    return df[mask.astype(bool)]
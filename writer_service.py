@@ -0,0 +1,244 @@
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from archive import attach_archive
+from db_config import DB_PATH, connect, describe_database
+
+# ==================== 写入进程配置 ====================
+# 多进程部署时所有写操作都发给唯一的写入进程，由它串行执行并按批提交：
+#   - 各工作进程只读数据库，避免多个进程争抢写锁
+#   - 同一批内的写请求各自使用SAVEPOINT，一条失败不影响其他请求
+#   - 一个请求可以包含多条语句（submit_transaction），它们在同一个SAVEPOINT内全部成功或全部回滚
+#   - 写入连接挂载归档库，级联删除可以同时删除归档中的记录
+#   - 提交后其他进程通过 PRAGMA data_version 感知数据变化并刷新缓存
+
+WRITER_ADDRESS_ENV = "STAR_WRITER_ADDRESS"
+WRITER_AUTHKEY_ENV = "STAR_WRITER_AUTHKEY"
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+DEFAULT_AUTHKEY = "star-writer"
+
+# 每批最多合并提交的写请求数
+MAX_BATCH = 64
+
+# 等待接受的连接队列长度（工作进程的多个线程可能同时建立连接）
+LISTEN_BACKLOG = 128
+
+# 客户端等待写入结果的超时时间（秒）
+REQUEST_TIMEOUT = 30.0
+
+_client_state = threading.local()
+
+
+# ==================== 工具函数 ====================
+def parse_address(address):
+    """将 host:port 解析为 (host, port)"""
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def enable_wal(db_path=DB_PATH):
+    """将数据库切换为WAL模式（持久生效），读写互不阻塞"""
+    conn = connect(db_path)
+    try:
+        mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    finally:
+        conn.close()
+    return mode
+
+
+# ==================== 写入进程 ====================
+class WriterService:
+    """单写者服务：接收各进程的写请求，放入队列后由一个线程按批执行"""
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.requests = queue.Queue()
+        self.stats = {'requests': 0, 'batches': 0, 'errors': 0}
+
+    def _open(self):
+        conn = connect(self.db_path, isolation_level=None)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        return conn
+
+    def _run_batch(self, conn, batch):
+        """在一个事务中执行一批写请求，每个请求使用独立的SAVEPOINT"""
+        results = []
+        # 归档库可能在写入进程启动后才创建，ATTACH需要在事务外执行
+        attach_archive(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        for statements, reply in batch:
+            conn.execute("SAVEPOINT request")
+            try:
+                rowcounts = []
+                for sql, params in statements:
+                    cursor = conn.execute(sql, params or ())
+                    rowcounts.append(cursor.rowcount)
+                results.append((reply, {'ok': True, 'rowcount': sum(rowcounts), 'rowcounts': rowcounts,
+                                        'lastrowid': cursor.lastrowid}))
+                conn.execute("RELEASE request")
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK TO request")
+                conn.execute("RELEASE request")
+                results.append((reply, {'ok': False, 'error': type(e).__name__, 'message': str(e)}))
+                self.stats['errors'] += 1
+        conn.execute("COMMIT")
+        return results
+
+    def writer_loop(self):
+        """写入线程：取出队列中已积累的请求，合并为一个事务提交"""
+        conn = self._open()
+        while True:
+            batch = [self.requests.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                results = self._run_batch(conn, batch)
+            except sqlite3.Error as e:
+                # 整批提交失败：回滚并把错误返回给这一批的所有请求
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                results = [(reply, {'ok': False, 'error': type(e).__name__, 'message': str(e)})
+                           for _, reply in batch]
+                self.stats['errors'] += len(batch)
+
+            self.stats['requests'] += len(batch)
+            self.stats['batches'] += 1
+            for reply, result in results:
+                reply.put(result)
+
+    def handle_client(self, client):
+        """处理一个工作进程连接上的请求，直到连接断开"""
+        try:
+            while True:
+                message = client.recv()
+                if message.get('op') == 'stats':
+                    client.send(dict(self.stats, queued=self.requests.qsize()))
+                    continue
+
+                if message.get('op') == 'transaction':
+                    statements = message['statements']
+                else:
+                    statements = [(message['sql'], message.get('params'))]
+                reply = queue.Queue(maxsize=1)
+                self.requests.put((statements, reply))
+                client.send(reply.get())
+        except (EOFError, OSError):
+            pass
+        finally:
+            client.close()
+
+    def serve(self, address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY):
+        """监听地址并为每个连接启动处理线程"""
+        threading.Thread(target=self.writer_loop, name="writer", daemon=True).start()
+        listener = Listener(parse_address(address), backlog=LISTEN_BACKLOG, authkey=authkey.encode('utf-8'))
+        with listener:
+            print(f"写入进程已启动: {address}，数据库 {describe_database(self.db_path)}")
+            while True:
+                client = listener.accept()
+                threading.Thread(target=self.handle_client, args=(client,), daemon=True).start()
+
+
+def run_writer(address=DEFAULT_ADDRESS, authkey=DEFAULT_AUTHKEY, db_path=DB_PATH):
+    """写入进程入口（供multiprocessing或命令行调用）"""
+    try:
+        WriterService(db_path).serve(address, authkey)
+    except KeyboardInterrupt:
+        pass
+
+
+# ==================== 工作进程客户端 ====================
+def writer_configured():
+    """当前进程是否配置了写入进程"""
+    return bool(os.environ.get(WRITER_ADDRESS_ENV))
+
+
+def _client():
+    """每个线程复用一个到写入进程的连接"""
+    client = getattr(_client_state, 'client', None)
+    if client is None:
+        address = os.environ.get(WRITER_ADDRESS_ENV, DEFAULT_ADDRESS)
+        authkey = os.environ.get(WRITER_AUTHKEY_ENV, DEFAULT_AUTHKEY)
+        client = Client(parse_address(address), authkey=authkey.encode('utf-8'))
+        _client_state.client = client
+    return client
+
+
+def _request(message):
+    """发送请求并等待结果；缓存的连接已断开时重连一次再发送
+
+    请求发出后不再重试，避免写语句被执行两次。
+    """
+    try:
+        client = _client()
+        client.send(message)
+    except OSError:
+        _client_state.client = None
+        client = _client()
+        client.send(message)
+
+    try:
+        if not client.poll(REQUEST_TIMEOUT):
+            raise TimeoutError(f"写入进程超过 {REQUEST_TIMEOUT} 秒未响应")
+        return client.recv()
+    except (EOFError, OSError):
+        # 连接状态未知（迟到的响应会打乱后续请求的顺序），丢弃这个连接
+        client.close()
+        _client_state.client = None
+        raise
+
+
+def _check(result):
+    """写入失败时按原异常类型抛出"""
+    if not result['ok']:
+        error_type = getattr(sqlite3, result['error'], sqlite3.Error)
+        raise error_type(result['message'])
+    return result
+
+
+def submit_write(sql, params=None):
+    """把写语句交给写入进程执行，返回 {'rowcount', 'lastrowid'}，失败时抛出sqlite3异常"""
+    return _check(_request({'op': 'execute', 'sql': sql, 'params': tuple(params) if params else None}))
+
+
+def submit_transaction(statements):
+    """把 [(sql, params)] 作为一个整体交给写入进程执行，返回各语句的 'rowcounts'，失败时全部回滚并抛出异常"""
+    statements = [(sql, tuple(params) if params else None) for sql, params in statements]
+    if not statements:
+        return {'ok': True, 'rowcount': 0, 'rowcounts': [], 'lastrowid': None}
+    return _check(_request({'op': 'transaction', 'statements': statements}))
+
+
+def writer_stats():
+    """返回写入进程的请求数、批次数、错误数与排队数"""
+    return _request({'op': 'stats'})
+
+
+# ==================== 命令行入口 ====================
+def main(argv=None):
+    """命令行启动写入进程：python writer_service.py --address 127.0.0.1:8765"""
+    parser = argparse.ArgumentParser(description="启动单写者写入进程")
+    parser.add_argument("--address", default=os.environ.get(WRITER_ADDRESS_ENV, DEFAULT_ADDRESS),
+                        help="监听地址 host:port")
+    parser.add_argument("--db", default=DB_PATH, help="数据库文件路径")
+    args = parser.parse_args(argv)
+
+    print(f"数据库日志模式: {enable_wal(args.db)}")
+    started = time.time()
+    run_writer(args.address, os.environ.get(WRITER_AUTHKEY_ENV, DEFAULT_AUTHKEY), args.db)
+    print(f"写入进程已退出，运行 {time.time() - started:.0f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())